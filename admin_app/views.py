@@ -19,12 +19,14 @@ from django.views.decorators.http import require_POST
 from django.shortcuts import get_object_or_404
 from functools import wraps
 from django.views.decorators.csrf import csrf_exempt, ensure_csrf_cookie
+from django.db import transaction
 from django.db.models import Q
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.utils import timezone
 import datetime as dt
 from tour_app.models import Tour_Add, Tour_Schedule, Tour_Event
 from guest_app.models import Guest, Pending, AccommodationBooking
+from guest_app import inventory
 from .models import TourAssignment
 
 def log_activity(request, employee, activity_type, description=None, page=None):
@@ -306,22 +308,30 @@ def accommodation_booking_update(request, booking_id):
 
     if action == "confirm":
         booking.status = "confirmed"
-        messages.success(request, "Booking confirmed.")
+        success_message = "Booking confirmed."
     elif action == "decline":
         booking.status = "declined"
-        messages.success(request, "Booking declined.")
+        success_message = "Booking declined."
     elif action == "cancel":
         booking.status = "cancelled"
         booking.cancellation_reason = request.POST.get("reason") or "Cancelled by admin."
         booking.cancellation_date = timezone.now()
-        messages.success(request, "Booking cancelled.")
+        success_message = "Booking cancelled."
     else:
         messages.error(request, "Invalid action.")
         return redirect('admin_app:accommodation_bookings')
 
-    booking.save()
+    # Confirming re-holds the room's nights; declining or cancelling frees them
+    with transaction.atomic():
+        booking.save()
+        if inventory.sync_nights(booking):
+            messages.success(request, success_message)
+        else:
+            transaction.set_rollback(True)
+            messages.error(request, "The room is already booked for some of those nights.")
     return redirect('admin_app:accommodation_bookings')
 
+
 def accommodation_update(request, pk):
     try:
         accom = Accomodation.objects.get(pk=pk)
@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+from .feature_store import STATE_CACHE_ALIAS
+
+
+@register(Tags.caches, deploy=True)
+def check_state_cache(app_configs, **kwargs):
+    """The feature store's generation counters must be visible to every worker."""
+    backend = settings.CACHES.get(STATE_CACHE_ALIAS, {}).get("BACKEND", "")
+    if backend.endswith("LocMemCache"):
+        return [Warning(
+            f'The "{STATE_CACHE_ALIAS}" cache is local to each process.',
+            hint="Set CHATBOT_REDIS_URL when running more than one worker; until then other "
+                 "workers only see chatbot data changes after CHATBOT_STORE_MAX_AGE seconds.",
+            id="ai_chatbot.W001",
+        )]
+    return []
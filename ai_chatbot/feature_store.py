@@ -0,0 +1,217 @@
+"""
+In-process cache of recommendation candidates.
+
+The store keeps the rows used by ``scoring`` (normalized names, descriptions,
+locations, company types, prices and capacities) in memory and only goes back
+to the database for rows that a ``post_save``/``post_delete`` signal reported
+as changed. When nothing has changed the recommendation path runs without a
+single query.
+
+Other worker processes learn about changes through a generation counter kept
+in the "chatbot_state" cache: every change bumps it, and a process that finds
+it further ahead than its own bumps account for does a full reload. That
+alias must be shared (``CHATBOT_REDIS_URL``) when several processes serve
+requests; as a safety net the rows are also reloaded once they are
+``CHATBOT_STORE_MAX_AGE`` seconds old. Writes that bypass signals
+(``QuerySet.update``) must call one of the ``mark_*`` methods or ``clear``
+themselves.
+"""
+from __future__ import annotations
+
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Q
+from django.utils import timezone
+
+from . import scoring
+
+GENERATION_KEY = "ai_chatbot:feature_store:generation"
+CACHE_ALIAS = "chatbot"
+# Generation counters; never evicted (see settings.CACHES)
+STATE_CACHE_ALIAS = "chatbot_state"
+
+
+def shared_cache():
+    return caches[CACHE_ALIAS]
+
+
+def state_cache():
+    return caches[STATE_CACHE_ALIAS]
+
+
+def incr_counter(key, cache=None):
+    """Atomically increment a counter in the shared cache, creating it if needed."""
+    cache = cache or shared_cache()
+    if not cache.add(key, 1, timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, timeout=None)
+
+
+class SharedGeneration:
+    """
+    This process's view of a generation counter in the state cache.
+    ``bump`` announces a local change; ``stale`` tells whether some other
+    process changed data since the last check (the counter moved further
+    than the local bumps explain, or went backwards because it was lost), or
+    the data is older than ``CHATBOT_STORE_MAX_AGE``.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._seen = None
+            self._local = 0
+            self._since = time.monotonic()
+
+    def bump(self):
+        with self._lock:
+            self._local += 1
+        incr_counter(self.key, state_cache())
+
+    def stale(self):
+        current = state_cache().get(self.key) or 0
+        max_age = getattr(settings, "CHATBOT_STORE_MAX_AGE", 300)
+        now = time.monotonic()
+        with self._lock:
+            if self._seen is None:
+                # First check: this is the baseline the data is loaded against
+                self._seen, self._local, self._since = current, 0, now
+                return False
+            expired = bool(max_age) and now - self._since > max_age
+            if current == self._seen and not expired:
+                # Local bumps may still be in flight; keep counting them
+                return False
+            elsewhere = current > self._seen + self._local or current < self._seen
+            self._seen, self._local = current, 0
+            if elsewhere or expired:
+                self._since = now
+            return elsewhere or expired
+
+
+class CandidateStore:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._generation = SharedGeneration(GENERATION_KEY)
+        self.clear(broadcast=False)
+
+    def clear(self, broadcast=True):
+        """Drop everything; the next read performs a full load."""
+        with self._lock:
+            self._tour_rows = None
+            self._room_rows = None
+            self._tours = None
+            self._rooms = None
+            self._dirty_schedules = set()
+            self._dirty_tours = set()
+            self._dirty_rooms = set()
+            self._dirty_accommodations = set()
+        self._generation.reset()
+        if broadcast:
+            self._generation.bump()
+
+    # -- invalidation -----------------------------------------------------
+
+    def mark_schedules(self, sched_ids):
+        self._mark("_dirty_schedules", sched_ids)
+
+    def mark_tours(self, tour_ids):
+        self._mark("_dirty_tours", tour_ids)
+
+    def mark_rooms(self, room_ids):
+        self._mark("_dirty_rooms", room_ids)
+
+    def mark_accommodations(self, accom_ids):
+        self._mark("_dirty_accommodations", accom_ids)
+
+    def _mark(self, attribute, keys):
+        with self._lock:
+            getattr(self, attribute).update(keys)
+        self._generation.bump()
+
+    # -- reads ------------------------------------------------------------
+
+    def tour_candidates(self, now=None) -> scoring.TourCandidates:
+        now = now or timezone.now()
+        with self._lock:
+            self._sync_generation()
+            if self._tour_rows is None:
+                self._tour_rows = self._fetch_tours(scoring.tour_queryset(now))
+                self._dirty_schedules, self._dirty_tours = set(), set()
+                self._tours = None
+            elif self._dirty_schedules or self._dirty_tours:
+                self._refresh_tours(now)
+            if self._tours is None:
+                self._tours = scoring.TourCandidates.from_rows(list(self._tour_rows.values()))
+            tours = self._tours
+        return tours.active(now)
+
+    def accommodation_candidates(self) -> scoring.AccommodationCandidates:
+        with self._lock:
+            self._sync_generation()
+            if self._room_rows is None:
+                self._room_rows = self._fetch_rooms(scoring.room_queryset())
+                self._dirty_rooms, self._dirty_accommodations = set(), set()
+                self._rooms = None
+            elif self._dirty_rooms or self._dirty_accommodations:
+                self._refresh_rooms()
+            if self._rooms is None:
+                self._rooms = scoring.AccommodationCandidates.from_rows(list(self._room_rows.values()))
+            return self._rooms
+
+    # -- internals (callers hold the lock) --------------------------------
+
+    def _sync_generation(self):
+        if self._generation.stale():
+            # Another process changed data we have no dirty keys for (or the
+            # rows are past their maximum age): reload everything.
+            self._tour_rows = self._room_rows = None
+
+    @staticmethod
+    def _fetch_tours(queryset):
+        return {row[0]: row for row in queryset.values_list(*scoring.TOUR_COLUMNS)}
+
+    @staticmethod
+    def _fetch_rooms(queryset):
+        return {row[0]: row for row in queryset.values_list(*scoring.ROOM_COLUMNS)}
+
+    def _refresh_tours(self, now):
+        sched_ids, tour_ids = self._dirty_schedules, self._dirty_tours
+        self._dirty_schedules, self._dirty_tours = set(), set()
+
+        stale = set(sched_ids)
+        stale.update(key for key, row in self._tour_rows.items() if row[1] in tour_ids)
+        for key in stale:
+            self._tour_rows.pop(key, None)
+
+        queryset = scoring.tour_queryset(now).filter(
+            Q(sched_id__in=sched_ids) | Q(tour_id__in=tour_ids)
+        )
+        self._tour_rows.update(self._fetch_tours(queryset))
+        self._tours = None
+
+    def _refresh_rooms(self):
+        room_ids, accom_ids = self._dirty_rooms, self._dirty_accommodations
+        self._dirty_rooms, self._dirty_accommodations = set(), set()
+
+        stale = set(room_ids)
+        stale.update(key for key, row in self._room_rows.items() if row[1] in accom_ids)
+        for key in stale:
+            self._room_rows.pop(key, None)
+
+        queryset = scoring.room_queryset().filter(
+            Q(room_id__in=room_ids) | Q(accommodation_id__in=accom_ids)
+        )
+        self._room_rows.update(self._fetch_rooms(queryset))
+        self._rooms = None
+
+
+store = CandidateStore()
@@ -0,0 +1,66 @@
+"""
+Memoized LLM intent extraction.
+
+Maps a normalized chat message to the ``{intent, params}`` the model returned
+for it, so repeated questions ("recommend a tour for 2 guests") are answered
+without an OpenAI round trip. Entries live in the "chatbot" cache alias, which
+provides the TTL and least-recently-used eviction and, when pointed at Redis,
+is shared by every worker. Hit/miss counters are stored alongside.
+"""
+from __future__ import annotations
+
+import hashlib
+import re
+
+from django.conf import settings
+
+from .feature_store import incr_counter, shared_cache
+
+KEY_PREFIX = "ai_chatbot:intent"
+HITS_KEY = f"{KEY_PREFIX}:hits"
+MISSES_KEY = f"{KEY_PREFIX}:misses"
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_EDGE_PUNCTUATION = " .,!?;:\"'"
+
+
+def normalize_message(message):
+    """Case- and whitespace-insensitive form used as the cache key."""
+    text = _WHITESPACE_RE.sub(" ", (message or "").lower())
+    return text.strip(_EDGE_PUNCTUATION)
+
+
+def _key(message, model):
+    digest = hashlib.sha256(f"{model}\n{normalize_message(message)}".encode("utf-8")).hexdigest()
+    return f"{KEY_PREFIX}:{digest}"
+
+
+def lookup(message, model):
+    """Return the cached ``{intent, params}`` for ``message`` or ``None``."""
+    value = shared_cache().get(_key(message, model))
+    incr_counter(HITS_KEY if value is not None else MISSES_KEY)
+    return value
+
+
+def remember(message, model, intent, params):
+    shared_cache().set(
+        _key(message, model),
+        {"intent": intent, "params": params},
+        timeout=getattr(settings, "CHATBOT_INTENT_CACHE_TTL", 60 * 60),
+    )
+
+
+def stats():
+    cache = shared_cache()
+    hits = cache.get(HITS_KEY) or 0
+    misses = cache.get(MISSES_KEY) or 0
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": hits / total if total else 0.0,
+    }
+
+
+def reset_stats():
+    shared_cache().delete_many([HITS_KEY, MISSES_KEY])
@@ -0,0 +1,139 @@
+"""
+Local, confidence-scored intent classifier.
+
+Combines the keyword rules the chatbot has always used with a small
+multinomial Naive Bayes model trained on ``data/intent_examples.json``. When
+both agree strongly and the message already carries the parameters its
+intent needs, the chatbot answers without calling the LLM; anything else is
+treated as ambiguous and sent upstream.
+"""
+from __future__ import annotations
+
+import json
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+
+EXAMPLES_PATH = Path(__file__).resolve().parent / "data" / "intent_examples.json"
+
+INTENTS = (
+    "get_recommendation",
+    "calculate_billing",
+    "get_accommodation_recommendation",
+    "calculate_accommodation_billing",
+)
+
+BILLING_KEYWORDS = ("bill", "billing", "total", "price", "cost", "how much", "amount due")
+ACCOMMODATION_KEYWORDS = ("hotel", "inn", "room", "accommodation")
+
+# Parameters an intent cannot be answered without; if the message does not
+# provide them the LLM is better placed to dig them out.
+REQUIRED_PARAMS = {
+    "calculate_billing": ("sched_id",),
+    "calculate_accommodation_billing": ("room_id",),
+}
+
+RULE_WEIGHT = 4.0
+DEFAULT_THRESHOLD = 0.8
+
+_TOKEN_RE = re.compile(r"sched\d+|\d{4}-\d{2}-\d{2}|\d+|[^\W\d_]+")
+
+
+@dataclass
+class Prediction:
+    intent: str
+    confidence: float
+
+
+def rule_intent(message):
+    """The original keyword rules for picking an intent."""
+    text = (message or "").lower()
+    if any(keyword in text for keyword in BILLING_KEYWORDS):
+        if any(keyword in text for keyword in ACCOMMODATION_KEYWORDS):
+            return "calculate_accommodation_billing"
+        return "calculate_billing"
+    if any(keyword in text for keyword in ACCOMMODATION_KEYWORDS):
+        return "get_accommodation_recommendation"
+    return "get_recommendation"
+
+
+def _features(message):
+    tokens = []
+    for token in _TOKEN_RE.findall((message or "").lower()):
+        if token.startswith("sched"):
+            tokens.append("<sched>")
+        elif "-" in token:
+            tokens.append("<date>")
+        elif token.isdigit():
+            tokens.append("<num>")
+        else:
+            tokens.append(token)
+    return tokens
+
+
+def load_examples(split="train"):
+    with open(EXAMPLES_PATH, encoding="utf-8") as handle:
+        return [tuple(example) for example in json.load(handle)[split]]
+
+
+class NaiveBayes:
+    def __init__(self, examples):
+        self.token_counts = {intent: Counter() for intent in INTENTS}
+        self.doc_counts = Counter()
+        for message, intent in examples:
+            self.doc_counts[intent] += 1
+            self.token_counts[intent].update(_features(message))
+        self.vocabulary = set().union(*self.token_counts.values())
+        self.totals = {intent: sum(counts.values()) for intent, counts in self.token_counts.items()}
+        docs = sum(self.doc_counts.values())
+        self.log_priors = {
+            intent: math.log((self.doc_counts[intent] + 1) / (docs + len(INTENTS)))
+            for intent in INTENTS
+        }
+
+    def log_scores(self, tokens):
+        size = len(self.vocabulary) + 1
+        scores = {}
+        for intent in INTENTS:
+            counts, denominator = self.token_counts[intent], self.totals[intent] + size
+            scores[intent] = self.log_priors[intent] + sum(
+                math.log((counts[token] + 1) / denominator)
+                for token in tokens
+                if token in self.vocabulary
+            )
+        return scores
+
+
+@lru_cache(maxsize=1)
+def _model():
+    return NaiveBayes(load_examples("train"))
+
+
+def predict(message):
+    """Most likely intent and its probability after combining both signals."""
+    scores = _model().log_scores(_features(message))
+    scores[rule_intent(message)] += math.log(RULE_WEIGHT)
+    peak = max(scores.values())
+    weights = {intent: math.exp(score - peak) for intent, score in scores.items()}
+    intent = max(weights, key=weights.get)
+    return Prediction(intent=intent, confidence=weights[intent] / sum(weights.values()))
+
+
+def classify_locally(message, params):
+    """
+    Return the intent if it can be answered without the LLM, else ``None``.
+
+    ``params`` are the heuristically extracted parameters for ``message``.
+    """
+    prediction = predict(message)
+    threshold = getattr(settings, "CHATBOT_LOCAL_INTENT_THRESHOLD", DEFAULT_THRESHOLD)
+    if prediction.confidence < threshold:
+        return None
+    if any(not params.get(name) for name in REQUIRED_PARAMS.get(prediction.intent, ())):
+        return None
+    return prediction.intent
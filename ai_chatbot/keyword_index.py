@@ -0,0 +1,146 @@
+"""
+Token-level inverted index over tour names and descriptions.
+
+Every ``Tour_Add`` is indexed under its own name/description (as the site
+default language) and under each ``TourAddTranslation`` row, so preferences
+typed in English, Tagalog, Cebuano or Spanish resolve to the same tours.
+Lookups walk a sorted vocabulary with ``bisect`` and intersect posting sets,
+so they never scan the descriptions themselves.
+
+Tours reported by ``post_save``/``post_delete`` signals are re-indexed on the
+next lookup; everything else stays in memory. Other processes are told to
+rebuild through a generation counter in the state cache, exactly as in
+``feature_store``.
+"""
+from __future__ import annotations
+
+import re
+import threading
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+
+from tour_app.models import Tour_Add
+from tour_app.translation_models import TourAddTranslation
+
+from .feature_store import SharedGeneration
+
+TOKEN_RE = re.compile(r"\w+")
+BASE_LANGUAGE = settings.LANGUAGE_CODE.split("-")[0]
+GENERATION_KEY = "ai_chatbot:keyword_index:generation"
+
+
+def tokenize(text):
+    """Lowercase, accent-folded word tokens (``"Río"`` -> ``["rio"]``)."""
+    folded = unicodedata.normalize("NFKD", (text or "").lower())
+    folded = "".join(ch for ch in folded if not unicodedata.combining(ch))
+    return TOKEN_RE.findall(folded)
+
+
+class TourKeywordIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._generation = SharedGeneration(GENERATION_KEY)
+        self.clear()
+
+    def clear(self):
+        """Drop the index; the next lookup rebuilds it from scratch."""
+        with self._lock:
+            self._postings = None
+            self._tour_tokens = {}
+            self._vocabulary = []
+            self._dirty = set()
+        self._generation.reset()
+
+    def mark_tours(self, tour_ids):
+        with self._lock:
+            self._dirty.update(tour_ids)
+        self._generation.bump()
+
+    def lookup(self, text, language=None):
+        """
+        Return the ids of tours containing every token of ``text``.
+
+        Each query token matches indexed tokens it is a prefix of, so
+        ``"river"`` still finds ``"riverside"``. Pass ``language`` to restrict
+        matches to that language's text.
+        """
+        tokens = tokenize(text)
+        if not tokens:
+            return set()
+
+        with self._lock:
+            self._ensure_current()
+            matches = None
+            for token in tokens:
+                found = self._prefix_matches(token, language)
+                matches = found if matches is None else matches & found
+                if not matches:
+                    return set()
+            return matches
+
+    # -- internals (callers hold the lock) --------------------------------
+
+    def _prefix_matches(self, prefix, language):
+        found = set()
+        start = bisect_left(self._vocabulary, prefix)
+        for token in self._vocabulary[start:]:
+            if not token.startswith(prefix):
+                break
+            for tour_id, languages in self._postings[token].items():
+                if language is None or language in languages:
+                    found.add(tour_id)
+        return found
+
+    def _ensure_current(self):
+        if self._generation.stale():
+            # Another process changed tours we have no dirty ids for.
+            self._postings = None
+
+        if self._postings is None:
+            self._postings = defaultdict(dict)
+            self._tour_tokens = {}
+            self._dirty = set()
+            self._index(Tour_Add.objects.all(), TourAddTranslation.objects.all())
+        elif self._dirty:
+            dirty, self._dirty = self._dirty, set()
+            for tour_id in dirty:
+                self._remove(tour_id)
+            self._index(
+                Tour_Add.objects.filter(tour_id__in=dirty),
+                TourAddTranslation.objects.filter(tour_id__in=dirty),
+            )
+        else:
+            return
+        self._vocabulary = sorted(self._postings)
+
+    def _index(self, tours, translations):
+        documents = [
+            (tour_id, BASE_LANGUAGE, f"{name} {description}")
+            for tour_id, name, description in tours.values_list("tour_id", "tour_name", "description")
+        ]
+        documents += [
+            (tour_id, language, f"{name} {description}")
+            for tour_id, language, name, description in translations.values_list(
+                "tour_id", "language", "tour_name", "description"
+            )
+        ]
+        for tour_id, language, text in documents:
+            tokens = set(tokenize(text))
+            self._tour_tokens.setdefault(tour_id, set()).update(tokens)
+            for token in tokens:
+                self._postings[token].setdefault(tour_id, set()).add(language)
+
+    def _remove(self, tour_id):
+        for token in self._tour_tokens.pop(tour_id, ()):
+            posting = self._postings.get(token)
+            if posting is None:
+                continue
+            posting.pop(tour_id, None)
+            if not posting:
+                del self._postings[token]
+
+
+tour_index = TourKeywordIndex()
@@ -0,0 +1,113 @@
+"""
+Process-wide OpenAI clients for the chatbot.
+
+Clients are created once and reused so their HTTP connection pools stay warm
+(keep-alive) instead of being rebuilt on every chat message. The async client
+is paired with a semaphore that caps in-flight LLM calls; both are bound to
+the running event loop, so under an ASGI server there is exactly one of each
+per worker process.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import weakref
+
+from django.conf import settings
+
+try:
+    from openai import AsyncOpenAI, OpenAI
+except ModuleNotFoundError:
+    AsyncOpenAI = OpenAI = None
+
+_lock = threading.Lock()
+_sync_clients = {}
+_async_state = weakref.WeakKeyDictionary()
+
+
+def api_key():
+    return os.getenv("OPENAI_API_KEY", "").strip()
+
+
+def model_name():
+    return os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+
+
+def base_url():
+    """``OPENAI_BASE_URL`` lets the chatbot target a stand-in such as ``openai_stub``."""
+    return os.getenv("OPENAI_BASE_URL", "").strip() or None
+
+
+def timeout():
+    return float(getattr(settings, "CHATBOT_LLM_TIMEOUT", 15))
+
+
+def available():
+    return bool(api_key()) and OpenAI is not None
+
+
+def _client_options():
+    return {
+        "api_key": api_key(),
+        "base_url": base_url(),
+        "timeout": timeout(),
+        "max_retries": int(getattr(settings, "CHATBOT_LLM_MAX_RETRIES", 1)),
+    }
+
+
+def get_client():
+    """Shared synchronous client for the current API key and base URL."""
+    options = _client_options()
+    key = (options["api_key"], options["base_url"])
+    with _lock:
+        client = _sync_clients.get(key)
+        if client is None:
+            client = _sync_clients[key] = OpenAI(**options)
+        return client
+
+
+def _loop_state():
+    loop = asyncio.get_running_loop()
+    state = _async_state.get(loop)
+    if state is None:
+        state = _async_state[loop] = {
+            "clients": {},
+            "semaphore": asyncio.Semaphore(
+                int(getattr(settings, "CHATBOT_LLM_MAX_CONCURRENCY", 200))
+            ),
+        }
+    return state
+
+
+def get_async_client():
+    """Shared async client for the running event loop, API key and base URL."""
+    options = _client_options()
+    key = (options["api_key"], options["base_url"])
+    clients = _loop_state()["clients"]
+    client = clients.get(key)
+    if client is None:
+        client = clients[key] = AsyncOpenAI(**options)
+    return client
+
+
+async def acomplete(**request):
+    """
+    ``chat.completions.create`` on the shared async client, limited to
+    ``CHATBOT_LLM_MAX_CONCURRENCY`` concurrent calls and a hard
+    ``CHATBOT_LLM_TIMEOUT`` that also covers time spent queued.
+    """
+    state = _loop_state()
+
+    async def run():
+        async with state["semaphore"]:
+            return await get_async_client().chat.completions.create(**request)
+
+    return await asyncio.wait_for(run(), timeout=timeout())
+
+
+def reset():
+    """Forget every cached client (tests and key rotation)."""
+    with _lock:
+        _sync_clients.clear()
+    _async_state.clear()
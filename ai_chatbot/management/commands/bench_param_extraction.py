@@ -0,0 +1,86 @@
+import re
+import time
+
+from django.core.management.base import BaseCommand
+
+from ai_chatbot.intent_classifier import load_examples
+from ai_chatbot.param_extraction import extract_params
+
+
+def legacy_extract_params(message):
+    """The per-call regex extractor the single-pass pipeline replaced."""
+    text = (message or "").strip().lower()
+    params = {}
+    sched_match = re.search(r"(sched\d+)", text, flags=re.IGNORECASE)
+    if sched_match:
+        params["sched_id"] = sched_match.group(1)
+    guest_match = re.search(r"(\d+)\s*(guest|guests|people|person|pax)", text)
+    if guest_match:
+        params["guests"] = int(guest_match.group(1))
+    else:
+        first_num = re.search(r"\b(\d+)\b", text)
+        if first_num:
+            params["guests"] = int(first_num.group(1))
+    budget_match = re.search(r"(budget|under|below|less than)\s*[:\-]?\s*(\d+)", text)
+    if budget_match:
+        params["budget"] = int(budget_match.group(2))
+    duration_match = re.search(r"(\d+)\s*day", text)
+    if duration_match:
+        params["duration_days"] = int(duration_match.group(1))
+    nights_match = re.search(r"(\d+)\s*night", text)
+    if nights_match:
+        params["nights"] = int(nights_match.group(1))
+    loc_match = re.search(r"\bin\s+([a-z\s]+)$", text)
+    if loc_match:
+        params["location"] = loc_match.group(1).strip()
+    room_match = re.search(r"(room\\s*(\\d+))", text)
+    if room_match:
+        params["room_id"] = room_match.group(2)
+    date_matches = re.findall(r"(\\d{4}-\\d{2}-\\d{2})", text)
+    if len(date_matches) >= 2:
+        params["check_in"] = date_matches[0]
+        params["check_out"] = date_matches[1]
+    if "hotel" in text or "inn" in text or "accommodation" in text:
+        params.setdefault("company_type", "hotel")
+    for keyword in ["river", "mountain", "sea", "sunset", "forest"]:
+        if keyword in text:
+            params["preference"] = keyword
+            break
+    return params
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks chatbot parameter extraction (messages per second, before and after)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rounds', type=int, default=2000,
+                            help='Passes over the labeled message corpus per extractor')
+        parser.add_argument('--cold', action='store_true',
+                            help="Purge Python's regex cache before each legacy pass")
+
+    def handle(self, *args, **options):
+        corpus = [message for split in ('train', 'heldout') for message, _ in load_examples(split)]
+        total = len(corpus) * options['rounds']
+
+        # Python's regex cache hides most recompilation cost; --cold purges it
+        # so the legacy path compiles its patterns the way a fresh worker does.
+        for label, extractor, purge in (
+            ('before (per-call regexes)', legacy_extract_params, options['cold']),
+            ('after (single compiled scan)', extract_params, False),
+        ):
+            started = time.perf_counter()
+            for _ in range(options['rounds']):
+                if purge:
+                    re.purge()
+                for message in corpus:
+                    extractor(message)
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f'{label:30} {total / elapsed:>12,.0f} messages/s')
+
+        missed = sum(
+            1 for message in corpus
+            if 'room_id' in extract_params(message) and 'room_id' not in legacy_extract_params(message)
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Room ids recovered by the new pipeline that the old one missed: {missed}'
+        ))
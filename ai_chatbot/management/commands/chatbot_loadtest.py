@@ -0,0 +1,121 @@
+import json
+import math
+import random
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory
+
+from ai_chatbot.intent_classifier import load_examples
+from ai_chatbot.views import openai_chat
+
+# Intent source of replies built from heuristics because the LLM call failed
+FALLBACK_SOURCE = 'heuristic_fallback'
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not samples:
+        return 0.0
+    rank = max(math.ceil(pct / 100.0 * len(samples)) - 1, 0)
+    return samples[rank]
+
+
+class Command(BaseCommand):
+    help = (
+        'Load-tests the chatbot endpoint and reports latency percentiles, throughput, errors and '
+        'LLM fallbacks per intent'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--url', default=None,
+                            help='POST to a running server instead of calling openai_chat in-process')
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        corpus = [example for split in ('train', 'heldout') for example in load_examples(split)]
+        rng = random.Random(options['seed'])
+        workload = [rng.choice(corpus) for _ in range(options['requests'])]
+        send = self._http_sender(options['url']) if options['url'] else self._local_sender()
+
+        latencies = defaultdict(list)
+        failures = defaultdict(int)
+        fallbacks = defaultdict(int)
+        lock = threading.Lock()
+
+        def run(example):
+            message, intent = example
+            started = time.perf_counter()
+            try:
+                ok, source = send(message)
+            except Exception:
+                ok, source = False, None
+            elapsed = time.perf_counter() - started
+            if not options['url']:
+                # Each request may land on a different pool thread
+                connection.close()
+            with lock:
+                latencies[intent].append(elapsed)
+                if not ok:
+                    failures[intent] += 1
+                elif source == FALLBACK_SOURCE:
+                    fallbacks[intent] += 1
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            list(pool.map(run, workload))
+        wall = time.perf_counter() - started
+
+        # "fallback": answered, but from heuristics because the LLM call failed
+        self.stdout.write(
+            f'{"intent":34} {"count":>6} {"errors":>6} {"fallback":>8} '
+            f'{"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"req/s":>8}'
+        )
+        rows = sorted(latencies.items()) + [('ALL', [t for ts in latencies.values() for t in ts])]
+        for intent, samples in rows:
+            samples = sorted(samples)
+            if intent == 'ALL':
+                errors, fallback = sum(failures.values()), sum(fallbacks.values())
+            else:
+                errors, fallback = failures[intent], fallbacks[intent]
+            self.stdout.write(
+                f'{intent:34} {len(samples):>6} {errors:>6} {fallback:>8} '
+                f'{percentile(samples, 50) * 1000:>8.1f} {percentile(samples, 95) * 1000:>8.1f} '
+                f'{percentile(samples, 99) * 1000:>8.1f} {len(samples) / wall:>8.1f}'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(workload)} requests in {wall:.2f}s with concurrency {options["concurrency"]}'
+        ))
+
+    @staticmethod
+    def _local_sender():
+        factory = RequestFactory()
+
+        def send(message):
+            request = factory.post(
+                '/api/chat/', data=json.dumps({'message': message}), content_type='application/json'
+            )
+            response = openai_chat(request)
+            return response.status_code == 200, response.get('X-Intent-Source')
+
+        return send
+
+    @staticmethod
+    def _http_sender(url):
+        import requests
+
+        local = threading.local()
+
+        def send(message):
+            if not hasattr(local, 'session'):
+                local.session = requests.Session()
+            response = local.session.post(url, json={'message': message}, timeout=60)
+            return response.status_code == 200, response.headers.get('X-Intent-Source')
+
+        return send
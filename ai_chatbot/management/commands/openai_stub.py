@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from ai_chatbot.openai_stub import StubConfig, make_server
+
+
+class Command(BaseCommand):
+    help = 'Runs a local stand-in for the OpenAI chat.completions API (select it with OPENAI_BASE_URL)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8089)
+        parser.add_argument('--latency-ms', type=float, default=300.0,
+                            help='Mean artificial response latency')
+        parser.add_argument('--jitter-ms', type=float, default=100.0,
+                            help='Latency varies uniformly by up to this much either way')
+        parser.add_argument('--error-rate', type=float, default=0.0,
+                            help='Fraction of requests answered with 429/500 (0-1)')
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        config = StubConfig(
+            latency_ms=options['latency_ms'],
+            jitter_ms=options['jitter_ms'],
+            error_rate=options['error_rate'],
+            seed=options['seed'],
+        )
+        server = make_server(options['host'], options['port'], config)
+        host, port = server.server_address[:2]
+        self.stdout.write(self.style.SUCCESS(
+            f'OpenAI stub listening; export OPENAI_BASE_URL=http://{host}:{port}/v1'
+        ))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(f'Served {config.requests} requests ({config.errors} stubbed errors)')
@@ -0,0 +1,96 @@
+"""
+Offline stand-in for the OpenAI ``chat.completions`` endpoint.
+
+Implements just enough of ``POST /v1/chat/completions`` in JSON mode for the
+chatbot: the reply content is ``{"intent": ..., "params": ...}`` built from
+the local heuristics, after an optional artificial delay, and a configurable
+fraction of requests fail with 500/429 like the real API does under load.
+Point the app at it with ``OPENAI_BASE_URL=http://127.0.0.1:<port>/v1``.
+"""
+from __future__ import annotations
+
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .intent_classifier import rule_intent
+from .param_extraction import extract_params
+
+
+class StubConfig:
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+        self.lock = threading.Lock()
+
+
+def _completion(model, content):
+    return {
+        "id": f"chatcmpl-stub-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+    }
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config = StubConfig()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send(404, {"error": {"message": "Unknown endpoint.", "type": "invalid_request_error"}})
+            return
+
+        config = self.config
+        with config.lock:
+            config.requests += 1
+            delay = max(config.latency_ms + config.random.uniform(-1, 1) * config.jitter_ms, 0)
+            failed = config.random.random() < config.error_rate
+            status = config.random.choice((429, 500)) if failed else 200
+            if failed:
+                config.errors += 1
+        time.sleep(delay / 1000.0)
+
+        if failed:
+            self._send(status, {"error": {"message": "Stubbed failure.", "type": "server_error"}})
+            return
+
+        messages = body.get("messages") or []
+        message = next((m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), "")
+        content = json.dumps({"intent": rule_intent(message), "params": extract_params(message)})
+        self._send(200, _completion(body.get("model", "stub"), content))
+
+
+def make_server(host="127.0.0.1", port=0, config=None):
+    """Build (but do not start) a threaded stub server; port 0 picks a free one."""
+    handler = type("ConfiguredStubHandler", (StubHandler,), {"config": config or StubConfig()})
+    return ThreadingHTTPServer((host, port), handler)
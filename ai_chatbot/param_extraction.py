@@ -0,0 +1,82 @@
+"""
+Single-pass parameter extraction for chatbot messages.
+
+All parameter patterns are folded into one precompiled regex with named
+groups and the message is scanned once with ``finditer``. Numbers are claimed
+by the first pattern that explains them (schedule id, date, room number,
+budget, or a guest/day/night count), and only an unclaimed number falls back
+to being the guest count.
+"""
+from __future__ import annotations
+
+import re
+
+PREFERENCE_KEYWORDS = ("river", "mountain", "sea", "sunset", "forest")
+ACCOMMODATION_KEYWORDS = ("hotel", "inn", "accommodation")
+
+PARAM_RE = re.compile(
+    r"""
+    (?P<sched>sched(?P<sched_num>\d+))
+    | (?P<date>\d{4}-\d{2}-\d{2})
+    | room\s*(?P<room>\d+)
+    | (?:budget|under|below|less\ than)\s*[:\-]?\s*(?P<budget>\d+)
+    | (?P<count>\d+)\s*(?:
+          (?P<guest_unit>guest|people|person|pax)
+        | (?P<day_unit>day)
+        | (?P<night_unit>night)
+      )?
+    | \bin\s+(?=(?P<location>[a-z\s]+)$)
+    | (?P<keyword>hotel|inn|accommodation|river|mountain|sea|sunset|forest)
+    """,
+    re.VERBOSE,
+)
+
+
+def extract_params(message):
+    text = (message or "").strip().lower()
+    params = {}
+    dates = []
+    keywords = set()
+    first_bare_number = None
+
+    for match in PARAM_RE.finditer(text):
+        if match.group("sched"):
+            # Schedule ids are stored as "Sched00001"; restore the casing.
+            params.setdefault("sched_id", f"Sched{match.group('sched_num')}")
+        elif match.group("date"):
+            dates.append(match.group("date"))
+        elif match.group("room"):
+            params.setdefault("room_id", match.group("room"))
+        elif match.group("budget"):
+            params.setdefault("budget", int(match.group("budget")))
+        elif match.group("count"):
+            value = int(match.group("count"))
+            if match.group("guest_unit"):
+                params.setdefault("guests", value)
+            elif match.group("day_unit"):
+                params.setdefault("duration_days", value)
+            elif match.group("night_unit"):
+                params.setdefault("nights", value)
+            elif first_bare_number is None:
+                first_bare_number = value
+        elif match.group("location") is not None:
+            params.setdefault("location", match.group("location").strip())
+        elif match.group("keyword"):
+            keywords.add(match.group("keyword"))
+
+    if "guests" not in params and first_bare_number is not None:
+        params["guests"] = first_bare_number
+
+    if len(dates) >= 2:
+        params["check_in"] = dates[0]
+        params["check_out"] = dates[1]
+
+    if keywords.intersection(ACCOMMODATION_KEYWORDS):
+        params["company_type"] = "hotel"
+
+    for keyword in PREFERENCE_KEYWORDS:
+        if keyword in keywords:
+            params["preference"] = keyword
+            break
+
+    return params
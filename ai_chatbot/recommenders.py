@@ -1,14 +1,19 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
+from datetime import datetime
 from decimal import Decimal
-from typing import Iterable, List, Optional
+from typing import List
 
+import numpy as np
 from django.utils import timezone
-from django.db.models import F, Q
 
-from admin_app.models import Accomodation, Room
-from tour_app.models import Tour_Schedule
+from admin_app.models import Room
+from guest_app import inventory
+
+from . import scoring
+from .feature_store import store
+from .keyword_index import tour_index
 
 
 @dataclass
@@ -37,16 +42,11 @@ def _to_decimal(value, default=Decimal("0")):
         return default
 
 
-def _normalize(value: float, min_value: float, max_value: float) -> float:
-    if max_value <= min_value:
-        return 0.0
-    return max(0.0, min(1.0, (value - min_value) / (max_value - min_value)))
-
-
 def _cnn_score(features: List[float]) -> float:
     """
     Lightweight 1D CNN-style scorer with a fixed kernel.
-    This is intentionally simple and dependency-free.
+    This is intentionally simple and dependency-free; ``scoring.cnn_score_batch``
+    is the vectorized equivalent used for ranking.
     """
     if not features:
         return 0.0
@@ -61,134 +61,113 @@ def _cnn_score(features: List[float]) -> float:
     return sum(conv) / len(conv)
 
 
-def _decision_tree_penalty(conditions: Iterable[bool]) -> float:
-    """
-    Simple Decision Tree proxy: penalize failing hard constraints.
-    """
-    if any(conditions):
-        return -10.0
-    return 0.0
-
-
-def recommend_tours(params: dict, limit: int = 3) -> List[RecommendationResult]:
-    now = timezone.now()
-    guests = _to_int(params.get("guests"), default=1)
-    budget = _to_decimal(params.get("budget"), default=Decimal("0"))
-    duration = _to_int(params.get("duration_days"), default=0)
-    preference = str(
+def _tour_preference(params: dict) -> str:
+    return str(
         params.get("preference")
         or params.get("tour_type")
         or params.get("interest")
         or ""
     ).strip().lower()
 
-    schedules = (
-        Tour_Schedule.objects.select_related("tour")
-        .filter(end_time__gte=now)
-        .exclude(status="cancelled")
-        .annotate(slots_left=F("slots_available") - F("slots_booked"))
-    )
 
-    prices = [float(s.price) for s in schedules] or [0.0]
-    min_price, max_price = min(prices), max(prices)
+def _rank_tours(candidates: scoring.TourCandidates, params: dict, limit: int) -> List[RecommendationResult]:
+    preference = _tour_preference(params)
+    scores, eligible = scoring.score_tours(
+        candidates,
+        guests=_to_int(params.get("guests"), default=1),
+        budget=_to_decimal(params.get("budget"), default=Decimal("0")),
+        duration=_to_int(params.get("duration_days"), default=0),
+        preference=preference,
+        preference_tours=tour_index.lookup(preference) if preference else None,
+    )
 
     results = []
-    for schedule in schedules:
-        slots_left = max(schedule.slots_left, 0)
-        if slots_left < guests:
-            continue
-
-        price = float(schedule.price)
-        price_fit = 1.0 if budget <= 0 else float(min(budget / Decimal(price), 1))
-        duration_fit = 1.0 if duration and schedule.duration_days == duration else 0.5 if duration and abs(schedule.duration_days - duration) == 1 else 0.0
-        if not duration:
-            duration_fit = 0.5
-
-        name = (schedule.tour.tour_name or "").lower()
-        desc = (schedule.tour.description or "").lower()
-        preference_fit = 1.0 if preference and (preference in name or preference in desc) else 0.3 if not preference else 0.0
-        availability_fit = min(slots_left, 10) / 10.0
-        price_norm = 1.0 - _normalize(price, min_price, max_price)
-
-        features = [price_fit, duration_fit, preference_fit, availability_fit, price_norm]
-        cnn_score = _cnn_score(features)
-
-        penalty = _decision_tree_penalty([
-            budget > 0 and price > float(budget),
-            duration > 0 and schedule.duration_days not in (duration, duration - 1, duration + 1),
-        ])
-
-        score = cnn_score + penalty
+    for idx in scoring.rank(scores, eligible, limit):
         results.append(
             RecommendationResult(
-                title=schedule.tour.tour_name,
-                subtitle=f"{schedule.sched_id} | PHP {schedule.price} per guest | {schedule.duration_days} day(s)",
-                score=score,
-                meta={"sched_id": schedule.sched_id},
+                title=candidates.titles[idx],
+                subtitle=(
+                    f"{candidates.sched_ids[idx]} | PHP {candidates.price_labels[idx]} per guest"
+                    f" | {candidates.duration_days[idx]} day(s)"
+                ),
+                score=float(scores[idx]),
+                meta={"sched_id": candidates.sched_ids[idx]},
             )
         )
-
-    results.sort(key=lambda item: item.score, reverse=True)
-    return results[:limit]
+    return results
 
 
-def recommend_accommodations(params: dict, limit: int = 3) -> List[RecommendationResult]:
-    guests = _to_int(params.get("guests"), default=1)
-    budget = _to_decimal(params.get("budget"), default=Decimal("0"))
-    location = str(params.get("location") or "").strip().lower()
-    company_type = str(params.get("company_type") or "").strip().lower()
-
-    room_qs = (
-        Room.objects.select_related("accommodation")
-        .filter(status="AVAILABLE")
-        .filter(current_availability__gte=1)
+def _stay_dates(params: dict):
+    """``(check_in, check_out)`` dates from ``params``, or ``None``."""
+    try:
+        check_in = datetime.strptime(str(params.get("check_in") or ""), "%Y-%m-%d").date()
+        check_out = datetime.strptime(str(params.get("check_out") or ""), "%Y-%m-%d").date()
+    except ValueError:
+        return None
+    return (check_in, check_out) if check_out > check_in else None
+
+
+def _booked_rooms(params: dict, booked_by_stay: dict) -> set:
+    """Rooms taken during the requested stay; one query per distinct stay."""
+    stay = _stay_dates(params)
+    if stay is None:
+        return set()
+    if stay not in booked_by_stay:
+        booked_by_stay[stay] = inventory.booked_room_ids(*stay)
+    return booked_by_stay[stay]
+
+
+def _rank_accommodations(candidates: scoring.AccommodationCandidates, params: dict,
+                         limit: int, booked: set = frozenset()) -> List[RecommendationResult]:
+    scores, eligible = scoring.score_accommodations(
+        candidates,
+        guests=_to_int(params.get("guests"), default=1),
+        budget=_to_decimal(params.get("budget"), default=Decimal("0")),
+        location=str(params.get("location") or "").strip().lower(),
+        company_type=str(params.get("company_type") or "").strip().lower(),
     )
-
-    if company_type:
-        room_qs = room_qs.filter(accommodation__company_type__icontains=company_type)
-    else:
-        room_qs = room_qs.filter(
-            Q(accommodation__company_type__icontains="hotel") |
-            Q(accommodation__company_type__icontains="inn")
-        )
-
-    prices = [float(r.price_per_night) for r in room_qs] or [0.0]
-    min_price, max_price = min(prices), max(prices)
+    if booked:
+        eligible = eligible & ~np.isin(candidates.room_ids, list(booked))
 
     results = []
-    for room in room_qs:
-        accom = room.accommodation
-        if room.person_limit and guests > room.person_limit:
-            continue
-
-        price = float(room.price_per_night)
-        price_fit = 1.0 if budget <= 0 else float(min(budget / Decimal(price or 1), 1))
-        capacity_fit = 1.0 if room.person_limit and guests <= room.person_limit else 0.5
-        location_fit = 1.0 if location and location in (accom.location or "").lower() else 0.4 if not location else 0.0
-        company_fit = 1.0 if company_type and company_type in (accom.company_type or "").lower() else 0.5
-        price_norm = 1.0 - _normalize(price, min_price, max_price)
-
-        features = [price_fit, capacity_fit, location_fit, company_fit, price_norm]
-        cnn_score = _cnn_score(features)
-
-        penalty = _decision_tree_penalty([
-            budget > 0 and price > float(budget),
-            room.status != "AVAILABLE",
-            room.current_availability is not None and room.current_availability <= 0,
-        ])
-
-        score = cnn_score + penalty
+    for idx in scoring.rank(scores, eligible, limit):
         results.append(
             RecommendationResult(
-                title=f"{accom.company_name} - {room.room_name}",
-                subtitle=f"{accom.location} | PHP {room.price_per_night} per night | {room.person_limit} pax",
-                score=score,
-                meta={"room_id": room.room_id, "accom_id": accom.accom_id},
+                title=candidates.titles[idx],
+                subtitle=(
+                    f"{candidates.location_labels[idx]} | PHP {candidates.price_labels[idx]} per night"
+                    f" | {candidates.person_limits[idx]} pax"
+                ),
+                score=float(scores[idx]),
+                meta={"room_id": candidates.room_ids[idx], "accom_id": candidates.accom_ids[idx]},
             )
         )
+    return results
+
+
+def recommend_tours(params: dict, limit: int = 3) -> List[RecommendationResult]:
+    return _rank_tours(store.tour_candidates(timezone.now()), params, limit)
+
+
+def recommend_accommodations(params: dict, limit: int = 3) -> List[RecommendationResult]:
+    booked = _booked_rooms(params, {})
+    return _rank_accommodations(store.accommodation_candidates(), params, limit, booked)
+
+
+def recommend_tours_batch(profiles: List[dict], limit: int = 3) -> List[List[RecommendationResult]]:
+    """Score every profile against one snapshot of the tour candidates."""
+    candidates = store.tour_candidates(timezone.now())
+    return [_rank_tours(candidates, params, limit) for params in profiles]
+
 
-    results.sort(key=lambda item: item.score, reverse=True)
-    return results[:limit]
+def recommend_accommodations_batch(profiles: List[dict], limit: int = 3) -> List[List[RecommendationResult]]:
+    """Score every profile against one snapshot of the room candidates."""
+    candidates = store.accommodation_candidates()
+    booked_by_stay = {}
+    return [
+        _rank_accommodations(candidates, params, limit, _booked_rooms(params, booked_by_stay))
+        for params in profiles
+    ]
 
 
 def calculate_accommodation_billing(room: Room, check_in, check_out) -> Decimal:
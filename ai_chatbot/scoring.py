@@ -0,0 +1,334 @@
+"""
+Columnar scoring engine for the chatbot recommenders.
+
+Candidate rows are loaded once into NumPy arrays and every feature, the
+fixed-kernel convolution and the decision-tree penalty are evaluated as
+array operations. The arithmetic mirrors the original per-row scorer step
+for step so that scores (and therefore rankings) are unchanged.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, fields
+from decimal import Decimal
+from typing import List
+
+import numpy as np
+from django.db.models import F
+from django.utils import timezone
+
+from admin_app.models import Room
+from tour_app.models import Tour_Schedule
+
+CNN_KERNEL = (0.25, 0.5, 0.25)
+PENALTY = -10.0
+
+
+TOUR_COLUMNS = (
+    "sched_id",
+    "tour_id",
+    "tour__tour_name",
+    "tour__description",
+    "price",
+    "duration_days",
+    "slots_left",
+    "end_time",
+)
+
+ROOM_COLUMNS = (
+    "room_id",
+    "accommodation_id",
+    "accommodation__company_name",
+    "room_name",
+    "accommodation__location",
+    "accommodation__company_type",
+    "price_per_night",
+    "person_limit",
+    "current_availability",
+    "status",
+)
+
+
+class _Columns:
+    def __len__(self):
+        return len(self.prices)
+
+    def take(self, rows):
+        """Return a copy restricted to the given row indices."""
+        picked = {}
+        for field in fields(self):
+            column = getattr(self, field.name)
+            if isinstance(column, np.ndarray):
+                picked[field.name] = column[rows]
+            else:
+                picked[field.name] = [column[i] for i in rows]
+        return type(self)(**picked)
+
+
+@dataclass
+class TourCandidates(_Columns):
+    sched_ids: List[str]
+    tour_ids: List[str]
+    titles: List[str]
+    price_labels: List[Decimal]
+    names: np.ndarray
+    descriptions: np.ndarray
+    prices: np.ndarray
+    duration_days: np.ndarray
+    slots_left: np.ndarray
+    end_times: np.ndarray
+
+    @classmethod
+    def from_rows(cls, rows):
+        columns = list(zip(*rows)) if rows else [()] * len(TOUR_COLUMNS)
+        sched_ids, tour_ids, names, descriptions, prices, durations, slots, end_times = columns
+        return cls(
+            sched_ids=list(sched_ids),
+            tour_ids=list(tour_ids),
+            titles=list(names),
+            price_labels=list(prices),
+            names=_lower_array(names),
+            descriptions=_lower_array(descriptions),
+            prices=np.array([float(p) for p in prices], dtype=np.float64),
+            duration_days=np.array(durations, dtype=np.int64),
+            slots_left=np.array(slots, dtype=np.int64),
+            end_times=np.array([t.timestamp() for t in end_times], dtype=np.float64),
+        )
+
+    def active(self, now):
+        """Rows whose schedule has not ended yet at ``now``."""
+        still_open = self.end_times >= now.timestamp()
+        if still_open.all():
+            return self
+        return self.take(np.flatnonzero(still_open))
+
+
+@dataclass
+class AccommodationCandidates(_Columns):
+    room_ids: List[int]
+    accom_ids: List[int]
+    titles: List[str]
+    location_labels: List[str]
+    price_labels: List[Decimal]
+    locations: np.ndarray
+    company_types: np.ndarray
+    prices: np.ndarray
+    person_limits: np.ndarray
+    current_availability: np.ndarray
+    available: np.ndarray
+
+    @classmethod
+    def from_rows(cls, rows):
+        columns = list(zip(*rows)) if rows else [()] * len(ROOM_COLUMNS)
+        (room_ids, accom_ids, company_names, room_names, locations,
+         company_types, prices, limits, availability, statuses) = columns
+        return cls(
+            room_ids=list(room_ids),
+            accom_ids=list(accom_ids),
+            titles=[f"{company} - {room}" for company, room in zip(company_names, room_names)],
+            location_labels=list(locations),
+            price_labels=list(prices),
+            locations=_lower_array(locations),
+            company_types=_lower_array(company_types),
+            prices=np.array([float(p) for p in prices], dtype=np.float64),
+            person_limits=np.array([limit or 0 for limit in limits], dtype=np.int64),
+            current_availability=np.array(
+                [1 if value is None else value for value in availability], dtype=np.int64
+            ),
+            available=np.array([status == "AVAILABLE" for status in statuses], dtype=bool),
+        )
+
+
+def _lower_array(values) -> np.ndarray:
+    return np.array([(value or "").lower() for value in values], dtype=str)
+
+
+def tour_queryset(now=None):
+    """Bookable schedules with their ``slots_left`` annotation."""
+    now = now or timezone.now()
+    return (
+        Tour_Schedule.objects.filter(end_time__gte=now)
+        .exclude(status="cancelled")
+        .annotate(slots_left=F("slots_available") - F("slots_booked"))
+    )
+
+
+def room_queryset():
+    """Rooms that can currently take a booking."""
+    return Room.objects.filter(status="AVAILABLE", current_availability__gte=1)
+
+
+def load_tour_candidates(now=None) -> TourCandidates:
+    """Fetch every bookable schedule in a single query as columns."""
+    return TourCandidates.from_rows(list(tour_queryset(now).values_list(*TOUR_COLUMNS)))
+
+
+def load_accommodation_candidates() -> AccommodationCandidates:
+    """Fetch every available room with its accommodation in a single query."""
+    return AccommodationCandidates.from_rows(list(room_queryset().values_list(*ROOM_COLUMNS)))
+
+
+def cnn_score_batch(features: np.ndarray) -> np.ndarray:
+    """
+    Vectorized form of ``recommenders._cnn_score`` for a (rows, 5) matrix.
+
+    Terms are accumulated left to right exactly like the scalar loop so the
+    floating point results are bit-for-bit identical.
+    """
+    rows, width = features.shape
+    if width == 0:
+        return np.zeros(rows)
+    if width < 3:
+        return features.sum(axis=1) / width
+
+    windows = width - 2
+    total = np.zeros(rows)
+    for i in range(windows):
+        conv = np.zeros(rows)
+        for offset, weight in enumerate(CNN_KERNEL):
+            conv = conv + features[:, i + offset] * weight
+        total = total + conv
+    return total / windows
+
+
+def normalize_batch(values: np.ndarray) -> np.ndarray:
+    if values.size == 0:
+        return values
+    min_value, max_value = values.min(), values.max()
+    if max_value <= min_value:
+        return np.zeros_like(values)
+    return np.clip((values - min_value) / (max_value - min_value), 0.0, 1.0)
+
+
+def price_fit_batch(prices: np.ndarray, budget: Decimal) -> np.ndarray:
+    """
+    ``min(budget / price, 1)`` per row, divided in ``Decimal`` as the scalar
+    scorer did (float division differs in the last bit for budgets such as
+    ``333.33``). Each distinct price is divided once.
+    """
+    distinct, inverse = np.unique(prices, return_inverse=True)
+    fits = np.array([float(min(budget / Decimal(price), 1)) for price in distinct.tolist()])
+    return fits[inverse]
+
+
+def contains(haystack: np.ndarray, needle: str) -> np.ndarray:
+    if not needle:
+        return np.zeros(haystack.shape, dtype=bool)
+    return np.char.find(haystack, needle) >= 0
+
+
+def top_k_indices(scores: np.ndarray, limit: int) -> np.ndarray:
+    """
+    Indices of the ``limit`` best scores, best first.
+
+    Uses ``argpartition`` to avoid sorting every candidate; ties are broken
+    by original row order, matching a stable descending sort.
+    """
+    if limit <= 0 or scores.size == 0:
+        return np.empty(0, dtype=np.int64)
+    if scores.size > limit:
+        partition = np.argpartition(-scores, limit - 1)[:limit]
+        candidates = np.flatnonzero(scores >= scores[partition].min())
+    else:
+        candidates = np.arange(scores.size)
+    order = np.lexsort((candidates, -scores[candidates]))
+    return candidates[order][:limit]
+
+
+def score_tours(candidates: TourCandidates, guests: int, budget: Decimal,
+                duration: int, preference: str, preference_tours=None):
+    """
+    Return ``(scores, eligible)`` arrays aligned with ``candidates``.
+
+    ``preference_tours`` is an optional set of tour ids already known to
+    match ``preference`` (see ``keyword_index``); without it the preference
+    is matched as a substring of the name and description.
+    """
+    prices = candidates.prices
+    durations = candidates.duration_days
+    slots_left = np.maximum(candidates.slots_left, 0)
+    eligible = slots_left >= guests
+
+    # Floats are accepted too, read back as the decimal they print as
+    budget = Decimal(str(budget))
+    if budget > 0:
+        safe_prices = np.where(prices > 0, prices, 1.0)
+        price_fit = np.where(prices > 0, price_fit_batch(safe_prices, budget), 1.0)
+    else:
+        price_fit = np.ones(prices.shape)
+
+    if duration:
+        gap = np.abs(durations - duration)
+        duration_fit = np.where(gap == 0, 1.0, np.where(gap == 1, 0.5, 0.0))
+    else:
+        duration_fit = np.full(prices.shape, 0.5)
+
+    if preference and preference_tours is not None:
+        matches = np.array([tour_id in preference_tours for tour_id in candidates.tour_ids], dtype=bool)
+        preference_fit = np.where(matches, 1.0, 0.0)
+    elif preference:
+        matches = contains(candidates.names, preference) | contains(candidates.descriptions, preference)
+        preference_fit = np.where(matches, 1.0, 0.0)
+    else:
+        preference_fit = np.full(prices.shape, 0.3)
+
+    availability_fit = np.minimum(slots_left, 10) / 10.0
+    price_norm = 1.0 - normalize_batch(prices)
+
+    features = np.column_stack([price_fit, duration_fit, preference_fit, availability_fit, price_norm])
+    failed = np.zeros(prices.shape, dtype=bool)
+    if budget > 0:
+        failed |= prices > float(budget)
+    if duration > 0:
+        failed |= np.abs(durations - duration) > 1
+
+    scores = cnn_score_batch(features) + np.where(failed, PENALTY, 0.0)
+    return scores, eligible
+
+
+def score_accommodations(candidates: AccommodationCandidates, guests: int, budget: Decimal,
+                         location: str, company_type: str):
+    """Return ``(scores, eligible)`` arrays aligned with ``candidates``."""
+    budget = Decimal(str(budget))
+    if company_type:
+        in_scope = contains(candidates.company_types, company_type)
+    else:
+        in_scope = contains(candidates.company_types, "hotel") | contains(candidates.company_types, "inn")
+
+    prices = candidates.prices
+    limits = candidates.person_limits
+    within_limit = (limits == 0) | (guests <= limits)
+    eligible = in_scope & within_limit
+
+    # Price normalisation spans the in-scope rooms, as the queryset did.
+    price_norm = np.zeros(prices.shape)
+    price_norm[in_scope] = normalize_batch(prices[in_scope])
+    price_norm = 1.0 - price_norm
+
+    if budget > 0:
+        price_fit = price_fit_batch(np.where(prices != 0, prices, 1.0), budget)
+    else:
+        price_fit = np.ones(prices.shape)
+
+    capacity_fit = np.where((limits != 0) & (guests <= limits), 1.0, 0.5)
+    if location:
+        location_fit = np.where(contains(candidates.locations, location), 1.0, 0.0)
+    else:
+        location_fit = np.full(prices.shape, 0.4)
+    if company_type:
+        company_fit = np.where(in_scope, 1.0, 0.5)
+    else:
+        company_fit = np.full(prices.shape, 0.5)
+
+    features = np.column_stack([price_fit, capacity_fit, location_fit, company_fit, price_norm])
+    failed = ~candidates.available | (candidates.current_availability <= 0)
+    if budget > 0:
+        failed |= prices > float(budget)
+
+    scores = cnn_score_batch(features) + np.where(failed, PENALTY, 0.0)
+    return scores, eligible
+
+
+def rank(scores: np.ndarray, eligible: np.ndarray, limit: int) -> np.ndarray:
+    """Row indices of the best ``limit`` eligible candidates."""
+    rows = np.flatnonzero(eligible)
+    return rows[top_k_indices(scores[rows], limit)]
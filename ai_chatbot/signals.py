@@ -0,0 +1,43 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from admin_app.models import Accomodation, Room
+from tour_app.models import Tour_Add, Tour_Schedule
+from tour_app.translation_models import TourAddTranslation
+
+from .feature_store import store
+from .keyword_index import tour_index
+
+
+def _mark(method, key):
+    # Mark now so this process never serves the old row, and again after
+    # commit so a read that raced the transaction is corrected.
+    method([key])
+    transaction.on_commit(lambda: method([key]))
+
+
+@receiver([post_save, post_delete], sender=Tour_Schedule)
+def tour_schedule_changed(sender, instance, **kwargs):
+    _mark(store.mark_schedules, instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Tour_Add)
+def tour_changed(sender, instance, **kwargs):
+    _mark(store.mark_tours, instance.pk)
+    _mark(tour_index.mark_tours, instance.pk)
+
+
+@receiver([post_save, post_delete], sender=TourAddTranslation)
+def tour_translation_changed(sender, instance, **kwargs):
+    _mark(tour_index.mark_tours, instance.tour_id)
+
+
+@receiver([post_save, post_delete], sender=Room)
+def room_changed(sender, instance, **kwargs):
+    _mark(store.mark_rooms, instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Accomodation)
+def accommodation_changed(sender, instance, **kwargs):
+    _mark(store.mark_accommodations, instance.pk)
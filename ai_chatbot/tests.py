@@ -1,17 +1,38 @@
+import asyncio
+import io
 import json
 import os
-from datetime import timedelta
+import threading
+import time
+from datetime import date, timedelta
 from decimal import Decimal
+from types import SimpleNamespace
 from unittest.mock import patch
 
-from django.test import Client, TestCase
+import numpy as np
+from django.core.cache import caches
+from django.core.management import call_command
+from django.test import AsyncClient, Client, SimpleTestCase, TestCase, override_settings
 from django.utils import timezone
 
+from admin_app.models import Accomodation, Room
+from ai_chatbot import intent_cache, intent_classifier, llm_client, scoring
+from ai_chatbot.feature_store import GENERATION_KEY, incr_counter, state_cache, store
+from ai_chatbot.keyword_index import GENERATION_KEY as INDEX_GENERATION_KEY, tokenize, tour_index
+from ai_chatbot.openai_stub import StubConfig, make_server
+from ai_chatbot.param_extraction import extract_params
+from ai_chatbot.recommenders import _cnn_score, recommend_accommodations, recommend_tours
+from ai_chatbot.views import _aopenai_extract_intent_and_params, _openai_extract_intent_and_params
+from guest_app import inventory
+from guest_app.models import AccommodationBooking, Guest
 from tour_app.models import Admission_Rates, Tour_Add, Tour_Schedule
+from tour_app.translation_models import TourAddTranslation
 
 
 class OpenAIChatEndpointTests(TestCase):
     def setUp(self):
+        store.clear()
+        tour_index.clear()
         self.client = Client()
         self.url = "/api/chat/"
 
@@ -80,3 +101,632 @@ class OpenAIChatEndpointTests(TestCase):
         self.assertEqual(response.status_code, 200)
         text = response.json().get("fulfillmentText", "")
         self.assertIn("Top recommendations for you", text)
+
+
+    @patch.dict(os.environ, {"OPENAI_API_KEY": ""}, clear=False)
+    def test_stream_mode_emits_intent_then_lines(self):
+        payload = json.dumps({"message": "recommend a river tour for 2 guests under 700"})
+        json_text = self.client.post(
+            self.url, data=payload, content_type="application/json"
+        ).json()["fulfillmentText"]
+
+        response = self.client.post(
+            self.url,
+            data=payload,
+            content_type="application/json",
+            HTTP_ACCEPT="text/event-stream",
+        )
+
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        frames = [
+            frame for frame in b"".join(response.streaming_content).decode().split("\n\n")
+            if frame.startswith("event:")
+        ]
+        events = [
+            (frame.split("\n")[0][len("event: "):], json.loads(frame.split("\n")[1][len("data: "):]))
+            for frame in frames
+        ]
+        self.assertEqual(events[0], ("intent", {"intent": "get_recommendation", "source": "heuristic_no_api_key_or_sdk"}))
+        self.assertEqual([name for name, _ in events[1:-1]], ["line"] * (len(events) - 2))
+        self.assertEqual("\n".join(data["text"] for _, data in events[1:-1]), json_text)
+        self.assertEqual(events[-1], ("done", {"fulfillmentText": json_text}))
+
+class VectorizedScoringTests(TestCase):
+    def setUp(self):
+        store.clear()
+        tour_index.clear()
+        now = timezone.now()
+        river = Tour_Add.objects.create(
+            tour_id="00001",
+            tour_name="River Adventure",
+            description="A relaxing river and nature tour.",
+        )
+        mountain = Tour_Add.objects.create(
+            tour_id="00002",
+            tour_name="Mountain Trek",
+            description="Forest trails and a sunset view.",
+        )
+        rows = [
+            (river, "500.00", 20, 2, 1),
+            (river, "650.00", 5, 4, 2),
+            (mountain, "900.00", 30, 0, 3),
+            (mountain, "450.00", 12, 9, 1),
+            (mountain, "450.00", 12, 9, 1),
+        ]
+        for tour, price, available, booked, days in rows:
+            Tour_Schedule.objects.create(
+                tour=tour,
+                start_time=now + timedelta(days=1),
+                end_time=now + timedelta(days=1 + days),
+                price=Decimal(price),
+                slots_available=available,
+                slots_booked=booked,
+                duration_days=days,
+                status="active",
+            )
+
+    def _reference_scores(self, guests, budget, duration, preference):
+        """Per-row scorer as it existed before the columnar engine."""
+        schedules = list(
+            Tour_Schedule.objects.select_related("tour").exclude(status="cancelled")
+        )
+        prices = [float(s.price) for s in schedules]
+        min_price, max_price = min(prices), max(prices)
+        scores = {}
+        for schedule in schedules:
+            slots_left = max(schedule.slots_available - schedule.slots_booked, 0)
+            if slots_left < guests:
+                continue
+            price = float(schedule.price)
+            price_fit = 1.0 if budget <= 0 else float(min(Decimal(budget) / Decimal(price), 1))
+            if duration:
+                gap = abs(schedule.duration_days - duration)
+                duration_fit = 1.0 if gap == 0 else 0.5 if gap == 1 else 0.0
+            else:
+                duration_fit = 0.5
+            text = f"{schedule.tour.tour_name} {schedule.tour.description}".lower()
+            preference_fit = 0.3 if not preference else 1.0 if preference in text else 0.0
+            price_norm = 1.0 - (
+                0.0 if max_price <= min_price
+                else max(0.0, min(1.0, (price - min_price) / (max_price - min_price)))
+            )
+            features = [price_fit, duration_fit, preference_fit, min(slots_left, 10) / 10.0, price_norm]
+            failed = (budget > 0 and price > float(budget)) or (
+                duration > 0 and abs(schedule.duration_days - duration) > 1
+            )
+            scores[schedule.sched_id] = _cnn_score(features) + (-10.0 if failed else 0.0)
+        return scores
+
+    def test_scores_match_reference_scorer(self):
+        candidates = scoring.load_tour_candidates()
+        for guests, budget, duration, preference in [
+            (1, 0, 0, ""),
+            (2, 700, 1, "river"),
+            (4, 600, 2, "sunset"),
+            (10, 1000, 3, "forest"),
+        ]:
+            scores, eligible = scoring.score_tours(candidates, guests, float(budget), duration, preference)
+            vectorized = {
+                candidates.sched_ids[i]: float(scores[i]) for i in range(len(candidates)) if eligible[i]
+            }
+            self.assertEqual(vectorized, self._reference_scores(guests, budget, duration, preference))
+
+    def test_price_fit_matches_reference_for_decimal_edge_prices(self):
+        Tour_Schedule.objects.all().delete()
+        tour = Tour_Add.objects.get(tour_id="00001")
+        now = timezone.now()
+        for price in ("0.41", "0.87"):
+            Tour_Schedule.objects.create(
+                tour=tour,
+                start_time=now + timedelta(days=1),
+                end_time=now + timedelta(days=2),
+                price=Decimal(price),
+                slots_available=5,
+                duration_days=1,
+                status="active",
+            )
+        candidates = scoring.load_tour_candidates()
+        # 0.15 / 0.41 and 0.40 / 0.87 give a different last bit in float
+        # than in Decimal, and it carries through to the score
+        for budget in ("0.15", "0.40", "0.41", "1"):
+            scores, eligible = scoring.score_tours(candidates, 1, Decimal(budget), 0, "")
+            vectorized = {
+                candidates.sched_ids[i]: float(scores[i]) for i in range(len(candidates)) if eligible[i]
+            }
+            self.assertEqual(vectorized, self._reference_scores(1, Decimal(budget), 0, ""))
+
+    def test_top_k_matches_stable_sort(self):
+        scores = np.array([0.5, 0.9, 0.5, 0.9, 0.1, 0.5])
+        expected = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)
+        for limit in range(1, len(scores) + 2):
+            self.assertEqual(list(scoring.top_k_indices(scores, limit)), expected[:limit])
+
+    def test_recommend_tours_returns_best_first(self):
+        results = recommend_tours({"guests": 2, "budget": 700, "preference": "river"}, limit=2)
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results[0].title, "River Adventure")
+        self.assertGreaterEqual(results[0].score, results[1].score)
+
+
+class CandidateFeatureStoreTests(TestCase):
+    def setUp(self):
+        store.clear()
+        tour_index.clear()
+        now = timezone.now()
+        self.tour = Tour_Add.objects.create(
+            tour_id="00001",
+            tour_name="River Adventure",
+            description="A relaxing river and nature tour.",
+        )
+        self.schedule = Tour_Schedule.objects.create(
+            tour=self.tour,
+            start_time=now + timedelta(days=1),
+            end_time=now + timedelta(days=2),
+            price=Decimal("500.00"),
+            slots_available=20,
+            duration_days=1,
+            status="active",
+        )
+        self.hotel = Accomodation.objects.create(
+            company_name="Bayawan Bay Hotel",
+            email_address="hotel@example.com",
+            location="Bayawan City",
+            company_type="Hotel",
+            password="secret",
+            phone_number="09170000000",
+        )
+        self.room = Room.objects.create(
+            accommodation=self.hotel,
+            room_name="Deluxe",
+            person_limit=4,
+            price_per_night=Decimal("1500.00"),
+        )
+
+    def test_unchanged_data_needs_no_queries(self):
+        recommend_tours({"guests": 2})
+        recommend_accommodations({"guests": 2})
+
+        with self.assertNumQueries(0):
+            recommend_tours({"guests": 2})
+            recommend_accommodations({"guests": 2, "location": "bayawan"})
+
+    def test_saves_refresh_only_changed_rows(self):
+        recommend_tours({"guests": 2})
+        recommend_accommodations({"guests": 2})
+
+        self.tour.tour_name = "Sunset River Cruise"
+        self.tour.save()
+        self.room.price_per_night = Decimal("1200.00")
+        self.room.save()
+
+        self.assertEqual(recommend_tours({"guests": 2})[0].title, "Sunset River Cruise")
+        self.assertIn("PHP 1200.00", recommend_accommodations({"guests": 2})[0].subtitle)
+
+    def test_deleted_rows_are_dropped(self):
+        recommend_tours({"guests": 2})
+        recommend_accommodations({"guests": 2})
+
+        self.schedule.delete()
+        self.room.delete()
+
+        self.assertEqual(recommend_tours({"guests": 2}), [])
+        self.assertEqual(recommend_accommodations({"guests": 2}), [])
+
+    def test_changes_from_other_processes_are_seen_despite_local_marks(self):
+        recommend_tours({"guests": 2})
+        recommend_accommodations({"guests": 2})
+
+        # A local save leaves dirty keys; meanwhile another process renames
+        # the tour (simulated by an unsignalled update plus its bump).
+        self.room.price_per_night = Decimal("1200.00")
+        self.room.save()
+        Tour_Add.objects.filter(pk=self.tour.pk).update(tour_name="Sunset River Cruise")
+        incr_counter(GENERATION_KEY, state_cache())
+
+        self.assertEqual(recommend_tours({"guests": 2})[0].title, "Sunset River Cruise")
+        self.assertIn("PHP 1200.00", recommend_accommodations({"guests": 2})[0].subtitle)
+
+    @override_settings(CHATBOT_STORE_MAX_AGE=60)
+    def test_rows_are_reloaded_after_max_age(self):
+        recommend_tours({"guests": 2})
+        Tour_Add.objects.filter(pk=self.tour.pk).update(tour_name="Sunset River Cruise")
+        self.assertEqual(recommend_tours({"guests": 2})[0].title, "River Adventure")
+
+        later = time.monotonic() + 61
+        with patch("ai_chatbot.feature_store.time.monotonic", return_value=later):
+            self.assertEqual(recommend_tours({"guests": 2})[0].title, "Sunset River Cruise")
+
+    def test_rooms_booked_during_the_stay_are_skipped(self):
+        guest = Guest.objects.create(
+            username="stayer", email="stayer@example.com", first_name="Sta", last_name="Yer",
+            country_of_origin="PH", phone_number="09170000005", sex="F",
+        )
+        booking = AccommodationBooking.objects.create(
+            guest=guest, accommodation=self.hotel, room=self.room,
+            check_in=date(2026, 12, 24), check_out=date(2026, 12, 27),
+        )
+        self.assertTrue(inventory.reserve_nights(booking))
+        recommend_accommodations({"guests": 2})
+
+        with self.assertNumQueries(1):
+            clash = recommend_accommodations({"guests": 2, "check_in": "2026-12-26", "check_out": "2026-12-28"})
+        self.assertEqual(clash, [])
+        after = recommend_accommodations({"guests": 2, "check_in": "2026-12-27", "check_out": "2026-12-28"})
+        self.assertEqual([result.meta["room_id"] for result in after], [self.room.room_id])
+
+
+class TourKeywordIndexTests(TestCase):
+    def setUp(self):
+        store.clear()
+        tour_index.clear()
+        self.river = Tour_Add.objects.create(
+            tour_id="00001",
+            tour_name="River Adventure",
+            description="A relaxing riverside and nature tour.",
+        )
+        self.mountain = Tour_Add.objects.create(
+            tour_id="00002",
+            tour_name="Mountain Trek",
+            description="Forest trails and a sunset view.",
+        )
+        TourAddTranslation.objects.create(
+            tour=self.mountain,
+            language="es",
+            tour_name="Caminata de Montaña",
+            description="Senderos del bosque y vista del atardecer.",
+        )
+
+    def test_tokenize_folds_case_and_accents(self):
+        self.assertEqual(tokenize("Río Montaña!"), ["rio", "montana"])
+
+    def test_lookup_matches_prefixes_across_languages(self):
+        self.assertEqual(tour_index.lookup("river"), {"00001"})
+        self.assertEqual(tour_index.lookup("forest sunset"), {"00002"})
+        self.assertEqual(tour_index.lookup("montaña"), {"00002"})
+        self.assertEqual(tour_index.lookup("bosque", language="es"), {"00002"})
+        self.assertEqual(tour_index.lookup("bosque", language="tl"), set())
+        self.assertEqual(tour_index.lookup("volcano"), set())
+
+    def test_saves_reindex_only_changed_tours(self):
+        tour_index.lookup("river")
+
+        TourAddTranslation.objects.create(
+            tour=self.river,
+            language="ceb",
+            tour_name="Suba nga Panimpalad",
+            description="Malipayong biyahe sa suba.",
+        )
+        self.mountain.description = "Forest trails."
+        self.mountain.save()
+
+        self.assertEqual(tour_index.lookup("suba"), {"00001"})
+        self.assertEqual(tour_index.lookup("sunset"), set())
+        with self.assertNumQueries(0):
+            self.assertEqual(tour_index.lookup("forest"), {"00002"})
+
+    def test_edits_from_other_processes_are_indexed_despite_local_marks(self):
+        tour_index.lookup("river")
+
+        self.mountain.description = "Forest trails."
+        self.mountain.save()
+        # Another process renames the river tour and bumps the generation
+        Tour_Add.objects.filter(pk=self.river.pk).update(tour_name="Lake Adventure")
+        incr_counter(INDEX_GENERATION_KEY, state_cache())
+
+        self.assertEqual(tour_index.lookup("lake"), {"00001"})
+        self.assertEqual(tour_index.lookup("sunset"), set())
+
+
+class BatchRecommendationEndpointTests(TestCase):
+    def setUp(self):
+        store.clear()
+        tour_index.clear()
+        self.client = Client()
+        self.url = "/api/recommend/batch/"
+        now = timezone.now()
+        tour = Tour_Add.objects.create(
+            tour_id="00001",
+            tour_name="River Adventure",
+            description="A relaxing river and nature tour.",
+        )
+        Tour_Schedule.objects.create(
+            tour=tour,
+            start_time=now + timedelta(days=1),
+            end_time=now + timedelta(days=2),
+            price=Decimal("500.00"),
+            slots_available=5,
+            duration_days=1,
+            status="active",
+        )
+        hotel = Accomodation.objects.create(
+            company_name="Bayawan Bay Hotel",
+            email_address="hotel@example.com",
+            location="Bayawan City",
+            company_type="Hotel",
+            password="secret",
+            phone_number="09170000000",
+        )
+        Room.objects.create(
+            accommodation=hotel,
+            room_name="Deluxe",
+            person_limit=4,
+            price_per_night=Decimal("1500.00"),
+        )
+
+    def _post(self, payload):
+        return self.client.post(self.url, data=json.dumps(payload), content_type="application/json")
+
+    def test_profiles_are_answered_in_order(self):
+        response = self._post({
+            "limit": 2,
+            "profiles": [
+                {"guests": 2, "preference": "river"},
+                {"type": "accommodation", "guests": 2, "location": "bayawan"},
+                {"guests": 10},
+            ],
+        })
+
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        self.assertEqual([r["type"] for r in results], ["tour", "accommodation", "tour"])
+        self.assertEqual(results[0]["results"][0]["title"], "River Adventure")
+        self.assertEqual(results[1]["results"][0]["meta"]["accom_id"], Accomodation.objects.get().accom_id)
+        self.assertEqual(results[2]["results"], [])
+
+    def test_candidates_are_loaded_once_per_type(self):
+        self._post({"profiles": [{"guests": 1}, {"type": "accommodation"}]})
+
+        with self.assertNumQueries(0):
+            response = self._post({"profiles": [{"guests": n} for n in range(1, 30)]})
+        self.assertEqual(len(response.json()["results"]), 29)
+
+    def test_invalid_payloads_are_rejected(self):
+        self.assertEqual(self._post({"profiles": "nope"}).status_code, 400)
+        self.assertEqual(self._post({"profiles": [{"type": "cruise"}]}).status_code, 400)
+        self.assertEqual(self._post({"profiles": [{}] * 101}).status_code, 400)
+
+    def test_non_object_payloads_are_rejected(self):
+        for payload in ([], "x", 3, None):
+            response = self._post(payload)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json()["success"], False)
+
+
+class FakeOpenAI:
+    calls = 0
+    instances = 0
+
+    def __init__(self, api_key=None, **kwargs):
+        FakeOpenAI.instances += 1
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, **kwargs):
+        FakeOpenAI.calls += 1
+        content = json.dumps({"intent": "get_recommendation", "params": {"guests": 2}})
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+@override_settings(CHATBOT_LOCAL_INTENT_THRESHOLD=1.1)
+@patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}, clear=False)
+@patch("ai_chatbot.llm_client.OpenAI", FakeOpenAI)
+class IntentCacheTests(TestCase):
+    def setUp(self):
+        caches["chatbot"].clear()
+        llm_client.reset()
+        FakeOpenAI.calls = 0
+
+    def test_normalize_message_ignores_case_spacing_and_punctuation(self):
+        self.assertEqual(
+            intent_cache.normalize_message("  Recommend a   TOUR for 2 guests! "),
+            "recommend a tour for 2 guests",
+        )
+
+    def test_repeated_messages_skip_the_llm(self):
+        first = _openai_extract_intent_and_params("recommend a tour for 2 guests")
+        second = _openai_extract_intent_and_params("Recommend a tour for 2 guests.")
+
+        self.assertEqual(FakeOpenAI.calls, 1)
+        self.assertEqual(first["source"], "openai")
+        self.assertEqual(second["source"], "openai_cache")
+        self.assertEqual(second["params"], {"guests": 2})
+        self.assertEqual(intent_cache.stats()["hits"], 1)
+        self.assertEqual(intent_cache.stats()["misses"], 1)
+
+    def test_model_is_part_of_the_key(self):
+        _openai_extract_intent_and_params("recommend a tour")
+        with patch.dict(os.environ, {"OPENAI_MODEL": "another-model"}):
+            _openai_extract_intent_and_params("recommend a tour")
+
+        self.assertEqual(FakeOpenAI.calls, 2)
+
+
+class LocalIntentClassifierTests(SimpleTestCase):
+    def test_heldout_accuracy_and_latency(self):
+        heldout = intent_classifier.load_examples("heldout")
+        intent_classifier.predict("warm up")
+
+        correct = 0
+        started = time.perf_counter()
+        for message, expected in heldout:
+            correct += intent_classifier.predict(message).intent == expected
+        elapsed = time.perf_counter() - started
+
+        accuracy = correct / len(heldout)
+        per_message_us = elapsed / len(heldout) * 1e6
+        print(f"\nlocal intent classifier: accuracy {accuracy:.1%} on {len(heldout)} held-out "
+              f"messages, {per_message_us:.0f} us/message")
+        self.assertGreaterEqual(accuracy, 0.9)
+        self.assertLess(per_message_us, 1000)
+
+    def test_ambiguous_messages_go_to_the_llm(self):
+        self.assertIsNone(intent_classifier.classify_locally("how much will the mountain trek cost", {}))
+        self.assertIsNone(intent_classifier.classify_locally("hello", {}))
+
+    @patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}, clear=False)
+    @patch("ai_chatbot.llm_client.OpenAI", FakeOpenAI)
+    def test_confident_messages_skip_the_llm(self):
+        llm_client.reset()
+        FakeOpenAI.calls = 0
+
+        parsed = _openai_extract_intent_and_params("calculate bill for Sched00001 for 2 guests")
+
+        self.assertEqual(FakeOpenAI.calls, 0)
+        self.assertEqual(parsed["source"], "local_classifier")
+        self.assertEqual(parsed["intent"], "calculate_billing")
+        self.assertEqual(parsed["params"]["guests"], 2)
+
+
+class ParamExtractionTests(SimpleTestCase):
+    def test_tour_message(self):
+        self.assertEqual(
+            extract_params("Recommend a 2 day river tour for 3 guests under 1500 in Bayawan City"),
+            {
+                "duration_days": 2,
+                "guests": 3,
+                "budget": 1500,
+                "location": "bayawan city",
+                "preference": "river",
+            },
+        )
+
+    def test_schedule_id_keeps_stored_casing(self):
+        self.assertEqual(extract_params("bill for SCHED00012 for 4 pax")["sched_id"], "Sched00012")
+
+    def test_room_and_dates(self):
+        params = extract_params("hotel bill for room 12 from 2026-05-01 to 2026-05-04")
+        self.assertEqual(params["room_id"], "12")
+        self.assertEqual(params["check_in"], "2026-05-01")
+        self.assertEqual(params["check_out"], "2026-05-04")
+        self.assertEqual(params["company_type"], "hotel")
+        self.assertNotIn("guests", params)
+
+    def test_unclaimed_number_is_guest_count(self):
+        self.assertEqual(extract_params("tour for 5 under 900"), {"guests": 5, "budget": 900})
+        self.assertEqual(extract_params("room 3 for 2 nights"), {"room_id": "3", "nights": 2})
+
+    def test_preference_priority_follows_keyword_order(self):
+        self.assertEqual(extract_params("a sunset by the river")["preference"], "river")
+
+
+class FakeAsyncOpenAI:
+    instances = 0
+    delay = 0.0
+    in_flight = 0
+    peak = 0
+
+    def __init__(self, api_key=None, **kwargs):
+        FakeAsyncOpenAI.instances += 1
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, **kwargs):
+        cls = FakeAsyncOpenAI
+        cls.in_flight += 1
+        cls.peak = max(cls.peak, cls.in_flight)
+        try:
+            await asyncio.sleep(cls.delay)
+        finally:
+            cls.in_flight -= 1
+        content = json.dumps({"intent": "get_accommodation_recommendation", "params": {"guests": 3}})
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+@override_settings(CHATBOT_LOCAL_INTENT_THRESHOLD=1.1)
+@patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}, clear=False)
+@patch("ai_chatbot.llm_client.AsyncOpenAI", FakeAsyncOpenAI)
+@patch("ai_chatbot.llm_client.OpenAI", FakeOpenAI)
+class PooledLLMClientTests(TestCase):
+    def setUp(self):
+        caches["chatbot"].clear()
+        llm_client.reset()
+        FakeOpenAI.instances = FakeAsyncOpenAI.instances = 0
+        FakeAsyncOpenAI.delay = 0.0
+        FakeAsyncOpenAI.in_flight = FakeAsyncOpenAI.peak = 0
+
+    def test_sync_client_is_reused(self):
+        _openai_extract_intent_and_params("something about tours")
+        _openai_extract_intent_and_params("something else about tours")
+
+        self.assertEqual(FakeOpenAI.instances, 1)
+
+    @override_settings(CHATBOT_LLM_MAX_CONCURRENCY=2)
+    def test_async_calls_share_one_client_and_respect_the_limit(self):
+        FakeAsyncOpenAI.delay = 0.02
+
+        async def run():
+            return await asyncio.gather(
+                *(_aopenai_extract_intent_and_params(f"question number {i}") for i in range(6))
+            )
+
+        results = asyncio.run(run())
+
+        self.assertEqual({r["source"] for r in results}, {"openai"})
+        self.assertEqual(FakeAsyncOpenAI.instances, 1)
+        self.assertEqual(FakeAsyncOpenAI.peak, 2)
+
+    @override_settings(CHATBOT_LLM_TIMEOUT=0.05)
+    def test_slow_llm_falls_back_to_heuristics(self):
+        FakeAsyncOpenAI.delay = 1.0
+
+        result = asyncio.run(_aopenai_extract_intent_and_params("hotel for 2 guests"))
+
+        self.assertEqual(result["source"], "heuristic_fallback")
+        self.assertEqual(result["intent"], "get_accommodation_recommendation")
+
+    async def test_async_endpoint_replies(self):
+        response = await AsyncClient().post(
+            "/api/chat/async/",
+            data=json.dumps({"message": "somewhere to sleep for 3"}),
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("fulfillmentText", response.json())
+
+
+@override_settings(CHATBOT_LOCAL_INTENT_THRESHOLD=1.1, CHATBOT_LLM_MAX_RETRIES=0)
+class OpenAIStubServerTests(SimpleTestCase):
+    databases = {"default"}
+
+    def setUp(self):
+        caches["chatbot"].clear()
+        llm_client.reset()
+        self.config = StubConfig(seed=1)
+        self.server = make_server(config=self.config)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        host, port = self.server.server_address[:2]
+        env = patch.dict(os.environ, {
+            "OPENAI_API_KEY": "stub-key",
+            "OPENAI_BASE_URL": f"http://{host}:{port}/v1",
+        })
+        env.start()
+        self.addCleanup(env.stop)
+        self.addCleanup(llm_client.reset)
+
+    def test_sdk_round_trip_through_stub(self):
+        parsed = _openai_extract_intent_and_params("hotel bill for room 4 for 2 nights")
+
+        self.assertEqual(parsed["source"], "openai")
+        self.assertEqual(parsed["intent"], "calculate_accommodation_billing")
+        self.assertEqual(parsed["params"]["room_id"], "4")
+        self.assertEqual(self.config.requests, 1)
+
+    def test_stubbed_errors_fall_back_to_heuristics(self):
+        self.config.error_rate = 1.0
+
+        parsed = _openai_extract_intent_and_params("suggest a tour for the family")
+
+        self.assertEqual(parsed["source"], "heuristic_fallback")
+        self.assertEqual(self.config.errors, 1)
+
+    def test_loadtest_counts_llm_fallbacks(self):
+        self.config.error_rate = 1.0
+        out = io.StringIO()
+
+        call_command("chatbot_loadtest", requests=4, concurrency=2, seed=3, stdout=out)
+
+        header, *rows = out.getvalue().splitlines()
+        self.assertEqual(header.split()[:4], ["intent", "count", "errors", "fallback"])
+        total = next(row.split() for row in rows if row.startswith("ALL"))
+        self.assertEqual(total[1:4], ["4", "0", "4"])
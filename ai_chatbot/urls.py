@@ -1,6 +1,8 @@
 from django.urls import path
-from .views import openai_chat
+from .views import openai_chat, openai_chat_async, recommend_batch
 
 urlpatterns = [
     path("chat/", openai_chat, name="openai_chat"),
+    path("chat/async/", openai_chat_async, name="openai_chat_async"),
+    path("recommend/batch/", recommend_batch, name="recommend_batch"),
 ]
@@ -1,26 +1,29 @@
 import json
-import os
 import re
 from decimal import Decimal
 
+from asgiref.sync import sync_to_async
 from django.db.models import F, Sum
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
 
-try:
-    from openai import OpenAI
-except ModuleNotFoundError:
-    OpenAI = None
-
 from tour_app.models import Admission_Rates, Tour_Schedule
 from admin_app.models import Room
+from . import intent_cache, llm_client
+from .intent_classifier import classify_locally, rule_intent
+from .param_extraction import extract_params
 from .recommenders import (
     recommend_tours,
     recommend_accommodations,
+    recommend_tours_batch,
+    recommend_accommodations_batch,
     calculate_accommodation_billing,
 )
 
+MAX_BATCH_PROFILES = 100
+MAX_BATCH_LIMIT = 20
+
 
 def _to_int(value, default=0):
     try:
@@ -51,32 +54,32 @@ def _resolve_guests(params):
     return total if total > 0 else 1
 
 
-def _get_recommendations(params):
+def _iter_recommendations(params):
     results = recommend_tours(params, limit=3)
     if not results:
-        return (
+        yield (
             "I couldn't find a matching tour right now. "
             "Try increasing budget or changing preferred tour type."
         )
+        return
 
-    lines = ["Top recommendations for you (CNN + Decision Tree):"]
+    yield "Top recommendations for you (CNN + Decision Tree):"
     for idx, item in enumerate(results, 1):
-        lines.append(f"{idx}. {item.title} | {item.subtitle}")
-    return "\n".join(lines)
+        yield f"{idx}. {item.title} | {item.subtitle}"
 
 
-def _get_accommodation_recommendations(params):
+def _iter_accommodation_recommendations(params):
     results = recommend_accommodations(params, limit=3)
     if not results:
-        return (
+        yield (
             "I couldn't find a matching hotel or inn right now. "
             "Try adjusting budget, guests, or location."
         )
+        return
 
-    lines = ["Top hotel/inn recommendations for you (CNN + Decision Tree):"]
+    yield "Top hotel/inn recommendations for you (CNN + Decision Tree):"
     for idx, item in enumerate(results, 1):
-        lines.append(f"{idx}. {item.title} | {item.subtitle}")
-    return "\n".join(lines)
+        yield f"{idx}. {item.title} | {item.subtitle}"
 
 
 def _calculate_billing(params):
@@ -162,86 +165,11 @@ def _calculate_accommodation_billing(params):
 
 
 def _extract_params_from_message(message):
-    text = (message or "").strip().lower()
-    params = {}
-
-    # Extract schedule ID like Sched00001.
-    sched_match = re.search(r"(sched\d+)", text, flags=re.IGNORECASE)
-    if sched_match:
-        params["sched_id"] = sched_match.group(1)
-
-    # Extract guest count from "<n> guest(s)/people/person/pax".
-    guest_match = re.search(r"(\d+)\s*(guest|guests|people|person|pax)", text)
-    if guest_match:
-        params["guests"] = int(guest_match.group(1))
-    else:
-        # Fallback: first number in message can be treated as guests.
-        first_num = re.search(r"\b(\d+)\b", text)
-        if first_num:
-            params["guests"] = int(first_num.group(1))
-
-    # Extract budget from "budget 1500", "under 1500", "below 1500".
-    budget_match = re.search(r"(budget|under|below|less than)\s*[:\-]?\s*(\d+)", text)
-    if budget_match:
-        params["budget"] = int(budget_match.group(2))
-
-    # Extract duration from "<n> day(s)".
-    duration_match = re.search(r"(\d+)\s*day", text)
-    if duration_match:
-        params["duration_days"] = int(duration_match.group(1))
-
-    # Extract nights from "<n> night(s)".
-    nights_match = re.search(r"(\d+)\s*night", text)
-    if nights_match:
-        params["nights"] = int(nights_match.group(1))
-
-    # Extract location from "in <location>"
-    loc_match = re.search(r"\bin\s+([a-z\s]+)$", text)
-    if loc_match:
-        params["location"] = loc_match.group(1).strip()
-
-    # Extract room_id like Room0001 or just room 12
-    room_match = re.search(r"(room\\s*(\\d+))", text)
-    if room_match:
-        params["room_id"] = room_match.group(2)
-
-    # Extract check-in/check-out dates in YYYY-MM-DD
-    date_matches = re.findall(r"(\\d{4}-\\d{2}-\\d{2})", text)
-    if len(date_matches) >= 2:
-        params["check_in"] = date_matches[0]
-        params["check_out"] = date_matches[1]
-
-    if "hotel" in text or "inn" in text or "accommodation" in text:
-        params.setdefault("company_type", "hotel")
-
-    # Basic keyword preference extraction.
-    for keyword in ["river", "mountain", "sea", "sunset", "forest"]:
-        if keyword in text:
-            params["preference"] = keyword
-            break
-
-    return params
+    return extract_params(message)
 
 
 def _intent_from_message(message):
-    text = (message or "").lower()
-    billing_keywords = [
-        "bill",
-        "billing",
-        "total",
-        "price",
-        "cost",
-        "how much",
-        "amount due",
-    ]
-    accommodation_keywords = ["hotel", "inn", "room", "accommodation"]
-    if any(keyword in text for keyword in billing_keywords):
-        if any(keyword in text for keyword in accommodation_keywords):
-            return "calculate_accommodation_billing"
-        return "calculate_billing"
-    if any(keyword in text for keyword in accommodation_keywords):
-        return "get_accommodation_recommendation"
-    return "get_recommendation"
+    return rule_intent(message)
 
 
 def _normalize_openai_output(raw_payload):
@@ -272,88 +200,294 @@ def _normalize_openai_output(raw_payload):
     return {"intent": intent, "params": params}
 
 
-def _openai_extract_intent_and_params(message):
-    api_key = os.getenv("OPENAI_API_KEY", "").strip()
-    if not api_key or OpenAI is None:
-        return {
-            "intent": _intent_from_message(message),
-            "params": _extract_params_from_message(message),
-            "source": "heuristic_no_api_key_or_sdk",
-        }
+SYSTEM_PROMPT = (
+    "You classify tourism chatbot messages into intent and parameters.\n"
+    "Return JSON only with keys: intent, params.\n"
+    "Allowed intent values: get_recommendation, calculate_billing, "
+    "get_accommodation_recommendation, calculate_accommodation_billing.\n"
+    "For params, extract if present: guests, adults, children, budget, "
+    "duration_days, preference, sched_id, tour_name, location, "
+    "company_type, room_id, accom_name, check_in, check_out, nights.\n"
+    "Do not include any text outside JSON."
+)
 
-    model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
-    system_prompt = (
-        "You classify tourism chatbot messages into intent and parameters.\n"
-        "Return JSON only with keys: intent, params.\n"
-        "Allowed intent values: get_recommendation, calculate_billing, "
-        "get_accommodation_recommendation, calculate_accommodation_billing.\n"
-        "For params, extract if present: guests, adults, children, budget, "
-        "duration_days, preference, sched_id, tour_name, location, "
-        "company_type, room_id, accom_name, check_in, check_out, nights.\n"
-        "Do not include any text outside JSON."
-    )
 
-    try:
-        client = OpenAI(api_key=api_key)
-        completion = client.chat.completions.create(
-            model=model,
-            temperature=0,
-            response_format={"type": "json_object"},
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": message},
-            ],
-        )
-        content = (completion.choices[0].message.content or "").strip()
-        parsed = _normalize_openai_output(content)
+def _heuristic_result(message, source):
+    return {
+        "intent": _intent_from_message(message),
+        "params": _extract_params_from_message(message),
+        "source": source,
+    }
+
+
+def _resolve_without_llm(message):
+    """Answer from heuristics, the local classifier or the cache if possible."""
+    if not llm_client.available():
+        return _heuristic_result(message, "heuristic_no_api_key_or_sdk")
+
+    params = _extract_params_from_message(message)
+    local_intent = classify_locally(message, params)
+    if local_intent is not None:
         return {
-            "intent": parsed["intent"],
-            "params": parsed["params"],
-            "source": "openai",
+            "intent": local_intent,
+            "params": params,
+            "source": "local_classifier",
         }
-    except Exception:
+
+    cached = intent_cache.lookup(message, llm_client.model_name())
+    if cached is not None:
         return {
-            "intent": _intent_from_message(message),
-            "params": _extract_params_from_message(message),
-            "source": "heuristic_fallback",
+            "intent": cached["intent"],
+            "params": dict(cached["params"]),
+            "source": "openai_cache",
         }
+    return None
 
 
-@csrf_exempt
-def openai_chat(request):
-    if request.method != "POST":
-        return JsonResponse({"status": "ok"})
+def _completion_request(message):
+    return {
+        "model": llm_client.model_name(),
+        "temperature": 0,
+        "response_format": {"type": "json_object"},
+        "messages": [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": message},
+        ],
+    }
+
+
+def _parse_completion(message, completion):
+    content = (completion.choices[0].message.content or "").strip()
+    parsed = _normalize_openai_output(content)
+    intent_cache.remember(message, llm_client.model_name(), parsed["intent"], parsed["params"])
+    return {
+        "intent": parsed["intent"],
+        "params": parsed["params"],
+        "source": "openai",
+    }
 
+
+def _openai_extract_intent_and_params(message):
+    resolved = _resolve_without_llm(message)
+    if resolved is not None:
+        return resolved
+
+    try:
+        completion = llm_client.get_client().chat.completions.create(**_completion_request(message))
+        return _parse_completion(message, completion)
+    except Exception:
+        return _heuristic_result(message, "heuristic_fallback")
+
+
+async def _aopenai_extract_intent_and_params(message):
+    resolved = await sync_to_async(_resolve_without_llm)(message)
+    if resolved is not None:
+        return resolved
+
+    try:
+        completion = await llm_client.acomplete(**_completion_request(message))
+        return await sync_to_async(_parse_completion)(message, completion)
+    except Exception:
+        return _heuristic_result(message, "heuristic_fallback")
+
+
+def _parse_chat_message(request):
+    """Return ``(message, None)`` or ``(None, error_response)``."""
     try:
         payload = json.loads(request.body or "{}")
     except json.JSONDecodeError:
-        return JsonResponse({"fulfillmentText": "Invalid JSON payload."}, status=400)
+        return None, JsonResponse({"fulfillmentText": "Invalid JSON payload."}, status=400)
 
     message = str(payload.get("message", "")).strip()
     if not message:
-        return JsonResponse(
+        return None, JsonResponse(
             {"fulfillmentText": "Please send a message in this format: {\"message\": \"...\"}."},
             status=400,
         )
+    return message, None
 
-    parsed = _openai_extract_intent_and_params(message)
+
+def _iter_reply(parsed):
+    """Yield the reply for ``parsed`` line by line as it is produced."""
     intent = str(parsed["intent"]).strip().lower()
     params = parsed["params"]
 
     if intent in ("get_recommendation", "gettourrecommendation"):
-        reply = _get_recommendations(params)
+        yield from _iter_recommendations(params)
     elif intent in ("calculate_billing", "calculatetourbilling"):
-        reply = _calculate_billing(params)
+        yield _calculate_billing(params)
     elif intent in ("get_accommodation_recommendation", "gethotelrecommendation"):
-        reply = _get_accommodation_recommendations(params)
+        yield from _iter_accommodation_recommendations(params)
     elif intent in ("calculate_accommodation_billing", "calculatehotelbilling"):
-        reply = _calculate_accommodation_billing(params)
+        yield _calculate_accommodation_billing(params)
     else:
-        reply = (
+        yield (
             "I can help with tour and accommodation recommendations and billing. "
             "Try: 'recommend a tour for 2 guests under 1500', "
             "'recommend a hotel in Bayawan for 2 guests under 2000', "
             "or 'calculate hotel bill for room 12 for 2 nights'."
         )
 
-    return JsonResponse({"fulfillmentText": reply})
+
+def _reply_for(parsed):
+    return "\n".join(_iter_reply(parsed))
+
+
+def _wants_stream(request):
+    accept = request.headers.get("Accept", "")
+    return "text/event-stream" in accept or request.GET.get("stream") in ("1", "true")
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _stream_response(events):
+    response = StreamingHttpResponse(events, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+def _stream_chat(message):
+    """
+    Server-sent events for one chat message: ``intent`` once it is known,
+    one ``line`` per reply line, then ``done`` with the full
+    ``fulfillmentText`` so clients can reconcile.
+    """
+    yield ": stream open\n\n"
+    parsed = _openai_extract_intent_and_params(message)
+    yield _sse("intent", {"intent": parsed["intent"], "source": parsed["source"]})
+
+    lines = []
+    for line in _iter_reply(parsed):
+        lines.append(line)
+        yield _sse("line", {"text": line})
+    yield _sse("done", {"fulfillmentText": "\n".join(lines)})
+
+
+async def _astream_chat(message):
+    yield ": stream open\n\n"
+    parsed = await _aopenai_extract_intent_and_params(message)
+    yield _sse("intent", {"intent": parsed["intent"], "source": parsed["source"]})
+
+    replies = _iter_reply(parsed)
+    next_line = sync_to_async(lambda: next(replies, None))
+    lines = []
+    while (line := await next_line()) is not None:
+        lines.append(line)
+        yield _sse("line", {"text": line})
+    yield _sse("done", {"fulfillmentText": "\n".join(lines)})
+
+
+def _chat_response(reply, parsed):
+    response = JsonResponse({"fulfillmentText": reply})
+    # Where the intent came from, e.g. "heuristic_fallback" when the LLM call
+    # failed (chatbot_loadtest counts those)
+    response["X-Intent-Source"] = parsed["source"]
+    return response
+
+
+@csrf_exempt
+def openai_chat(request):
+    if request.method != "POST":
+        return JsonResponse({"status": "ok"})
+
+    message, error = _parse_chat_message(request)
+    if error is not None:
+        return error
+    if _wants_stream(request):
+        return _stream_response(_stream_chat(message))
+
+    parsed = _openai_extract_intent_and_params(message)
+    return _chat_response(_reply_for(parsed), parsed)
+
+
+@csrf_exempt
+async def openai_chat_async(request):
+    """
+    Async twin of ``openai_chat`` for ASGI deployments.
+
+    The LLM call awaits on the shared pooled client, so a worker can hold
+    many chats in flight; database work still runs in Django's sync thread.
+    """
+    if request.method != "POST":
+        return JsonResponse({"status": "ok"})
+
+    message, error = _parse_chat_message(request)
+    if error is not None:
+        return error
+    if _wants_stream(request):
+        return _stream_response(_astream_chat(message))
+
+    parsed = await _aopenai_extract_intent_and_params(message)
+    reply = await sync_to_async(_reply_for)(parsed)
+    return _chat_response(reply, parsed)
+
+
+def _serialize_results(results):
+    return [
+        {
+            "title": item.title,
+            "subtitle": item.subtitle,
+            "score": item.score,
+            "meta": item.meta,
+        }
+        for item in results
+    ]
+
+
+@csrf_exempt
+def recommend_batch(request):
+    """
+    Recommendations for many guest profiles in one request.
+
+    Body: ``{"profiles": [{"type": "tour" | "accommodation", ...params}], "limit": 3}``.
+    Candidates are loaded once per type and every profile is scored against
+    the same arrays; results come back in the order the profiles were sent.
+    """
+    if request.method != "POST":
+        return JsonResponse({"success": False, "message": "POST required."}, status=405)
+
+    try:
+        payload = json.loads(request.body or "{}")
+    except json.JSONDecodeError:
+        return JsonResponse({"success": False, "message": "Invalid JSON payload."}, status=400)
+    if not isinstance(payload, dict):
+        return JsonResponse({"success": False, "message": "Payload must be a JSON object."}, status=400)
+
+    profiles = payload.get("profiles")
+    if not isinstance(profiles, list) or not all(isinstance(p, dict) for p in profiles):
+        return JsonResponse(
+            {"success": False, "message": "\"profiles\" must be a list of parameter objects."},
+            status=400,
+        )
+    if len(profiles) > MAX_BATCH_PROFILES:
+        return JsonResponse(
+            {"success": False, "message": f"At most {MAX_BATCH_PROFILES} profiles per request."},
+            status=400,
+        )
+
+    limit = min(max(_to_int(payload.get("limit"), default=3), 1), MAX_BATCH_LIMIT)
+    kinds = [str(p.get("type") or payload.get("type") or "tour").strip().lower() for p in profiles]
+    unknown = sorted({kind for kind in kinds if kind not in ("tour", "accommodation")})
+    if unknown:
+        return JsonResponse(
+            {"success": False, "message": f"Unknown profile type: {', '.join(unknown)}."},
+            status=400,
+        )
+
+    ranked = {}
+    for kind, recommend in (("tour", recommend_tours_batch), ("accommodation", recommend_accommodations_batch)):
+        positions = [i for i, k in enumerate(kinds) if k == kind]
+        if positions:
+            batch = recommend([profiles[i] for i in positions], limit=limit)
+            ranked.update(zip(positions, batch))
+
+    return JsonResponse({
+        "success": True,
+        "results": [
+            {"type": kind, "results": _serialize_results(ranked[i])}
+            for i, kind in enumerate(kinds)
+        ],
+    })
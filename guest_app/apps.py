@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class GuestAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'guest_app'
+
+    def ready(self):
+        from . import signals  # noqa: F401
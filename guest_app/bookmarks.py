@@ -0,0 +1,174 @@
+"""
+Serialized map bookmark payloads shared by ``map_view`` and ``bookmark_list``.
+
+Bookmarks and their images are loaded translated in two queries, image URLs
+are made absolute with a prefix computed once per request, and the result is
+cached per (owner, language, host). Each owner has a version counter in the
+cache; ``invalidate_bookmarks`` bumps it, which orphans every cached language
+at once.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, Count, Min, Prefetch, Q
+from django.db.models.functions import Substr
+
+from . import map_grid
+from .derivatives import image_sources
+from .models import BookmarkImage, MapBookmark
+
+CACHE_PREFIX = 'guest_app:bookmarks'
+
+
+def _owner_id(user):
+    """Bookmarks of anonymous visitors are the ones with no user."""
+    return user.pk if user is not None and user.is_authenticated else None
+
+
+def _version_key(owner_id):
+    return f'{CACHE_PREFIX}:{owner_id or "anon"}:version'
+
+
+def translated_bookmarks_for(user, language):
+    """
+    The user's bookmarks (or the shared ones for anonymous visitors) with
+    name/details and their images' title/description resolved in
+    ``language``: one query for bookmarks and one for all their images.
+    """
+    images = BookmarkImage.objects.translated(language)
+    return (
+        MapBookmark.objects.filter(user=_owner_id(user))
+        .translated(language)
+        .prefetch_related(Prefetch('images', queryset=images))
+    )
+
+
+def absolute_sources(field_file, host_url):
+    """``image_sources`` with every URL prefixed by ``host_url`` if relative."""
+    sources = image_sources(field_file)
+    if sources is None:
+        return None
+
+    def absolute(url):
+        return host_url + url if url.startswith('/') else url
+
+    def absolute_srcset(srcset):
+        return ', '.join(absolute(candidate) for candidate in srcset.split(', ')) if srcset else ''
+
+    return {
+        'url': absolute(sources['url']),
+        'srcset': absolute_srcset(sources['srcset']),
+        'webp_srcset': absolute_srcset(sources['webp_srcset']),
+    }
+
+
+def serialize_bookmarks(bookmarks, host_url):
+    """
+    Bookmark dicts for a ``translated_bookmarks_for`` queryset. ``host_url``
+    (``scheme://host``) turns media URLs absolute without calling
+    ``build_absolute_uri`` per image. Images carry ``srcset``/``webp_srcset``
+    strings of their resized variants.
+    """
+    data = []
+    for bookmark in bookmarks:
+        images = []
+        for image in bookmark.images.all():
+            sources = absolute_sources(image.image, host_url) or {}
+            images.append({
+                'id': image.id,
+                'title': image.translated_title,
+                'description': image.translated_description,
+                'url': sources.get('url'),
+                'srcset': sources.get('srcset', ''),
+                'webp_srcset': sources.get('webp_srcset', ''),
+            })
+        data.append({
+            'id': bookmark.id,
+            'name': bookmark.translated_name,
+            'category': bookmark.category,
+            'lat': bookmark.latitude,
+            'lng': bookmark.longitude,
+            'details': bookmark.translated_details or '',
+            'primary_image': absolute_sources(bookmark.primary_image, host_url),
+            'images': images,
+        })
+    return data
+
+
+def bookmark_payload(request, language):
+    """Cached serialized bookmarks for the requesting user in ``language``."""
+    owner_id = _owner_id(request.user)
+    host_url = request.build_absolute_uri('/').rstrip('/')
+    version = cache.get_or_set(_version_key(owner_id), time.time_ns, timeout=None)
+    key = f'{CACHE_PREFIX}:{owner_id or "anon"}:{version}:{language}:{host_url}'
+
+    data = cache.get(key)
+    if data is None:
+        data = serialize_bookmarks(translated_bookmarks_for(request.user, language), host_url)
+        cache.set(key, data, settings.BOOKMARK_CACHE_TTL)
+    return data
+
+
+def invalidate_bookmarks(owner_id):
+    """Drop every cached payload for the owner of a changed bookmark or image."""
+    key = _version_key(owner_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Counter evicted: restart from a value no cached payload can carry
+        cache.set(key, time.time_ns(), timeout=None)
+
+
+def _in_viewport(user, south, west, north, east):
+    """Owner's bookmarks inside the box, narrowed by grid cell first."""
+    cells = Q()
+    for prefix in map_grid.covering_prefixes(south, west, north, east):
+        cells |= Q(grid_key__startswith=prefix)
+    return MapBookmark.objects.filter(
+        cells,
+        user=_owner_id(user),
+        latitude__gte=south, latitude__lte=north,
+        longitude__gte=west, longitude__lte=east,
+    )
+
+
+def viewport_payload(request, language, south, west, north, east, zoom):
+    """
+    Bookmarks visible in a bounding box. At zoom levels up to
+    ``MAP_BOOKMARK_CLUSTER_MAX_ZOOM``, bookmarks sharing a grid cell about
+    ``MAP_BOOKMARK_CLUSTER_PX`` pixels wide are returned as one cluster
+    (centroid and count); lone bookmarks are serialized in full.
+    """
+    host_url = request.build_absolute_uri('/').rstrip('/')
+    visible = _in_viewport(request.user, south, west, north, east)
+    clusters = []
+
+    if zoom <= settings.MAP_BOOKMARK_CLUSTER_MAX_ZOOM:
+        # Leaflet CRS.Simple: one map unit is 2 ** zoom pixels
+        level = map_grid.level_for_size(settings.MAP_BOOKMARK_CLUSTER_PX / 2 ** zoom)
+        cells = (
+            visible.annotate(cell=Substr('grid_key', 1, level))
+            .values('cell')
+            .annotate(count=Count('id'), lat=Avg('latitude'), lng=Avg('longitude'), first_id=Min('id'))
+            .order_by('cell')
+        )
+        single_ids = []
+        for cell in cells:
+            if cell['count'] == 1:
+                single_ids.append(cell['first_id'])
+            else:
+                clusters.append({
+                    'cell': cell['cell'],
+                    'count': cell['count'],
+                    'lat': cell['lat'],
+                    'lng': cell['lng'],
+                })
+        visible = MapBookmark.objects.filter(id__in=single_ids)
+
+    images = BookmarkImage.objects.translated(language)
+    bookmarks = visible.translated(language).prefetch_related(Prefetch('images', queryset=images))
+    return {
+        'bookmarks': serialize_bookmarks(bookmarks.order_by('id'), host_url),
+        'clusters': clusters,
+    }
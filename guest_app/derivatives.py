@@ -0,0 +1,298 @@
+"""
+Normalized originals and resized WebP/JPEG variants of uploaded images.
+
+Saving an image only queues a ``process_image`` job (see ``signals.py`` and
+``jobs.py``); the ``run_jobs`` worker then normalizes the original
+(EXIF rotation applied, metadata stripped, recompressed) and writes a JPEG
+and a WebP copy at each ``IMAGE_DERIVATIVE_WIDTHS`` width narrower than it.
+Variants live under ``derivatives/`` named by the SHA-256 of the normalized
+original, so identical uploads share them and a replaced image never serves
+stale ones.
+
+Request handlers only look variants up: ``image_sources`` returns whatever
+exists and caches the result per storage name, for good once every variant
+is on disk and for ``IMAGE_PENDING_MANIFEST_SECONDS`` until then. Images
+uploaded before this pipeline are queued from there at most once per
+``REQUEUE_SECONDS``.
+"""
+import hashlib
+import io
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from . import jobs
+from .models import BackgroundJob, BookmarkImage, MapBookmark
+
+CACHE_PREFIX = 'guest_app:derivatives'
+DERIVATIVE_DIR = 'derivatives'
+PROCESS_IMAGE = 'guest_app.derivatives.process_image'
+
+# (file extension, Pillow format)
+FORMATS = (('webp', 'WEBP'), ('jpg', 'JPEG'))
+
+# Formats rewritten by normalization; anything else (e.g. animated GIFs) is
+# left as uploaded.
+NORMALIZED_FORMATS = ('JPEG', 'PNG', 'WEBP')
+
+# EXIF orientations that swap width and height
+TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)
+
+# How long the read path waits before queueing an unprocessed image again
+REQUEUE_SECONDS = 60 * 60
+
+
+def widths():
+    return tuple(sorted(getattr(settings, 'IMAGE_DERIVATIVE_WIDTHS', (320, 640, 1280))))
+
+
+def quality():
+    return getattr(settings, 'IMAGE_DERIVATIVE_QUALITY', 80)
+
+
+def content_hash(field_file):
+    """SHA-256 of the stored file."""
+    sha = hashlib.sha256()
+    with field_file.storage.open(field_file.name, 'rb') as original:
+        for chunk in iter(lambda: original.read(64 * 1024), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def derivative_name(digest, width, extension):
+    return f'{DERIVATIVE_DIR}/{digest[:2]}/{digest}_{width}w.{extension}'
+
+
+def _manifest_key(name):
+    return f'{CACHE_PREFIX}:{",".join(map(str, widths()))}:{name}'
+
+
+def _encode(image, width, pillow_format):
+    height = max(1, round(image.height * width / image.width))
+    resized = image.resize((width, height), Image.LANCZOS)
+    if pillow_format == 'JPEG' and resized.mode != 'RGB':
+        # JPEG has no alpha: flatten transparent images onto white
+        background = Image.new('RGB', resized.size, (255, 255, 255))
+        rgba = resized.convert('RGBA')
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        resized = background
+    buffer = io.BytesIO()
+    resized.save(buffer, pillow_format, quality=quality(), optimize=True)
+    return buffer.getvalue()
+
+
+def _displayed_width(image):
+    """Width once EXIF orientation is applied, read from the header only."""
+    orientation = image.getexif().get(0x0112)
+    return image.height if orientation in TRANSPOSED_ORIENTATIONS else image.width
+
+
+def find_derivatives(field_file):
+    """
+    Variants of ``field_file`` that already exist, without creating any:
+    ``{'width': original width, 'variants': [(width, extension, name), ...],
+    'complete': bool}``. Complete manifests are cached indefinitely and
+    incomplete ones for ``IMAGE_PENDING_MANIFEST_SECONDS``, so pages do not
+    hash the original on every render while the worker catches up. Files
+    Pillow cannot read count as complete with no variants.
+    """
+    key = _manifest_key(field_file.name)
+    manifest = cache.get(key)
+    if manifest is not None:
+        return manifest
+
+    storage = field_file.storage
+    try:
+        with storage.open(field_file.name, 'rb') as original:
+            width = _displayed_width(Image.open(original))
+    except UnidentifiedImageError:
+        manifest = {'width': None, 'variants': [], 'complete': True}
+    else:
+        digest = content_hash(field_file)
+        expected = [
+            (size, extension, derivative_name(digest, size, extension))
+            for size in widths() if size < width
+            for extension, _pillow_format in FORMATS
+        ]
+        variants = [variant for variant in expected if storage.exists(variant[2])]
+        manifest = {'width': width, 'variants': variants, 'complete': len(variants) == len(expected)}
+    timeout = None if manifest['complete'] else getattr(settings, 'IMAGE_PENDING_MANIFEST_SECONDS', 60)
+    cache.set(key, manifest, timeout=timeout)
+    return manifest
+
+
+def ensure_derivatives(field_file):
+    """Create any missing variants of ``field_file``; returns its manifest."""
+    digest = content_hash(field_file)
+    storage = field_file.storage
+    try:
+        with storage.open(field_file.name, 'rb') as original:
+            image = ImageOps.exif_transpose(Image.open(original))
+            if image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+            variants = []
+            for width in widths():
+                if width >= image.width:
+                    break
+                for extension, pillow_format in FORMATS:
+                    name = derivative_name(digest, width, extension)
+                    if not storage.exists(name):
+                        storage.save(name, ContentFile(_encode(image, width, pillow_format)))
+                    variants.append((width, extension, name))
+            manifest = {'width': image.width, 'variants': variants, 'complete': True}
+    except UnidentifiedImageError:
+        manifest = {'width': None, 'variants': [], 'complete': True}
+    cache.set(_manifest_key(field_file.name), manifest, timeout=None)
+    return manifest
+
+
+def normalize_image(field_file):
+    """
+    Rewrite the original with EXIF orientation applied, metadata (EXIF, GPS,
+    comments) stripped and the image recompressed. The new bytes are kept
+    only if they drop metadata or are smaller, usually under a new storage
+    name. Returns ``True`` if the stored file changed.
+    """
+    storage = field_file.storage
+    with storage.open(field_file.name, 'rb') as original:
+        data = original.read()
+    try:
+        image = Image.open(io.BytesIO(data))
+        pillow_format = image.format
+        if pillow_format not in NORMALIZED_FORMATS or getattr(image, 'is_animated', False):
+            return False
+        had_metadata = bool(image.getexif()) or any(key in image.info for key in ('exif', 'comment', 'xmp'))
+        icc_profile = image.info.get('icc_profile')
+        image = ImageOps.exif_transpose(image)
+    except (UnidentifiedImageError, OSError):
+        return False
+
+    options = {'optimize': True}
+    if pillow_format in ('JPEG', 'WEBP'):
+        options['quality'] = getattr(settings, 'IMAGE_NORMALIZE_QUALITY', 85)
+    if icc_profile:
+        options['icc_profile'] = icc_profile
+    if pillow_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    buffer = io.BytesIO()
+    image.save(buffer, pillow_format, **options)
+    normalized = buffer.getvalue()
+    if not had_metadata and len(normalized) >= len(data):
+        return False
+
+    # The row moves to the new file before the old one goes, and the old one
+    # is only deleted once that move is committed, so the field never names a
+    # missing file. Storages that overwrite in place need neither step.
+    original_name = field_file.name
+    stored = storage.save(original_name, ContentFile(normalized))
+    if stored != original_name:
+        type(field_file.instance).objects.filter(pk=field_file.instance.pk).update(
+            **{field_file.field.name: stored}
+        )
+        field_file.name = stored
+        transaction.on_commit(lambda: storage.delete(original_name))
+    return True
+
+
+def _job_fields(field_file):
+    instance = field_file.instance
+    label = instance._meta.label_lower
+    field = field_file.field.name
+    return {
+        'key': f'{label}:{instance.pk}:{field}:{field_file.name}',
+        'payload': {'model': label, 'pk': str(instance.pk), 'field': field, 'name': field_file.name},
+    }
+
+
+def request_processing(field_file):
+    """Queue ``process_image`` for a saved image field, once per stored file."""
+    if not field_file or field_file.instance.pk is None:
+        return None
+    job = _job_fields(field_file)
+    return jobs.enqueue(PROCESS_IMAGE, key=job['key'], **job['payload'])
+
+
+def process_image(model, pk, field, name):
+    """Job: normalize a stored image and build its variants."""
+    from django.apps import apps
+
+    instance = apps.get_model(model).objects.filter(pk=pk).first()
+    if instance is None:
+        return
+    field_file = getattr(instance, field)
+    if field_file.name != name:
+        # Replaced since the job was queued; the new file has its own job
+        return
+    with transaction.atomic():
+        # A failure building variants also rolls back the move to the
+        # normalized file, leaving the original for the retry
+        if normalize_image(field_file) and field_file.name != name:
+            # The normalized file is done too: saving the row again must not
+            # queue (and recompress) it once more
+            job = _job_fields(field_file)
+            BackgroundJob.objects.get_or_create(
+                task=PROCESS_IMAGE, key=job['key'], defaults={'payload': job['payload'], 'status': 'done'},
+            )
+        ensure_derivatives(field_file)
+        owner_id = _bookmark_owner_id(instance)
+        if owner_id is not False:
+            # Cached bookmark payloads carry this image's URL and srcset
+            from .bookmarks import invalidate_bookmarks
+
+            transaction.on_commit(lambda: invalidate_bookmarks(owner_id))
+
+
+def _bookmark_owner_id(instance):
+    """Owner of the bookmark ``instance`` belongs to, or ``False`` for other models."""
+    if isinstance(instance, MapBookmark):
+        return instance.user_id
+    if isinstance(instance, BookmarkImage):
+        return MapBookmark.objects.filter(pk=instance.bookmark_id).values_list('user_id', flat=True).first()
+    return False
+
+
+def image_sources(field_file):
+    """
+    ``srcset``-ready URLs for an image field, or ``None`` if it is empty::
+
+        {'url': original, 'width': 2048,
+         'srcset': 'a_320w.jpg 320w, a_640w.jpg 640w, original 2048w',
+         'webp_srcset': 'a_320w.webp 320w, a_640w.webp 640w, original 2048w'}
+
+    The original closes both lists so wide screens still get full
+    resolution; both are empty until the image's variants exist.
+    """
+    if not field_file:
+        return None
+    url = field_file.url
+    try:
+        manifest = find_derivatives(field_file)
+    except OSError:
+        # Missing original: fall back to its URL alone
+        return {'url': url, 'width': None, 'srcset': '', 'webp_srcset': ''}
+    if not manifest['complete'] and cache.add(f'{CACHE_PREFIX}:queued:{field_file.name}', True, REQUEUE_SECONDS):
+        # Uploads are queued when saved; this only catches older images
+        request_processing(field_file)
+
+    storage = field_file.storage
+    srcset = {'jpg': [], 'webp': []}
+    for width, extension, name in manifest['variants']:
+        srcset[extension].append(f'{storage.url(name)} {width}w')
+    if manifest['variants'] and manifest['width']:
+        for candidates in srcset.values():
+            candidates.append(f'{url} {manifest["width"]}w')
+    return {
+        'url': url,
+        'width': manifest['width'],
+        'srcset': ', '.join(srcset['jpg']),
+        'webp_srcset': ', '.join(srcset['webp']),
+    }
+
+
+def srcset(field_file):
+    """JPEG ``srcset`` for an image field; ``''`` when empty or unresized."""
+    sources = image_sources(field_file)
+    return sources['srcset'] if sources else ''
@@ -0,0 +1,72 @@
+"""
+Per-night room inventory for accommodation bookings.
+
+Each night a booking occupies is a ``RoomNight`` row, unique per room and
+night. Bookings hold their nights while pending or confirmed and give them
+back when declined or cancelled, so availability never depends on scanning
+bookings for overlapping date ranges:
+
+- ``reserve_nights`` inserts a booking's nights in one statement; the unique
+  constraint rejects the whole insert if any night is taken, so concurrent
+  requests for the same room cannot both succeed.
+- ``booked_room_ids`` answers "which rooms are taken at any point between
+  check-in and check-out" for every room with one query on the
+  (night, room) index.
+"""
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+
+from .models import RoomNight
+
+# Booking statuses that occupy the room
+HOLDING_STATUSES = ('pending', 'confirmed')
+
+
+def stay_nights(check_in, check_out):
+    """Nights from ``check_in`` up to, not including, ``check_out``."""
+    return [check_in + timedelta(days=offset) for offset in range((check_out - check_in).days)]
+
+
+def booked_room_ids(check_in, check_out, room_ids=None):
+    """Ids of rooms held for at least one night of the stay."""
+    nights = RoomNight.objects.filter(night__gte=check_in, night__lt=check_out)
+    if room_ids is not None:
+        nights = nights.filter(room_id__in=room_ids)
+    return set(nights.values_list('room_id', flat=True).distinct())
+
+
+def is_available(room_id, check_in, check_out):
+    return not RoomNight.objects.filter(room_id=room_id, night__gte=check_in, night__lt=check_out).exists()
+
+
+def reserve_nights(booking):
+    """
+    Hold every night of ``booking``'s stay on its room. Returns ``False``
+    (holding nothing new) if another booking has any of them. Safe to call
+    again for a booking that already holds its nights.
+    """
+    if booking.room_id is None:
+        return True
+    try:
+        with transaction.atomic():
+            RoomNight.objects.filter(booking=booking).delete()
+            RoomNight.objects.bulk_create([
+                RoomNight(room_id=booking.room_id, night=night, booking=booking)
+                for night in stay_nights(booking.check_in, booking.check_out)
+            ])
+    except IntegrityError:
+        return False
+    return True
+
+
+def release_nights(booking):
+    return RoomNight.objects.filter(booking=booking).delete()[0]
+
+
+def sync_nights(booking):
+    """Hold or release ``booking``'s nights to match its status."""
+    if booking.status in HOLDING_STATUSES:
+        return reserve_nights(booking)
+    release_nights(booking)
+    return True
@@ -0,0 +1,80 @@
+"""
+A small database-backed job queue.
+
+``enqueue`` stores the dotted path of a function and its keyword arguments
+as a ``BackgroundJob`` row, inside the caller's transaction, so work is only
+queued if the change that needs it commits. ``manage.py run_jobs`` claims due
+jobs in batches (``SELECT ... FOR UPDATE SKIP LOCKED`` where the database
+supports it, so several workers can share the table), runs them, and retries
+failures with exponential backoff up to ``JOB_MAX_ATTEMPTS``; that machinery
+is shared with the email outbox in ``work_queue``.
+"""
+import traceback
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import BackgroundJob
+from .work_queue import WorkQueue
+
+queue = WorkQueue(
+    BackgroundJob, due_field='run_after', claimed_status='running', done_status='done',
+    setting_prefix='JOB',
+    defaults={
+        'BATCH_SIZE': 20, 'POLL_SECONDS': 2, 'MAX_ATTEMPTS': 5, 'RETRY_BASE_SECONDS': 30,
+        'LOCK_TIMEOUT': 15 * 60,
+    },
+    touch_fields=['updated_at'],
+)
+claim = queue.claim
+requeue_stale = queue.requeue_stale
+
+
+def enqueue(task, key=None, run_after=None, **payload):
+    """
+    Queue ``task`` (dotted path to a function) to be called with ``payload``.
+    If ``key`` is given and a job with the same task and key already exists,
+    nothing is queued and ``None`` is returned; the unique constraint on
+    (task, key) settles concurrent attempts.
+    """
+    key = key or None
+    if key is not None and BackgroundJob.objects.filter(task=task, key=key).exists():
+        return None
+    try:
+        with transaction.atomic():
+            return BackgroundJob.objects.create(
+                task=task, key=key, payload=payload, run_after=run_after or timezone.now(),
+            )
+    except IntegrityError:
+        if key is None:
+            raise
+        return None
+
+
+def run_job(job):
+    """Run one claimed job and record the outcome: ``'done'``, ``'retry'`` or ``'failed'``."""
+    try:
+        import_string(job.task)(**job.payload)
+    except Exception:
+        return queue.record_failure(job, traceback.format_exc())
+    return queue.record_done(job)
+
+
+def run_pending(limit=None):
+    """
+    Claim and run one batch of due jobs. Returns counts keyed by outcome,
+    e.g. ``{'done': 3, 'retry': 1, 'failed': 0}``.
+    """
+    counts = queue.outcomes()
+    for job in claim(limit or queue.setting('BATCH_SIZE')):
+        counts[run_job(job)] += 1
+    return counts
+
+
+def work(sleep=None, once=False, stdout=None):
+    """
+    Worker loop behind ``manage.py run_jobs``. With ``once`` it returns the
+    totals as soon as no job is due instead of polling.
+    """
+    return queue.work(run_pending, sleep=sleep, once=once, stdout=stdout)
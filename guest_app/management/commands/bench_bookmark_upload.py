@@ -0,0 +1,93 @@
+import base64
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory, override_settings
+from django.test.client import encode_multipart
+
+from guest_app.models import MapBookmark
+from guest_app.views import bookmark_add_image
+
+BOUNDARY = 'BenchBoundary'
+
+
+def fake_photo(size):
+    """``size`` bytes that start like a JPEG; the endpoint stores them as-is."""
+    return b'\xff\xd8\xff\xe0' + os.urandom(size - 4)
+
+
+def json_request(factory, path, photo):
+    data_uri = 'data:image/jpeg;base64,' + base64.b64encode(photo).decode('ascii')
+    body = json.dumps({'image': data_uri, 'title': 'Bench', 'description': ''})
+    return factory.post(path, data=body, content_type='application/json')
+
+
+def multipart_request(factory, path, photo):
+    upload = SimpleUploadedFile('bench.jpg', photo, content_type='image/jpeg')
+    body = encode_multipart(BOUNDARY, {'image': upload, 'title': 'Bench', 'description': ''})
+    return factory.post(path, data=body, content_type=f'multipart/form-data; boundary={BOUNDARY}')
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks bookmark image uploads (peak memory per request, base64 JSON vs multipart)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size-mb', type=float, default=10,
+                            help='Size of the generated photo in megabytes')
+        parser.add_argument('--rounds', type=int, default=3,
+                            help='Uploads per path; the worst peak is reported')
+
+    def handle(self, *args, **options):
+        size = int(options['size_mb'] * 1024 * 1024)
+        photo = fake_photo(size)
+        factory = RequestFactory()
+
+        # Uploads land in a throwaway MEDIA_ROOT; the JSON path needs the
+        # request-body cap lifted to accept a photo this size at all.
+        with tempfile.TemporaryDirectory() as media_root, override_settings(
+            ALLOWED_HOSTS=['testserver'],
+            MEDIA_ROOT=media_root,
+            DATA_UPLOAD_MAX_MEMORY_SIZE=None,
+            BOOKMARK_IMAGE_MAX_UPLOAD_SIZE=size + 1024,
+        ):
+            bookmark = MapBookmark.objects.create(name='Upload benchmark', category='other', latitude=0, longitude=0)
+            path = f'/api/bookmarks/{bookmark.id}/images/add/'
+            try:
+                for label, build in (
+                    ('before (base64 JSON)', json_request),
+                    ('after (multipart stream)', multipart_request),
+                ):
+                    peaks, elapsed = [], 0.0
+                    for _ in range(options['rounds']):
+                        # The request body is built before tracing starts: only
+                        # what the server allocates while handling it counts.
+                        request = build(factory, path, photo)
+                        request.user = AnonymousUser()
+                        tracemalloc.start()
+                        started = time.perf_counter()
+                        response = bookmark_add_image(request, bookmark.id)
+                        elapsed += time.perf_counter() - started
+                        peaks.append(tracemalloc.get_traced_memory()[1])
+                        tracemalloc.stop()
+                        request.close()
+                        if response.status_code != 200:
+                            self.stderr.write(f'{label}: HTTP {response.status_code} {response.content[:200]!r}')
+                            break
+                    else:
+                        self.stdout.write(
+                            f'{label:26} peak {max(peaks) / (1024 * 1024):>7.1f} MB '
+                            f'({max(peaks) / size:.1f}x photo), {elapsed / len(peaks) * 1000:>6.0f} ms/upload'
+                        )
+            finally:
+                for image in bookmark.images.all():
+                    image.image.delete(save=False)
+                bookmark.delete()
+
+        self.stdout.write(self.style.SUCCESS(f'Photo size: {size / (1024 * 1024):.1f} MB'))
+
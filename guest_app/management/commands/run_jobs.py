@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from guest_app.jobs import work
+
+class Command(BaseCommand):
+    help = 'Runs queued background jobs (image processing); keep one or more running under a process supervisor'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once no job is due instead of polling (e.g. from cron)')
+        parser.add_argument('--sleep', type=float, default=None,
+                            help='Seconds to wait between polls of an empty queue (default JOB_POLL_SECONDS)')
+
+    def handle(self, *args, **options):
+        totals = work(sleep=options['sleep'], once=options['once'], stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            ', '.join(f'{outcome}: {count}' for outcome, count in totals.items())
+        ))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from guest_app.outbox import work
+
+class Command(BaseCommand):
+    help = 'Delivers queued emails over one SMTP connection; keep it running under a process supervisor'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Send everything that is due, then exit (e.g. from cron)')
+        parser.add_argument('--sleep', type=float, default=None,
+                            help='Seconds between polls of the outbox (default EMAIL_OUTBOX_POLL_SECONDS)')
+
+    def handle(self, *args, **options):
+        totals = work(sleep=options['sleep'], once=options['once'], stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            ', '.join(f'{outcome}: {count}' for outcome, count in totals.items())
+        ))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from guest_app.utils import sweep_booking_statuses
+
+class Command(BaseCommand):
+    help = 'Moves tour schedules and bookings to active/completed based on their schedule times (run from cron)'
+    
+    def handle(self, *args, **options):
+        counts = sweep_booking_statuses()
+        for transition, count in counts.items():
+            self.stdout.write(f'{transition}: {count}')
+        self.stdout.write(self.style.SUCCESS(f'Updated {sum(counts.values())} rows'))
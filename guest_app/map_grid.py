@@ -0,0 +1,74 @@
+"""
+Quadtree grid keys for map bookmarks.
+
+The Bayawan map is an image overlay (Leaflet ``CRS.Simple``), so bookmark
+latitude/longitude are map units, not degrees. Each point is snapped to a
+``MAP_GRID_CELL_SIZE`` grid and given a quadkey: one base-4 digit per level,
+most significant first. A key prefix of length ``k`` is a square cell
+``2 ** (MAP_GRID_LEVELS - k)`` grid cells wide, so "inside this cell" is an
+indexed ``LIKE 'prefix%'`` and clustering is a GROUP BY on a key prefix.
+"""
+import math
+
+from django.conf import settings
+
+
+def levels():
+    return getattr(settings, 'MAP_GRID_LEVELS', 16)
+
+
+def base_cell_size():
+    return float(getattr(settings, 'MAP_GRID_CELL_SIZE', 1.0))
+
+
+def _grid_coord(value):
+    """Grid column/row for a coordinate, centred on 0 and clamped to the grid."""
+    size = 1 << levels()
+    index = math.floor(float(value) / base_cell_size()) + size // 2
+    return min(max(index, 0), size - 1)
+
+
+def grid_key(lat, lng):
+    """Full-depth quadkey of the cell containing (lat, lng)."""
+    row, col = _grid_coord(lat), _grid_coord(lng)
+    digits = []
+    for bit in range(levels() - 1, -1, -1):
+        digits.append(str((((row >> bit) & 1) << 1) | ((col >> bit) & 1)))
+    return ''.join(digits)
+
+
+def cell_size(level):
+    """Width, in map units, of a cell addressed by a ``level``-digit prefix."""
+    return base_cell_size() * (1 << (levels() - level))
+
+
+def level_for_size(size):
+    """Deepest level whose cells are at least ``size`` map units wide."""
+    for level in range(levels(), 0, -1):
+        if cell_size(level) >= size:
+            return level
+    return 1
+
+
+def covering_prefixes(south, west, north, east, max_cells=16):
+    """
+    Key prefixes of the smallest cells that cover the box using at most
+    ``max_cells`` cells, or ``[]`` if even the coarsest level needs more
+    (callers then rely on the coordinate range alone).
+    """
+    for level in range(levels(), 0, -1):
+        shift = levels() - level
+        rows = range(_grid_coord(south) >> shift, (_grid_coord(north) >> shift) + 1)
+        cols = range(_grid_coord(west) >> shift, (_grid_coord(east) >> shift) + 1)
+        if len(rows) * len(cols) > max_cells:
+            continue
+        prefixes = []
+        for row in rows:
+            for col in cols:
+                digits = [
+                    str((((row >> bit) & 1) << 1) | ((col >> bit) & 1))
+                    for bit in range(level - 1, -1, -1)
+                ]
+                prefixes.append(''.join(digits))
+        return prefixes
+    return []
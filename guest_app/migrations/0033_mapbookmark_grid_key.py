@@ -0,0 +1,50 @@
+# Generated by Django 5.2.4 on 2026-10-18 09:34
+
+import math
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Frozen copy of guest_app.map_grid.grid_key as of this migration
+def grid_key(lat, lng):
+    levels = getattr(settings, 'MAP_GRID_LEVELS', 16)
+    cell_size = float(getattr(settings, 'MAP_GRID_CELL_SIZE', 1.0))
+    size = 1 << levels
+
+    def grid_coord(value):
+        index = math.floor(float(value) / cell_size) + size // 2
+        return min(max(index, 0), size - 1)
+
+    row, col = grid_coord(lat), grid_coord(lng)
+    return ''.join(
+        str((((row >> bit) & 1) << 1) | ((col >> bit) & 1)) for bit in range(levels - 1, -1, -1)
+    )
+
+
+def fill_grid_keys(apps, schema_editor):
+    MapBookmark = apps.get_model('guest_app', 'MapBookmark')
+    bookmarks = list(MapBookmark.objects.only('id', 'latitude', 'longitude'))
+    for bookmark in bookmarks:
+        bookmark.grid_key = grid_key(bookmark.latitude, bookmark.longitude)
+    MapBookmark.objects.bulk_update(bookmarks, ['grid_key'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guest_app', '0032_accommodation_booking'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mapbookmark',
+            name='grid_key',
+            field=models.CharField(blank=True, default='', editable=False, max_length=32),
+        ),
+        migrations.AddIndex(
+            model_name='mapbookmark',
+            index=models.Index(fields=['user', 'grid_key'], name='guest_app_bookmark_grid_idx'),
+        ),
+        migrations.RunPython(fill_grid_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.4 on 2026-10-18 09:51
+
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Frozen copies of guest_app.inventory as of this migration
+HOLDING_STATUSES = ('pending', 'confirmed')
+
+
+def stay_nights(check_in, check_out):
+    return [check_in + timedelta(days=offset) for offset in range((check_out - check_in).days)]
+
+
+def fill_room_nights(apps, schema_editor):
+    AccommodationBooking = apps.get_model('guest_app', 'AccommodationBooking')
+    RoomNight = apps.get_model('guest_app', 'RoomNight')
+    bookings = AccommodationBooking.objects.filter(
+        status__in=HOLDING_STATUSES, room__isnull=False,
+    ).order_by('status', 'booking_id')
+    # Confirmed bookings first, then oldest first: where existing bookings
+    # overlap, the later ones simply do not get the clashing nights.
+    for booking in bookings.iterator():
+        RoomNight.objects.bulk_create([
+            RoomNight(room_id=booking.room_id, night=night, booking_id=booking.booking_id)
+            for night in stay_nights(booking.check_in, booking.check_out)
+        ], ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_app', '0024_room_price_per_night'),
+        ('guest_app', '0035_outboxemail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoomNight',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('night', models.DateField()),
+                ('booking', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='nights', to='guest_app.accommodationbooking')),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='booked_nights', to='admin_app.room')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['night', 'room'], name='guest_app_room_night_idx')],
+                'constraints': [models.UniqueConstraint(fields=('room', 'night'), name='guest_app_room_night_unique')],
+            },
+        ),
+        migrations.RunPython(fill_room_nights, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:03
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def dedupe_keys(apps, schema_editor):
+    BackgroundJob = apps.get_model('guest_app', 'BackgroundJob')
+    BackgroundJob.objects.filter(key='').update(key=None)
+    duplicates = (
+        BackgroundJob.objects.exclude(key=None).values('task', 'key')
+        .annotate(first=Min('id'), copies=Count('id')).filter(copies__gt=1)
+    )
+    for duplicate in duplicates:
+        BackgroundJob.objects.filter(task=duplicate['task'], key=duplicate['key']).exclude(
+            id=duplicate['first']
+        ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guest_app', '0036_roomnight'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='backgroundjob',
+            name='guest_app_job_key_idx',
+        ),
+        migrations.AlterField(
+            model_name='backgroundjob',
+            name='key',
+            field=models.CharField(blank=True, default=None, max_length=255, null=True),
+        ),
+        migrations.RunPython(dedupe_keys, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='backgroundjob',
+            constraint=models.UniqueConstraint(fields=('task', 'key'), name='guest_app_job_key_unique'),
+        ),
+    ]
@@ -3,11 +3,15 @@ from django.contrib.auth.hashers import make_password
 import random
 import string
 from django.db import models
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce, NullIf
 from django.utils import timezone
 from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.utils.translation import gettext_lazy as _
 
+from . import map_grid
+
 class GuestManager(UserManager):
     def create_superuser(self, username, email=None, password=None, **extra_fields):
         extra_fields.setdefault('is_staff', True)
@@ -122,6 +126,29 @@ class Guest(AbstractUser):
                 
         super().save(*args, **kwargs)
 
+class TranslatedQuerySet(models.QuerySet):
+    """
+    QuerySet for models that keep per-language copies of a field in
+    ``<field>_<lang>`` columns (e.g. ``name_tl``).
+    """
+    
+    def translated(self, lang, fields=None):
+        """
+        Annotate ``translated_<field>`` with the value in ``lang`` for every
+        row in one query, falling back to the base column when the
+        translated one is empty (same rule as ``get_name`` and friends).
+        """
+        annotations = {}
+        for field in fields or self.model.TRANSLATED_FIELDS:
+            if lang in ('tl', 'ceb', 'es'):
+                value = Coalesce(
+                    NullIf(F(f'{field}_{lang}'), Value('')), F(field), output_field=models.TextField()
+                )
+            else:
+                value = F(field)
+            annotations[f'translated_{field}'] = value
+        return self.annotate(**annotations)
+
 # Add a new base class for translatable models
 class TranslatableModel(models.Model):
     """
@@ -307,6 +334,27 @@ class AccommodationBooking(models.Model):
     def get_balance_due(self):
         return self.total_amount - self.amount_paid
 
+
+class RoomNight(models.Model):
+    """
+    One night of a room held by an accommodation booking (see
+    ``guest_app/inventory.py``). The unique (room, night) pair is what keeps
+    two bookings from overlapping; the (night, room) index answers "which
+    rooms are taken between these dates" in one range scan.
+    """
+    room = models.ForeignKey('admin_app.Room', on_delete=models.CASCADE, related_name='booked_nights')
+    night = models.DateField()
+    booking = models.ForeignKey(AccommodationBooking, on_delete=models.CASCADE, related_name='nights')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['room', 'night'], name='guest_app_room_night_unique'),
+        ]
+        indexes = [models.Index(fields=['night', 'room'], name='guest_app_room_night_idx')]
+
+    def __str__(self):
+        return f"{self.room} - {self.night}"
+
 class MapBookmark(TranslatableModel):
     CATEGORY_CHOICES = [
         ('restaurant', _('Food & Restaurant')),
@@ -338,9 +386,26 @@ class MapBookmark(TranslatableModel):
     # Optional primary image field
     primary_image = models.ImageField(upload_to='bookmark_primary_images/', blank=True, null=True)
     
+    # Quadtree cell of (latitude, longitude); see guest_app/map_grid.py
+    grid_key = models.CharField(max_length=32, blank=True, default='', editable=False)
+    
+    TRANSLATED_FIELDS = ('name', 'details')
+    
+    objects = TranslatedQuerySet.as_manager()
+    
+    class Meta:
+        indexes = [models.Index(fields=['user', 'grid_key'], name='guest_app_bookmark_grid_idx')]
+    
     def __str__(self):
         return f"{self.name} ({self.get_category_display()})"
     
+    def save(self, *args, **kwargs):
+        self.grid_key = map_grid.grid_key(self.latitude, self.longitude)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'grid_key'}
+        super().save(*args, **kwargs)
+    
     def get_name(self, lang='en'):
         """Get the name in the specified language"""
         if lang == 'tl' and self.name_tl:
@@ -379,6 +444,10 @@ class BookmarkImage(models.Model):
     
     upload_date = models.DateTimeField(auto_now_add=True)
     
+    TRANSLATED_FIELDS = ('title', 'description')
+    
+    objects = TranslatedQuerySet.as_manager()
+    
     def __str__(self):
         return f"Image for {self.bookmark.name}: {self.title}"
     
@@ -508,3 +577,77 @@ class Friendship(models.Model):
         cls.objects.filter(user=friend, friend=user).delete()
         return True
 
+
+
+class BackgroundJob(models.Model):
+    """
+    A unit of deferred work for ``manage.py run_jobs``: the dotted path of a
+    function and the keyword arguments to call it with. ``key`` identifies
+    the work (e.g. one stored file) so it is only queued once; jobs without
+    one store NULL, which the unique constraint never compares equal.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    task = models.CharField(max_length=200)
+    key = models.CharField(max_length=255, blank=True, null=True, default=None)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='guest_app_job_due_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['task', 'key'], name='guest_app_job_key_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.task} [{self.key or ''}] ({self.status})"
+
+
+class OutboxEmail(models.Model):
+    """
+    An email waiting to be delivered by ``manage.py send_outbox``. Rows are
+    written in the same transaction as the change they announce, so a rolled
+    back booking never sends mail and a committed one always does.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True, default='')
+    from_email = models.CharField(max_length=255)
+    to = models.JSONField(default=list)
+    # [{'filename': ..., 'content': base64, 'mimetype': ...}]
+    attachments = models.JSONField(default=list, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='guest_app_outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.to)} ({self.status})"
@@ -0,0 +1,143 @@
+"""
+Transactional email outbox.
+
+Views call ``queue_email`` instead of ``send_mail``: it only inserts an
+``OutboxEmail`` row, inside whatever transaction the view is in, so the
+request never waits on SMTP. ``manage.py send_outbox`` claims due rows in
+batches and delivers them over one SMTP connection that stays open while
+there is mail to send, reconnecting if the server drops it. A message that
+fails is retried with exponential backoff and marked ``failed`` after
+``EMAIL_OUTBOX_MAX_ATTEMPTS`` tries. Claiming, backoff and the worker loop are
+the ones the job queue uses (``work_queue``); this module only adds the SMTP
+delivery.
+
+Delivery goes through ``EMAIL_BACKEND``, so the locmem and file backends work
+for tests and local development.
+"""
+import base64
+import smtplib
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.utils import timezone
+
+from .models import OutboxEmail
+from .work_queue import WorkQueue
+
+queue = WorkQueue(
+    OutboxEmail, due_field='next_attempt_at', claimed_status='sending', done_status='sent',
+    setting_prefix='EMAIL_OUTBOX',
+    defaults={
+        'BATCH_SIZE': 50, 'POLL_SECONDS': 5, 'MAX_ATTEMPTS': 6, 'RETRY_BASE_SECONDS': 60,
+        'LOCK_TIMEOUT': 10 * 60,
+    },
+)
+
+
+def queue_email(subject, body, to, html_body='', from_email=None, attachments=()):
+    """
+    Queue one email. ``to`` is an address or a list of them; ``attachments``
+    are ``(filename, content bytes, mimetype)`` tuples.
+    """
+    if isinstance(to, str):
+        to = [to]
+    return OutboxEmail.objects.create(
+        subject=subject,
+        body=body,
+        html_body=html_body or '',
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        to=list(to),
+        attachments=[
+            {'filename': filename, 'content': base64.b64encode(content).decode('ascii'), 'mimetype': mimetype}
+            for filename, content, mimetype in attachments
+        ],
+    )
+
+
+def queue_emails(messages):
+    """Queue many ``(subject, body, to, html_body)`` emails in one INSERT."""
+    rows = []
+    for subject, body, to, html_body in messages:
+        rows.append(OutboxEmail(
+            subject=subject, body=body, html_body=html_body or '',
+            from_email=settings.DEFAULT_FROM_EMAIL, to=[to] if isinstance(to, str) else list(to),
+        ))
+    return OutboxEmail.objects.bulk_create(rows)
+
+
+def build_message(email, connection=None):
+    message = EmailMultiAlternatives(
+        subject=email.subject,
+        body=email.body,
+        from_email=email.from_email,
+        to=email.to,
+        connection=connection,
+    )
+    if email.html_body:
+        message.attach_alternative(email.html_body, 'text/html')
+    for attachment in email.attachments:
+        message.attach(attachment['filename'], base64.b64decode(attachment['content']), attachment['mimetype'])
+    return message
+
+
+def _deliver(email, connection):
+    """Send one email, reconnecting once if the server dropped the connection."""
+    try:
+        return connection.send_messages([build_message(email, connection)])
+    except smtplib.SMTPServerDisconnected:
+        connection.close()
+        connection.open()
+        return connection.send_messages([build_message(email, connection)])
+
+
+def _failure(error):
+    return f'{type(error).__name__}: {error}'
+
+
+def drain(connection=None, limit=None):
+    """
+    Send due emails in batches of ``EMAIL_OUTBOX_BATCH_SIZE`` over a single
+    connection until none is due (or ``limit`` have been attempted). Returns
+    counts keyed by outcome: ``{'sent': ..., 'retry': ..., 'failed': ...}``.
+    """
+    counts = queue.outcomes()
+    own_connection = connection is None
+    connection = connection or get_connection(fail_silently=False)
+    opened = False
+    try:
+        while limit is None or sum(counts.values()) < limit:
+            size = queue.setting('BATCH_SIZE')
+            if limit is not None:
+                size = min(size, limit - sum(counts.values()))
+            batch = queue.claim(size)
+            if not batch:
+                break
+            if not opened:
+                try:
+                    connection.open()
+                except Exception as error:
+                    # Server unreachable: the whole batch backs off
+                    for email in batch:
+                        counts[queue.record_failure(email, _failure(error))] += 1
+                    break
+                opened = True
+            for email in batch:
+                try:
+                    if not _deliver(email, connection):
+                        raise smtplib.SMTPException('Message was not accepted by the backend')
+                except Exception as error:
+                    counts[queue.record_failure(email, _failure(error))] += 1
+                    continue
+                counts[queue.record_done(email, sent_at=timezone.now())] += 1
+    finally:
+        if own_connection and opened:
+            connection.close()
+    return counts
+
+
+def work(sleep=None, once=False, stdout=None):
+    """
+    Worker loop behind ``manage.py send_outbox``. With ``once`` it returns
+    the totals as soon as nothing is due instead of polling.
+    """
+    return queue.work(drain, sleep=sleep, once=once, stdout=stdout)
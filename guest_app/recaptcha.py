@@ -0,0 +1,194 @@
+"""
+reCAPTCHA verification client.
+
+``verify`` checks a widget token with the verifier named by
+``RECAPTCHA_VERIFIER``. The default ``GoogleVerifier`` posts to siteverify
+over one process-wide keep-alive ``requests.Session``, so bookings reuse a
+warm TLS connection, with ``RECAPTCHA_CONNECT_TIMEOUT`` /
+``RECAPTCHA_READ_TIMEOUT`` bounding how long a slow upstream can hold a
+worker. ``FakeVerifier`` answers locally for tests and offline development.
+
+Tokens that verified successfully are remembered in the default cache for
+``RECAPTCHA_TOKEN_CACHE_SECONDS`` so a client retrying the same submission
+(Google rejects a token the second time) is not failed. Keep that window
+short: within it the token can be replayed.
+
+Call counts, cache hits and upstream latency are kept per process, read with
+``stats()`` and logged by each worker every ``RECAPTCHA_STATS_LOG_SECONDS``.
+"""
+import hashlib
+import logging
+import threading
+import time
+from collections import deque
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+CACHE_PREFIX = 'guest_app:recaptcha'
+VERIFY_URL = 'https://www.google.com/recaptcha/api/siteverify'
+
+# Returned when the verifier could not be reached or answered garbage
+UNAVAILABLE = 'verification-unavailable'
+
+_lock = threading.Lock()
+_session = None
+
+# Latency samples (ms) kept for percentiles
+LATENCY_SAMPLES = 1000
+_stats = {'calls': 0, 'failures': 0, 'errors': 0, 'cache_hits': 0}
+_latencies = deque(maxlen=LATENCY_SAMPLES)
+_last_report = time.monotonic()
+
+
+def timeout():
+    """``(connect, read)`` timeout in seconds for siteverify calls."""
+    return (
+        float(getattr(settings, 'RECAPTCHA_CONNECT_TIMEOUT', 2)),
+        float(getattr(settings, 'RECAPTCHA_READ_TIMEOUT', 4)),
+    )
+
+
+def get_session():
+    """Shared keep-alive session; retries are left to the client."""
+    global _session
+    with _lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=1,
+                pool_maxsize=int(getattr(settings, 'RECAPTCHA_POOL_SIZE', 10)),
+                max_retries=0,
+            )
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _session = session
+        return _session
+
+
+class GoogleVerifier:
+    """Checks tokens against Google's siteverify endpoint."""
+
+    def verify(self, token, remote_ip=None):
+        data = {'secret': settings.RECAPTCHA_SECRET_KEY, 'response': token}
+        if remote_ip:
+            data['remoteip'] = remote_ip
+        url = getattr(settings, 'RECAPTCHA_VERIFY_URL', VERIFY_URL)
+        response = get_session().post(url, data=data, timeout=timeout())
+        response.raise_for_status()
+        return response.json()
+
+
+class FakeVerifier:
+    """
+    Local stand-in: accepts every token except those starting with
+    ``fail``, which are rejected with ``invalid-input-response``.
+    """
+
+    def verify(self, token, remote_ip=None):
+        if token.startswith('fail'):
+            return {'success': False, 'error-codes': ['invalid-input-response']}
+        return {'success': True, 'hostname': 'localhost'}
+
+
+def get_verifier():
+    return import_string(getattr(settings, 'RECAPTCHA_VERIFIER', 'guest_app.recaptcha.GoogleVerifier'))()
+
+
+def _cache_key(token):
+    return f'{CACHE_PREFIX}:{hashlib.sha256(token.encode("utf-8")).hexdigest()}'
+
+
+def _record(outcome, elapsed_ms=None):
+    global _last_report
+    interval = getattr(settings, 'RECAPTCHA_STATS_LOG_SECONDS', 5 * 60)
+    now = time.monotonic()
+    with _lock:
+        _stats['calls'] += 1
+        if outcome:
+            _stats[outcome] += 1
+        if elapsed_ms is not None:
+            _latencies.append(elapsed_ms)
+        report = bool(interval) and now - _last_report >= interval
+        if report:
+            _last_report = now
+    if report:
+        _log_stats()
+
+
+def _log_stats():
+    counters = stats()
+    latency = counters.pop('latency_ms')
+    logger.info(
+        'reCAPTCHA: %s; latency ms mean %.1f p50 %.1f p95 %.1f max %.1f over %d calls',
+        ', '.join(f'{name} {count}' for name, count in counters.items()),
+        latency['mean'], latency['p50'], latency['p95'], latency['max'], latency['count'],
+    )
+
+
+def verify(token, remote_ip=None):
+    """
+    Verify a widget token. Returns the siteverify-style result
+    ``{'success': bool, 'error-codes': [...]}``; network errors and timeouts
+    give ``success: False`` with the ``UNAVAILABLE`` error code.
+    """
+    key = _cache_key(token)
+    if cache.get(key):
+        _record('cache_hits')
+        return {'success': True, 'cached': True}
+
+    started = time.perf_counter()
+    try:
+        result = get_verifier().verify(token, remote_ip=remote_ip)
+    except (requests.RequestException, ValueError) as error:
+        _record('errors', (time.perf_counter() - started) * 1000)
+        logger.warning('reCAPTCHA verification error: %s', error)
+        return {'success': False, 'error-codes': [UNAVAILABLE]}
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    if result.get('success', False):
+        _record(None, elapsed_ms)
+        cache.set(key, True, timeout=getattr(settings, 'RECAPTCHA_TOKEN_CACHE_SECONDS', 60))
+    else:
+        _record('failures', elapsed_ms)
+    return result
+
+
+def _percentile(samples, fraction):
+    return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+
+def stats():
+    """
+    Counters since start-up (or ``reset()``) and upstream latency in ms over
+    the last ``LATENCY_SAMPLES`` verifier calls.
+    """
+    with _lock:
+        counters = dict(_stats)
+        samples = sorted(_latencies)
+    counters['latency_ms'] = {
+        'count': len(samples),
+        'mean': sum(samples) / len(samples) if samples else 0.0,
+        'p50': _percentile(samples, 0.5) if samples else 0.0,
+        'p95': _percentile(samples, 0.95) if samples else 0.0,
+        'max': samples[-1] if samples else 0.0,
+    }
+    return counters
+
+
+def reset():
+    """Close the shared session and clear the counters (tests)."""
+    global _session, _last_report
+    with _lock:
+        _last_report = time.monotonic()
+        if _session is not None:
+            _session.close()
+        _session = None
+        for name in _stats:
+            _stats[name] = 0
+        _latencies.clear()
@@ -0,0 +1,28 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from tour_app.models import Tour_Add, Tour_Event
+
+from .derivatives import request_processing
+from .models import BookmarkImage, Guest, MapBookmark
+
+# Image fields whose new files are queued for normalization and resized
+# variants (``manage.py run_jobs`` does the work)
+IMAGE_FIELDS = {
+    BookmarkImage: 'image',
+    MapBookmark: 'primary_image',
+    Tour_Add: 'image',
+    Tour_Event: 'image',
+    Guest: 'picture',
+}
+
+
+@receiver(post_save)
+def image_saved(sender, instance, update_fields=None, **kwargs):
+    field = IMAGE_FIELDS.get(sender)
+    if field is None or (update_fields is not None and field not in update_fields):
+        return
+    field_file = getattr(instance, field)
+    if field_file:
+        # Queued in the saving transaction, so only committed uploads are processed
+        request_processing(field_file)
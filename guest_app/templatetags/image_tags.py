@@ -0,0 +1,27 @@
+from django import template
+from django.utils.html import format_html
+
+from guest_app.derivatives import image_sources
+
+register = template.Library()
+
+
+@register.simple_tag
+def responsive_image(field_file, alt='', sizes='100vw', css_class=''):
+    """
+    ``<picture>`` for an image field with WebP and JPEG ``srcset`` variants,
+    falling back to a plain ``<img>`` of the original.
+    """
+    sources = image_sources(field_file)
+    if sources is None:
+        return ''
+    if not sources['srcset']:
+        return format_html('<img src="{}" alt="{}" class="{}">', sources['url'], alt, css_class)
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}" class="{}" loading="lazy">'
+        '</picture>',
+        sources['webp_srcset'], sizes,
+        sources['url'], sources['srcset'], sizes, alt, css_class,
+    )
@@ -1,3 +1,934 @@
-from django.test import TestCase
+import base64
+import io
+import json
+import os
+import shutil
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest.mock import Mock, patch
 
-# Create your tests here.
+import requests
+
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.mail.backends.locmem import EmailBackend as LocmemEmailBackend
+from django.db import connection
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from admin_app.models import Accomodation, Room
+from tour_app.models import Tour_Add, Tour_Schedule
+from tour_app.translation_models import TourAddTranslation
+
+from . import derivatives, inventory, jobs, map_grid, outbox, recaptcha
+from .bookmarks import invalidate_bookmarks
+from .models import (
+    AccommodationBooking, BackgroundJob, BookingCompanion, BookmarkImage, Guest, MapBookmark, OutboxEmail, Pending,
+    RoomNight, TourBooking,
+)
+from .utils import get_translation_bundle, get_translations_url, sweep_booking_statuses
+from .views import annotated_tour_listing
+
+
+class MainPageTourListingTests(TestCase):
+    def _create_tours(self, start, count):
+        now = timezone.now()
+        for number in range(start, start + count):
+            tour = Tour_Add.objects.create(
+                tour_id=f"{number:05d}",
+                tour_name=f"Tour {number}",
+                description=f"Description {number}",
+                image="tours/placeholder.jpg",
+            )
+            for price, days in (("500.00", 1), ("750.00", 3)):
+                Tour_Schedule.objects.create(
+                    tour=tour,
+                    start_time=now + timedelta(days=5),
+                    end_time=now + timedelta(days=5 + days),
+                    price=Decimal(price),
+                    slots_available=10,
+                    duration_days=days,
+                    status="active",
+                )
+
+    def _main_page_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("main-page"))
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_listing_annotates_ranges_and_translation(self):
+        self._create_tours(1, 2)
+        TourAddTranslation.objects.create(
+            tour_id="00001", language="tl", tour_name="Paglilibot 1", description="Paglalarawan 1"
+        )
+
+        tours = {tour.tour_id: tour for tour in annotated_tour_listing("tl")}
+
+        self.assertEqual(len(tours), 2)
+        first = tours["00001"]
+        self.assertEqual(first.translated_tour_name, "Paglilibot 1")
+        self.assertEqual(first.translated_description, "Paglalarawan 1")
+        self.assertEqual(first.schedule_count, 2)
+        self.assertEqual((first.min_price, first.max_price), (Decimal("500.00"), Decimal("750.00")))
+        self.assertEqual((first.min_duration, first.max_duration), (1, 3))
+        self.assertEqual(tours["00002"].translated_tour_name, "Tour 2")
+
+    def test_single_schedule_without_duration_uses_its_date_span(self):
+        tour = Tour_Add.objects.create(
+            tour_id="00009", tour_name="Island Hop", description="Boats", image="tours/placeholder.jpg"
+        )
+        start = timezone.localtime().replace(hour=9, minute=0) + timedelta(days=5)
+        schedule = Tour_Schedule.objects.create(
+            tour=tour, start_time=start, end_time=start + timedelta(days=2, hours=3), price=Decimal("900.00"),
+        )
+        Tour_Schedule.objects.filter(pk=schedule.pk).update(duration_days=0)
+
+        response = self.client.get(reverse("main-page"))
+        self.assertContains(response, "3 days")
+
+    def test_main_page_query_count_does_not_grow_with_tours(self):
+        self._create_tours(1, 1)
+        baseline = self._main_page_queries()
+
+        self._create_tours(2, 5)
+
+        self.assertEqual(self._main_page_queries(), baseline)
+
+
+class BookingStatusSweepTests(TestCase):
+    def setUp(self):
+        self.guest = Guest.objects.create(
+            username="sweeper", email="sweeper@example.com", first_name="Sam", last_name="Sweep",
+            country_of_origin="PH", phone_number="09170000000", sex="M",
+        )
+        self.tour = Tour_Add.objects.create(
+            tour_id="00001", tour_name="River", description="River tour", image="tours/river.jpg"
+        )
+        now = timezone.now()
+        self.upcoming = self._schedule(now + timedelta(days=1), now + timedelta(days=2))
+        self.running = self._schedule(now - timedelta(hours=1), now + timedelta(hours=5))
+        self.finished = self._schedule(now - timedelta(days=3), now - timedelta(days=2))
+        self.cancelled = self._schedule(now - timedelta(days=3), now - timedelta(days=2), status="cancelled")
+
+    def _schedule(self, start, end, status="active"):
+        return Tour_Schedule.objects.create(
+            tour=self.tour, start_time=start, end_time=end, price=Decimal("100.00"),
+            slots_available=10, status=status,
+        )
+
+    def _book(self, schedule, status):
+        return TourBooking.objects.create(guest=self.guest, tour=self.tour, schedule=schedule, status=status)
+
+    def _pending(self, schedule, status="Pending"):
+        return Pending.objects.create(guest_id=self.guest, tour_id=self.tour, sched_id=schedule, status=status)
+
+    def _status(self, obj):
+        obj.refresh_from_db()
+        return obj.status
+
+    def test_sweep_moves_statuses_in_bulk(self):
+        upcoming_booking = self._book(self.upcoming, "pending")
+        running_booking = self._book(self.running, "pending")
+        finished_booking = self._book(self.finished, "active")
+        cancelled_booking = self._book(self.finished, "cancelled")
+        running_pending = self._pending(self.running)
+        finished_pending = self._pending(self.finished)
+        declined_pending = self._pending(self.finished, status="Declined")
+
+        counts = sweep_booking_statuses()
+
+        self.assertEqual(self._status(self.upcoming), "active")
+        self.assertEqual(self._status(self.running), "active")
+        self.assertEqual(self._status(self.finished), "completed")
+        self.assertEqual(self._status(self.cancelled), "cancelled")
+        self.assertEqual(self._status(upcoming_booking), "pending")
+        self.assertEqual(self._status(running_booking), "active")
+        self.assertEqual(self._status(finished_booking), "completed")
+        self.assertEqual(self._status(cancelled_booking), "cancelled")
+        self.assertEqual(self._status(running_pending), "Active")
+        self.assertEqual(self._status(finished_pending), "Completed")
+        self.assertEqual(self._status(declined_pending), "Declined")
+        self.assertEqual(counts["schedules_completed"], 1)
+        self.assertEqual(counts["bookings_active"], 1)
+
+        self.assertEqual(sum(sweep_booking_statuses().values()), 0)
+
+    def test_main_page_does_not_write_statuses(self):
+        booking = self._book(self.finished, "active")
+        pending = self._pending(self.running)
+        self.client.force_login(self.guest)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("main-page"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._status(booking), "active")
+        self.assertEqual(self._status(pending), "Pending")
+        booking_tables = ("guest_app_tourbooking", "guest_app_pending", "tour_app_tour_schedule")
+        writes = [
+            query["sql"] for query in queries
+            if query["sql"].startswith("UPDATE") and any(table in query["sql"] for table in booking_tables)
+        ]
+        self.assertEqual(writes, [])
+
+
+class TripsApiTests(TestCase):
+    def setUp(self):
+        self.guest = Guest.objects.create(
+            username="traveler", email="traveler@example.com", first_name="Tia", last_name="Travel",
+            country_of_origin="PH", phone_number="09170000001", sex="F",
+        )
+        self.tour = Tour_Add.objects.create(tour_id="00001", tour_name="River", description="River tour")
+        self.now = timezone.now()
+        self.client.force_login(self.guest)
+
+    def _trip(self, days_from_now, kind="booking", status=None, length=timedelta(hours=4)):
+        start = self.now + timedelta(days=days_from_now)
+        schedule = Tour_Schedule.objects.create(
+            tour=self.tour, start_time=start, end_time=start + length, price=Decimal("100.00"),
+            slots_available=10,
+        )
+        if kind == "booking":
+            return TourBooking.objects.create(
+                guest=self.guest, tour=self.tour, schedule=schedule, status=status or "pending",
+                num_adults=2, num_children=1,
+            )
+        return Pending.objects.create(
+            guest_id=self.guest, tour_id=self.tour, sched_id=schedule, status=status or "Pending",
+            num_adults=0, total_guests=3,
+        )
+
+    def _all_pages(self, bucket, page_size):
+        trips, cursor = [], None
+        while True:
+            params = {"page_size": page_size}
+            if cursor:
+                params["cursor"] = cursor
+            data = self.client.get(reverse("trips_api", args=[bucket]), params).json()
+            trips.extend((trip["kind"], trip["id"]) for trip in data["results"])
+            cursor = data["next_cursor"]
+            if not cursor:
+                return trips
+
+    def test_buckets_are_split_by_time_and_cancellation(self):
+        upcoming = self._trip(2)
+        current = self._trip(0, kind="pending", length=timedelta(days=1))
+        past = self._trip(-3)
+        cancelled = self._trip(5, status="cancelled")
+
+        self.assertEqual(self._all_pages("upcoming", 10), [("booking", upcoming.pk)])
+        self.assertEqual(self._all_pages("current", 10), [("pending", current.pk)])
+        self.assertEqual(self._all_pages("past", 10), [("booking", cancelled.pk), ("booking", past.pk)])
+
+    def test_keyset_pages_cover_every_trip_once_in_order(self):
+        expected = []
+        for day in range(1, 8):
+            expected.append(("booking", self._trip(day).pk))
+            expected.append(("pending", self._trip(day, kind="pending").pk))
+
+        self.assertEqual(self._all_pages("upcoming", 3), expected)
+
+    def test_page_payload_and_errors(self):
+        self._trip(1, kind="pending")
+        response = self.client.get(reverse("trips_api", args=["upcoming"]))
+        trip = response.json()["results"][0]
+        self.assertEqual((trip["guests"], trip["total_price"]), (3, "300.00"))
+
+        self.assertEqual(self.client.get(reverse("trips_api", args=["someday"])).status_code, 404)
+        self.assertEqual(
+            self.client.get(reverse("trips_api", args=["upcoming"]), {"cursor": "not-a-cursor"}).status_code, 400
+        )
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse("trips_api", args=["upcoming"])).status_code, 401)
+
+
+class TranslationBundleTests(TestCase):
+    def test_bundle_is_served_immutable_with_etag(self):
+        url = get_translations_url("tl")
+        version = get_translation_bundle("tl")["version"]
+        self.assertIn(version, url)
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertEqual(response["ETag"], f'"{version}"')
+        self.assertEqual(response.content, get_translation_bundle("tl")["content"])
+
+        cached = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(cached.status_code, 304)
+
+    def test_stale_version_redirects_to_current_bundle(self):
+        response = self.client.get(reverse("translation-bundle", args=["es", "0123456789abcdef"]))
+        self.assertRedirects(response, get_translations_url("es"), fetch_redirect_response=False)
+
+    def test_pages_reference_bundle_instead_of_inlining_it(self):
+        response = self.client.get(reverse("main-page"))
+        self.assertContains(response, get_translations_url("en"))
+        self.assertNotContains(response, get_translation_bundle("en")["json"])
+
+        api = self.client.get(reverse("get-translations", args=["ceb"])).json()
+        self.assertEqual(api["language"], "ceb")
+        self.assertEqual(api["translations"], json.loads(get_translation_bundle("ceb")["json"]))
+
+
+class TranslatedBookmarkQueryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def _bookmark(self, number, with_tl=True):
+        bookmark = MapBookmark.objects.create(
+            name=f"Place {number}", name_tl=f"Lugar {number}" if with_tl else "",
+            details=f"Details {number}", category="landmark", latitude=9.36, longitude=122.8,
+        )
+        for index in range(2):
+            BookmarkImage.objects.create(
+                bookmark=bookmark, image=f"bookmark_images/{number}-{index}.jpg",
+                title=f"Photo {index}", title_tl=f"Larawan {index}" if with_tl else None,
+            )
+        return bookmark
+
+    def _set_language(self, lang):
+        session = self.client.session
+        session["django_language"] = lang
+        session.save()
+
+    def test_translated_matches_per_object_getters(self):
+        self._bookmark(1)
+        self._bookmark(2, with_tl=False)
+        for bookmark in MapBookmark.objects.translated("tl"):
+            self.assertEqual(bookmark.translated_name, bookmark.get_name("tl"))
+            self.assertEqual(bookmark.translated_details, bookmark.get_details("tl"))
+        for image in BookmarkImage.objects.translated("tl"):
+            self.assertEqual(image.translated_title, image.get_title("tl"))
+            self.assertEqual(image.translated_description, image.get_description("tl"))
+
+    def test_bookmark_list_query_count_does_not_grow_with_bookmarks(self):
+        self._set_language("tl")
+        self._bookmark(1)
+        with CaptureQueriesContext(connection) as baseline:
+            self.client.get(reverse("bookmark_list"))
+
+        for number in range(2, 7):
+            self._bookmark(number)
+        invalidate_bookmarks(None)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("bookmark_list"))
+
+        self.assertEqual(len(queries), len(baseline))
+        names = {bookmark["name"] for bookmark in response.json()["bookmarks"]}
+        self.assertIn("Lugar 6", names)
+        self.assertEqual(response.json()["bookmarks"][0]["images"][0]["title"], "Larawan 0")
+
+
+class BookmarkPayloadCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.bookmark = MapBookmark.objects.create(
+            name="Plaza", category="landmark", latitude=9.36, longitude=122.8,
+        )
+        self.image = BookmarkImage.objects.create(bookmark=self.bookmark, image="bookmark_images/plaza.jpg")
+
+    def _bookmarks(self):
+        return self.client.get(reverse("bookmark_list")).json()["bookmarks"]
+
+    def test_payload_is_cached_with_absolute_urls(self):
+        first = self._bookmarks()
+        self.assertEqual(first[0]["images"][0]["url"], "http://testserver/media/bookmark_images/plaza.jpg")
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self._bookmarks(), first)
+        self.assertFalse([q for q in queries if "guest_app_mapbookmark" in q["sql"]])
+
+    def test_endpoints_invalidate_cached_payload(self):
+        self._bookmarks()
+
+        self.client.post(
+            reverse("bookmark_update", args=[self.bookmark.id]),
+            data=json.dumps({"name": "Town Plaza"}), content_type="application/json",
+        )
+        self.assertEqual(self._bookmarks()[0]["name"], "Town Plaza")
+
+        self.client.post(reverse("bookmark_delete_image", args=[self.image.id]))
+        self.assertEqual(self._bookmarks()[0]["images"], [])
+
+        self.client.post(
+            reverse("bookmark_create"),
+            data=json.dumps({"name": "Pier", "lat": 9.3, "lng": 122.7}), content_type="application/json",
+        )
+        self.assertEqual(len(self._bookmarks()), 2)
+
+        self.client.post(reverse("bookmark_delete", args=[self.bookmark.id]))
+        self.assertEqual([bookmark["name"] for bookmark in self._bookmarks()], ["Pier"])
+
+
+class BookmarkViewportTests(TestCase):
+    def setUp(self):
+        # A dense group near the city hall and a lone pier far away
+        for offset in range(4):
+            MapBookmark.objects.create(
+                name=f"Hall {offset}", category="public", latitude=750 + offset, longitude=640 + offset,
+            )
+        self.pier = MapBookmark.objects.create(name="Pier", category="landmark", latitude=200, longitude=1100)
+
+    def _viewport(self, south, west, north, east, zoom):
+        response = self.client.get(reverse("bookmark_viewport"), {
+            "south": south, "west": west, "north": north, "east": east, "zoom": zoom,
+        })
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_grid_key_prefixes_nest(self):
+        key = map_grid.grid_key(750, 640)
+        self.assertEqual(len(key), map_grid.levels())
+        self.assertEqual(MapBookmark.objects.get(name="Hall 0").grid_key, key)
+        for prefix in map_grid.covering_prefixes(700, 600, 800, 700):
+            if key.startswith(prefix):
+                break
+        else:
+            self.fail("covering cells miss a point inside the box")
+
+    def test_high_zoom_returns_only_bookmarks_in_box(self):
+        data = self._viewport(700, 600, 800, 700, zoom=2)
+
+        self.assertEqual(sorted(bookmark["name"] for bookmark in data["bookmarks"]), [f"Hall {n}" for n in range(4)])
+        self.assertEqual(data["clusters"], [])
+
+    def test_low_zoom_clusters_dense_points(self):
+        data = self._viewport(0, 0, 1500, 1200, zoom=-1)
+
+        self.assertEqual([bookmark["name"] for bookmark in data["bookmarks"]], ["Pier"])
+        self.assertEqual(len(data["clusters"]), 1)
+        self.assertEqual(data["clusters"][0]["count"], 4)
+        self.assertAlmostEqual(data["clusters"][0]["lat"], 751.5)
+
+    def test_moving_a_bookmark_updates_its_cell(self):
+        self.pier.latitude, self.pier.longitude = 760, 650
+        self.pier.save(update_fields=["latitude", "longitude"])
+        self.pier.refresh_from_db()
+
+        self.assertEqual(self.pier.grid_key, map_grid.grid_key(760, 650))
+        self.assertEqual(len(self._viewport(700, 600, 800, 700, zoom=2)["bookmarks"]), 5)
+
+    def test_rejects_bad_boxes(self):
+        url = reverse("bookmark_viewport")
+        self.assertEqual(self.client.get(url, {"south": 1}).status_code, 400)
+        self.assertEqual(
+            self.client.get(url, {"south": 10, "west": 0, "north": 0, "east": 10, "zoom": 0}).status_code, 400
+        )
+        for name, value in (("south", "nan"), ("east", "inf"), ("zoom", "-inf"), ("west", "NaN")):
+            box = {"south": 0, "west": 0, "north": 10, "east": 10, "zoom": 0, name: value}
+            self.assertEqual(self.client.get(url, box).status_code, 400, name)
+
+
+class BookmarkImageUploadTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media_root, BOOKMARK_IMAGE_MAX_UPLOAD_SIZE=64 * 1024)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.bookmark = MapBookmark.objects.create(name="Pier", category="landmark", latitude=200, longitude=1100)
+        self.url = reverse("bookmark_add_image", args=[self.bookmark.id])
+
+    def test_multipart_upload_streams_to_storage(self):
+        photo = SimpleUploadedFile("pier.png", b"\x89PNG" + b"x" * 4096, content_type="image/png")
+        response = self.client.post(self.url, {"image": photo, "title": "Sunset"})
+
+        self.assertEqual(response.status_code, 200)
+        image = BookmarkImage.objects.get(bookmark=self.bookmark)
+        self.assertEqual(image.title, "Sunset")
+        self.assertTrue(image.image.name.endswith(".png"))
+        self.assertEqual(image.image.size, 4100)
+
+    def test_multipart_upload_over_limit_is_rejected(self):
+        photo = SimpleUploadedFile("huge.jpg", b"x" * (64 * 1024 + 1), content_type="image/jpeg")
+        response = self.client.post(self.url, {"image": photo})
+
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(response.json()["success"])
+        self.assertFalse(BookmarkImage.objects.exists())
+
+    def test_base64_json_upload_still_accepted(self):
+        data_uri = "data:image/jpeg;base64," + base64.b64encode(b"\xff\xd8jpeg").decode()
+        response = self.client.post(self.url, json.dumps({"image": data_uri}), content_type="application/json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(BookmarkImage.objects.get(bookmark=self.bookmark).image.read(), b"\xff\xd8jpeg")
+
+    def test_missing_file_is_rejected(self):
+        response = self.client.post(self.url, {"title": "No photo"})
+        self.assertEqual(response.status_code, 400)
+
+
+def png_bytes(width, height, color=(200, 80, 40, 255)):
+    buffer = io.BytesIO()
+    Image.new("RGBA", (width, height), color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+@override_settings(IMAGE_DERIVATIVE_WIDTHS=(320, 640, 1280))
+class ImageDerivativeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.bookmark = MapBookmark.objects.create(name="Pier", category="landmark", latitude=200, longitude=1100)
+
+    def _image(self, data, name="photo.png", process=True):
+        image = BookmarkImage(bookmark=self.bookmark, title="Photo")
+        image.image.save(name, ContentFile(data), save=True)
+        if process:
+            jobs.work(once=True)
+            # Normalization may have moved the file
+            image.refresh_from_db()
+        return image
+
+    def test_upload_only_queues_processing(self):
+        image = self._image(png_bytes(1000, 500), process=False)
+
+        job = BackgroundJob.objects.get()
+        self.assertEqual(job.task, derivatives.PROCESS_IMAGE)
+        self.assertEqual(job.payload["name"], image.image.name)
+        self.assertEqual(derivatives.image_sources(image.image)["srcset"], "")
+        # Re-saving the same file does not queue it again
+        image.save()
+        self.assertEqual(BackgroundJob.objects.count(), 1)
+
+        self.assertEqual(jobs.work(once=True), {"done": 1, "retry": 0, "failed": 0})
+        image.refresh_from_db()
+        self.assertNotEqual(derivatives.image_sources(image.image)["srcset"], "")
+
+    def test_pending_images_are_looked_up_and_queued_once(self):
+        image = self._image(png_bytes(1000, 500), process=False)
+        # An image uploaded before the pipeline: no job queued yet
+        BackgroundJob.objects.all().delete()
+
+        self.assertEqual(derivatives.image_sources(image.image)["srcset"], "")
+        self.assertEqual(BackgroundJob.objects.count(), 1)
+
+        with patch.object(derivatives, "content_hash") as content_hash, self.assertNumQueries(0):
+            for _ in range(3):
+                self.assertEqual(derivatives.image_sources(image.image)["srcset"], "")
+        content_hash.assert_not_called()
+
+    def test_variants_cover_widths_below_the_original(self):
+        image = self._image(png_bytes(1000, 500))
+        sources = derivatives.image_sources(image.image)
+
+        self.assertEqual(sources["width"], 1000)
+        self.assertEqual(
+            [candidate.split(" ")[1] for candidate in sources["srcset"].split(", ")], ["320w", "640w", "1000w"]
+        )
+        self.assertIn(".webp 320w", sources["webp_srcset"])
+        digest = derivatives.content_hash(image.image)
+        with image.image.storage.open(derivatives.derivative_name(digest, 640, "jpg")) as variant:
+            self.assertEqual(Image.open(variant).size, (640, 320))
+
+    def test_normalization_applies_exif_rotation_and_strips_metadata(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6  # rotate 90 degrees clockwise when displayed
+        exif[0x010F] = "PhoneMaker"
+        buffer = io.BytesIO()
+        Image.new("RGB", (800, 400), (10, 120, 200)).save(buffer, "JPEG", exif=exif.tobytes())
+        image = self._image(buffer.getvalue(), "phone.jpg", process=False)
+        uploaded_name = image.image.name
+        with self.captureOnCommitCallbacks() as callbacks:
+            jobs.work(once=True)
+
+        image.refresh_from_db()
+        with image.image.open("rb") as stored:
+            normalized = Image.open(stored)
+            self.assertEqual(normalized.size, (400, 800))
+            self.assertEqual(len(normalized.getexif()), 0)
+        self.assertEqual(derivatives.image_sources(image.image)["width"], 400)
+        # The row points at the new file; the upload goes once that commits
+        self.assertNotEqual(image.image.name, uploaded_name)
+        self.assertTrue(image.image.storage.exists(uploaded_name))
+        for callback in callbacks:
+            callback()
+        self.assertFalse(image.image.storage.exists(uploaded_name))
+        self.assertEqual(os.listdir(os.path.join(self.media_root, "bookmark_images")),
+                         [os.path.basename(image.image.name)])
+        # Saving the row again does not queue the normalized file
+        image.save()
+        self.assertEqual(jobs.work(once=True), {"done": 0, "retry": 0, "failed": 0})
+
+    def test_failed_normalization_keeps_the_original(self):
+        exif = Image.Exif()
+        exif[0x010F] = "PhoneMaker"
+        buffer = io.BytesIO()
+        Image.new("RGB", (800, 400)).save(buffer, "JPEG", exif=exif.tobytes())
+        image = self._image(buffer.getvalue(), "phone.jpg", process=False)
+
+        with patch("django.core.files.storage.FileSystemStorage.save", side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                derivatives.normalize_image(image.image)
+        with image.image.open("rb") as stored:
+            self.assertEqual(stored.read(), buffer.getvalue())
+
+    def test_failed_variants_keep_the_original(self):
+        exif = Image.Exif()
+        exif[0x010F] = "PhoneMaker"
+        buffer = io.BytesIO()
+        Image.new("RGB", (800, 400)).save(buffer, "JPEG", exif=exif.tobytes())
+        image = self._image(buffer.getvalue(), "phone.jpg", process=False)
+        uploaded_name = image.image.name
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with patch.object(derivatives, "ensure_derivatives", side_effect=OSError("disk full")):
+                self.assertEqual(jobs.work(once=True)["retry"], 1)
+        self.assertEqual(callbacks, [])
+
+        image.refresh_from_db()
+        self.assertEqual(image.image.name, uploaded_name)
+        with image.image.open("rb") as stored:
+            self.assertEqual(stored.read(), buffer.getvalue())
+
+    def test_identical_uploads_share_variants(self):
+        first = self._image(png_bytes(700, 700), "a.png")
+        second = self._image(png_bytes(700, 700), "b.png")
+
+        first_set = derivatives.image_sources(first.image)["webp_srcset"].split(", ")[:2]
+        second_set = derivatives.image_sources(second.image)["webp_srcset"].split(", ")[:2]
+        self.assertEqual(first_set, second_set)
+
+    def test_small_and_unreadable_images_fall_back_to_original(self):
+        small = self._image(png_bytes(200, 100))
+        broken = self._image(b"not an image", "broken.jpg")
+
+        for image in (small, broken):
+            sources = derivatives.image_sources(image.image)
+            self.assertEqual(sources["url"], image.image.url)
+            self.assertEqual(sources["srcset"], "")
+
+    def test_processing_refreshes_cached_bookmark_payload(self):
+        image = self._image(png_bytes(1000, 500), process=False)
+        served = self.client.get(reverse("bookmark_list")).json()["bookmarks"][0]["images"][0]
+        self.assertEqual(served["srcset"], "")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            jobs.work(once=True)
+        image.refresh_from_db()
+
+        served = self.client.get(reverse("bookmark_list")).json()["bookmarks"][0]["images"][0]
+        self.assertEqual(served["url"], "http://testserver" + image.image.url)
+        self.assertIn("_320w.jpg 320w", served["srcset"])
+
+    def test_bookmark_payload_and_template_emit_srcset(self):
+        image = self._image(png_bytes(1000, 500))
+        response = self.client.get(reverse("bookmark_list"))
+        served = response.json()["bookmarks"][0]["images"][0]
+
+        self.assertTrue(served["srcset"].startswith("http://testserver/media/derivatives/"))
+        self.assertIn("_320w.webp 320w", served["webp_srcset"])
+
+        html = Template("{% load image_tags %}{% responsive_image image.image 'Pier' %}").render(
+            Context({"image": image})
+        )
+        self.assertIn('<source type="image/webp"', html)
+        self.assertIn('_640w.jpg 640w', html)
+
+
+def failing_job(message):
+    raise RuntimeError(message)
+
+
+@override_settings(JOB_MAX_ATTEMPTS=2, JOB_RETRY_BASE_SECONDS=60)
+class BackgroundJobTests(TestCase):
+    def test_failures_back_off_then_give_up(self):
+        job = jobs.enqueue("guest_app.tests.failing_job", message="boom")
+
+        self.assertEqual(jobs.run_pending(), {"done": 0, "retry": 1, "failed": 0})
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ("pending", 1))
+        self.assertIn("RuntimeError: boom", job.last_error)
+        self.assertGreater(job.run_after, timezone.now() + timedelta(seconds=50))
+        # Not due yet
+        self.assertEqual(jobs.run_pending(), {"done": 0, "retry": 0, "failed": 0})
+
+        BackgroundJob.objects.update(run_after=timezone.now())
+        self.assertEqual(jobs.run_pending(), {"done": 0, "retry": 0, "failed": 1})
+        self.assertEqual(BackgroundJob.objects.get().status, "failed")
+
+    def test_keyed_jobs_are_unique_even_past_the_exists_check(self):
+        self.assertIsNotNone(jobs.enqueue("guest_app.tests.failing_job", key="image:1", message="boom"))
+        self.assertIsNone(jobs.enqueue("guest_app.tests.failing_job", key="image:1", message="boom"))
+        # A second worker that raced past the existence check
+        with patch.object(BackgroundJob.objects, "filter", return_value=BackgroundJob.objects.none()):
+            self.assertIsNone(jobs.enqueue("guest_app.tests.failing_job", key="image:1", message="boom"))
+        # Jobs without a key never collide
+        jobs.enqueue("guest_app.tests.failing_job", message="a")
+        jobs.enqueue("guest_app.tests.failing_job", message="b")
+        self.assertEqual(BackgroundJob.objects.count(), 3)
+
+    def test_stale_running_jobs_are_requeued(self):
+        job = jobs.enqueue("guest_app.tests.failing_job", message="boom")
+        BackgroundJob.objects.update(status="running", locked_at=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(jobs.requeue_stale(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, "pending")
+
+
+@override_settings(RECAPTCHA_VERIFIER="guest_app.recaptcha.FakeVerifier")
+class BookTourReservationTests(TestCase):
+    def setUp(self):
+        self.guest = Guest.objects.create(
+            username="booker", email="booker@example.com", first_name="Bo", last_name="Oker",
+            country_of_origin="PH", phone_number="09170000002", sex="M",
+        )
+        self.friend = Guest.objects.create(
+            username="friend", email="friend@example.com", first_name="Fe", last_name="Riend",
+            country_of_origin="PH", phone_number="09170000003", sex="F",
+        )
+        tour = Tour_Add.objects.create(tour_id="00001", tour_name="River", description="River tour")
+        start = timezone.now() + timedelta(days=7)
+        self.schedule = Tour_Schedule.objects.create(
+            tour=tour, start_time=start, end_time=start + timedelta(hours=4), price=Decimal("100.00"),
+            slots_available=3,
+        )
+
+    def _book(self, total_guests):
+        return self.client.post(reverse("book_tour"), {
+            "g_recaptcha_response": "token",
+            "guest_id": self.guest.guest_id,
+            "sched_id": self.schedule.sched_id,
+            "price": "100",
+            "total_guests": total_guests,
+            "selected_companions": json.dumps([self.friend.guest_id]),
+        })
+
+    def test_booking_takes_slots_and_records_companions(self):
+        response = self._book(2)
+
+        self.assertEqual(response.status_code, 200)
+        self.schedule.refresh_from_db()
+        self.assertEqual((self.schedule.slots_available, self.schedule.slots_booked), (1, 2))
+        pending = Pending.objects.get()
+        self.assertEqual(pending.tour_id_id, "00001")
+        self.assertEqual(list(pending.companions.values_list("companion_id", flat=True)), [self.friend.guest_id])
+        # The acknowledgment is queued, not sent inside the request
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(OutboxEmail.objects.get().to, ["booker@example.com"])
+
+    def test_full_schedule_writes_nothing(self):
+        response = self._book(4)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["error"], "Not enough available slots.")
+        self.assertFalse(Pending.objects.exists())
+        self.assertFalse(BookingCompanion.objects.exists())
+        self.assertFalse(OutboxEmail.objects.exists())
+        self.schedule.refresh_from_db()
+        self.assertEqual((self.schedule.slots_available, self.schedule.slots_booked), (3, 0))
+
+
+    def test_failed_recaptcha_writes_nothing(self):
+        response = self.client.post(reverse("book_tour"), {
+            "g_recaptcha_response": "fail-token", "guest_id": self.guest.guest_id,
+            "sched_id": self.schedule.sched_id, "total_guests": 1,
+        })
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("invalid-input-response", response.json()["error"])
+        self.assertFalse(Pending.objects.exists())
+
+
+class RecaptchaClientTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        recaptcha.reset()
+        self.addCleanup(recaptcha.reset)
+        self.session = Mock()
+        self.session.post.return_value.json.return_value = {"success": True}
+        patcher = patch("guest_app.recaptcha.get_session", return_value=self.session)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @override_settings(RECAPTCHA_CONNECT_TIMEOUT=1.5, RECAPTCHA_READ_TIMEOUT=3)
+    def test_retried_token_is_verified_once_with_timeouts(self):
+        self.assertTrue(recaptcha.verify("token", remote_ip="10.0.0.1")["success"])
+        self.assertTrue(recaptcha.verify("token")["success"])
+
+        self.session.post.assert_called_once()
+        kwargs = self.session.post.call_args.kwargs
+        self.assertEqual(kwargs["timeout"], (1.5, 3.0))
+        self.assertEqual(kwargs["data"]["remoteip"], "10.0.0.1")
+        stats = recaptcha.stats()
+        self.assertEqual((stats["calls"], stats["cache_hits"]), (2, 1))
+        self.assertEqual(stats["latency_ms"]["count"], 1)
+
+    def test_timeouts_fail_closed_and_are_not_cached(self):
+        self.session.post.side_effect = requests.Timeout("read timed out")
+
+        with self.assertLogs("guest_app.recaptcha", level="WARNING"):
+            self.assertEqual(recaptcha.verify("token")["error-codes"], [recaptcha.UNAVAILABLE])
+        self.session.post.side_effect = None
+        self.assertTrue(recaptcha.verify("token")["success"])
+        self.assertEqual(self.session.post.call_count, 2)
+        self.assertEqual(recaptcha.stats()["errors"], 1)
+
+    @override_settings(RECAPTCHA_STATS_LOG_SECONDS=60)
+    def test_stats_are_logged_periodically(self):
+        recaptcha.verify("token")
+        later = recaptcha.time.monotonic() + 61
+        with patch("guest_app.recaptcha.time.monotonic", return_value=later), \
+                self.assertLogs("guest_app.recaptcha", level="INFO") as logs:
+            recaptcha.verify("other-token")
+        self.assertIn("calls 2", logs.output[0])
+
+    def test_rejected_tokens_are_not_cached(self):
+        self.session.post.return_value.json.return_value = {"success": False, "error-codes": ["timeout-or-duplicate"]}
+
+        recaptcha.verify("token")
+        recaptcha.verify("token")
+        self.assertEqual(self.session.post.call_count, 2)
+        self.assertEqual(recaptcha.stats()["failures"], 2)
+
+
+class RoomInventoryTests(TestCase):
+    def setUp(self):
+        self.guest = Guest.objects.create(
+            username="sleeper", email="sleeper@example.com", first_name="Sly", last_name="Eeper",
+            country_of_origin="PH", phone_number="09170000006", sex="M",
+        )
+        hotel = Accomodation.objects.create(
+            company_name="Bay Inn", email_address="inn@example.com", location="Bayawan City",
+            company_type="Inn", password="secret", phone_number="09170000007",
+        )
+        self.room = Room.objects.create(accommodation=hotel, room_name="Twin", person_limit=2,
+                                        price_per_night=Decimal("900.00"))
+        self.other_room = Room.objects.create(accommodation=hotel, room_name="Suite", person_limit=4,
+                                              price_per_night=Decimal("2000.00"))
+        self.client.force_login(self.guest)
+
+    def _book(self, check_in, check_out, room=None):
+        return self.client.post(reverse("accommodation_book"), {
+            "room_id": (room or self.room).room_id, "check_in": check_in, "check_out": check_out, "num_guests": 2,
+        })
+
+    def test_booking_holds_each_night_and_rejects_overlaps(self):
+        self.assertEqual(self._book("2026-12-24", "2026-12-27").status_code, 200)
+        self.assertEqual(RoomNight.objects.filter(room=self.room).count(), 3)
+
+        response = self._book("2026-12-26", "2026-12-29")
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(AccommodationBooking.objects.count(), 1)
+
+        # Checking in on another guest's check-out day is fine
+        self.assertEqual(self._book("2026-12-27", "2026-12-29").status_code, 200)
+        self.assertEqual(self._book("2026-12-24", "2026-12-27", room=self.other_room).status_code, 200)
+
+    def test_availability_for_every_room_is_one_query(self):
+        self._book("2026-12-24", "2026-12-27")
+
+        with self.assertNumQueries(1):
+            booked = inventory.booked_room_ids(date(2026, 12, 20), date(2026, 12, 25))
+        self.assertEqual(booked, {self.room.room_id})
+        self.assertEqual(inventory.booked_room_ids(date(2026, 12, 27), date(2026, 12, 30)), set())
+        self.assertTrue(inventory.is_available(self.room.room_id, date(2026, 12, 20), date(2026, 12, 24)))
+
+    def test_cancelled_bookings_release_their_nights(self):
+        self._book("2026-12-24", "2026-12-27")
+        booking = AccommodationBooking.objects.get()
+
+        booking.status = "cancelled"
+        self.assertTrue(inventory.sync_nights(booking))
+        self.assertFalse(RoomNight.objects.exists())
+        self.assertEqual(self._book("2026-12-25", "2026-12-26").status_code, 200)
+
+        # The original stay can no longer be reinstated over the new one
+        booking.status = "confirmed"
+        self.assertFalse(inventory.sync_nights(booking))
+        self.assertEqual(RoomNight.objects.count(), 1)
+
+    def test_recommendations_skip_rooms_booked_for_the_stay(self):
+        self._book("2026-12-24", "2026-12-27")
+
+        def recommended(check_in, check_out):
+            response = self.client.post(reverse("accommodation_recommend"), {
+                "guests": 2, "check_in": check_in, "check_out": check_out,
+            }, content_type="application/json")
+            self.assertEqual(response.status_code, 200)
+            return {item["meta"]["room_id"] for item in response.json()["results"]}
+
+        self.assertEqual(recommended("2026-12-26", "2026-12-28"), {self.other_room.room_id})
+        self.assertEqual(recommended("2026-12-27", "2026-12-28"), {self.room.room_id, self.other_room.room_id})
+
+
+class CountingEmailBackend(LocmemEmailBackend):
+    """locmem backend that counts connections and rejects one address."""
+    opened = 0
+
+    def open(self):
+        CountingEmailBackend.opened += 1
+        return super().open()
+
+    def send_messages(self, messages):
+        if any("bounce@" in address for message in messages for address in message.to):
+            raise ConnectionError("mailbox unavailable")
+        return super().send_messages(messages)
+
+
+@override_settings(
+    EMAIL_BACKEND="guest_app.tests.CountingEmailBackend",
+    EMAIL_OUTBOX_BATCH_SIZE=2,
+    EMAIL_OUTBOX_MAX_ATTEMPTS=2,
+    EMAIL_OUTBOX_RETRY_BASE_SECONDS=60,
+)
+class EmailOutboxTests(TestCase):
+    def setUp(self):
+        CountingEmailBackend.opened = 0
+
+    def test_drains_batches_over_one_connection(self):
+        outbox.queue_emails([(f"Hello {n}", "Body", f"guest{n}@example.com", "<p>Body</p>") for n in range(5)])
+
+        self.assertEqual(outbox.work(once=True), {"sent": 5, "retry": 0, "failed": 0})
+        self.assertEqual(CountingEmailBackend.opened, 1)
+        self.assertEqual([message.to for message in mail.outbox], [[f"guest{n}@example.com"] for n in range(5)])
+        self.assertEqual(mail.outbox[0].alternatives[0][1], "text/html")
+        self.assertFalse(OutboxEmail.objects.exclude(status="sent").exists())
+        # Nothing left to send
+        self.assertEqual(outbox.drain(), {"sent": 0, "retry": 0, "failed": 0})
+
+    def test_attachments_survive_the_queue(self):
+        outbox.queue_email("QR", "See attached", "guest@example.com", attachments=[("qr.png", b"\x89PNG", "image/png")])
+        outbox.drain()
+
+        self.assertEqual(mail.outbox[0].attachments[0][:2], ("qr.png", b"\x89PNG"))
+
+    def test_failures_back_off_then_give_up(self):
+        outbox.queue_email("Hi", "Body", "bounce@example.com")
+        outbox.queue_email("Hi", "Body", "fine@example.com")
+
+        self.assertEqual(outbox.drain(), {"sent": 1, "retry": 1, "failed": 0})
+        bounced = OutboxEmail.objects.get(to=["bounce@example.com"])
+        self.assertEqual(bounced.status, "pending")
+        self.assertIn("mailbox unavailable", bounced.last_error)
+        self.assertGreater(bounced.next_attempt_at, timezone.now() + timedelta(seconds=50))
+        self.assertEqual(outbox.drain(), {"sent": 0, "retry": 0, "failed": 0})
+
+        OutboxEmail.objects.filter(pk=bounced.pk).update(next_attempt_at=timezone.now())
+        self.assertEqual(outbox.drain(), {"sent": 0, "retry": 0, "failed": 1})
+
+    @override_settings(EMAIL_BACKEND="django.core.mail.backends.filebased.EmailBackend")
+    def test_file_backend_writes_queued_mail(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(EMAIL_FILE_PATH=directory):
+            outbox.queue_email("Receipt", "Thanks", "guest@example.com")
+            outbox.drain()
+
+            (written,) = os.listdir(directory)
+            with open(os.path.join(directory, written)) as message:
+                self.assertIn("Subject: Receipt", message.read())
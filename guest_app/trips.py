@@ -0,0 +1,143 @@
+"""
+Per-guest trip listings split into upcoming, current and past buckets.
+
+Both ``TourBooking`` and ``Pending`` rows count as trips. Each bucket is a
+pair of SQL-filtered querysets that are merged on
+``(start_time, kind, id)`` and paged with an opaque keyset cursor, so a page
+costs the same no matter how many trips a guest has accumulated.
+"""
+from __future__ import annotations
+
+import base64
+import json
+from datetime import datetime
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Pending, TourBooking
+
+BUCKETS = ('upcoming', 'current', 'past')
+DEFAULT_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 50
+
+# Ties on start_time are broken by kind, then id; bookings sort before
+# pending requests.
+KIND_RANK = {'booking': 0, 'pending': 1}
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(start_time, kind, pk):
+    raw = json.dumps([start_time.isoformat(), KIND_RANK[kind], pk])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    try:
+        start_time, rank, pk = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return datetime.fromisoformat(start_time), int(rank), int(pk)
+    except (TypeError, ValueError, UnicodeError):
+        raise InvalidCursor('Invalid cursor.')
+
+
+def _bucket_filter(bucket, start, end, now):
+    """Time split in SQL; cancelled trips always land in ``past``."""
+    cancelled = Q(status__iexact='cancelled')
+    if bucket == 'upcoming':
+        return Q(**{f'{start}__gt': now}) & ~cancelled
+    if bucket == 'current':
+        return Q(**{f'{start}__lte': now, f'{end}__gte': now}) & ~cancelled
+    return Q(**{f'{end}__lt': now}) | cancelled
+
+
+def _after_cursor(start, rank, cursor, descending):
+    """Rows strictly after ``cursor`` in ``(start_time, kind, id)`` order."""
+    start_time, cursor_rank, pk = cursor
+    later = 'lt' if descending else 'gt'
+    if rank == cursor_rank:
+        same_start = Q(**{f'pk__{later}': pk})
+    elif (rank > cursor_rank) != descending:
+        same_start = Q()
+    else:
+        return Q(**{f'{start}__{later}': start_time})
+    return Q(**{f'{start}__{later}': start_time}) | (Q(**{start: start_time}) & same_start)
+
+
+def _sources(user):
+    return (
+        (
+            'booking',
+            TourBooking.objects.filter(guest=user).select_related('tour', 'schedule'),
+            'schedule__start_time', 'schedule__end_time',
+        ),
+        (
+            'pending',
+            Pending.objects.filter(guest_id=user).select_related('tour_id', 'sched_id'),
+            'sched_id__start_time', 'sched_id__end_time',
+        ),
+    )
+
+
+def _serialize(kind, trip):
+    if kind == 'booking':
+        tour, schedule = trip.tour, trip.schedule
+        status_display = trip.get_status_display()
+    else:
+        tour, schedule = trip.tour_id, trip.sched_id
+        status_display = trip.status
+    guests = trip.num_adults + trip.num_children if trip.num_adults else trip.total_guests
+    return {
+        'kind': kind,
+        'id': trip.pk,
+        'tour_name': tour.tour_name,
+        'start_time': schedule.start_time.isoformat(),
+        'end_time': schedule.end_time.isoformat(),
+        'num_adults': trip.num_adults,
+        'num_children': trip.num_children,
+        'total_guests': trip.total_guests,
+        'guests': guests,
+        'price': str(schedule.price),
+        'total_price': str(schedule.price * guests),
+        'status': trip.status,
+        'status_display': status_display,
+        'cancellation_reason': trip.cancellation_reason,
+    }
+
+
+def trips_page(user, bucket, cursor=None, page_size=DEFAULT_PAGE_SIZE, now=None):
+    """
+    One page of ``user``'s trips in ``bucket``.
+
+    Upcoming and current trips are ordered soonest first, past trips most
+    recent first. Returns ``{'results': [...], 'next_cursor': str | None}``.
+    """
+    if bucket not in BUCKETS:
+        raise ValueError(f'Unknown bucket: {bucket}')
+    now = now or timezone.now()
+    descending = bucket == 'past'
+    after = decode_cursor(cursor) if cursor else None
+    sign = '-' if descending else ''
+
+    rows = []
+    for kind, queryset, start, end in _sources(user):
+        rank = KIND_RANK[kind]
+        queryset = queryset.filter(_bucket_filter(bucket, start, end, now))
+        if after:
+            queryset = queryset.filter(_after_cursor(start, rank, after, descending))
+        for trip in queryset.order_by(f'{sign}{start}', f'{sign}pk')[:page_size + 1]:
+            start_time = trip.schedule.start_time if kind == 'booking' else trip.sched_id.start_time
+            rows.append(((start_time, rank, trip.pk), kind, trip))
+
+    rows.sort(key=lambda row: row[0], reverse=descending)
+    page = rows[:page_size]
+    next_cursor = None
+    if len(rows) > page_size:
+        (start_time, _rank, pk), kind, _trip = page[-1]
+        next_cursor = encode_cursor(start_time, kind, pk)
+    return {
+        'results': [_serialize(kind, trip) for _key, kind, trip in page],
+        'next_cursor': next_cursor,
+    }
@@ -0,0 +1,62 @@
+"""
+Streaming multipart uploads for bookmark images.
+
+``bookmark_add_image`` used to take a base64 data URI inside a JSON body,
+which holds the photo in memory about three times (raw body, decoded string,
+decoded bytes). Multipart uploads instead go through Django's upload
+handlers: small files stay in memory, larger ones are written chunk by chunk
+to a temporary file and then moved into storage. ``MaxSizeUploadHandler``
+sits in front of them and stops the upload once a file passes
+``BOOKMARK_IMAGE_MAX_UPLOAD_SIZE`` bytes.
+"""
+import os
+import uuid
+
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp')
+
+
+def max_upload_size():
+    return getattr(settings, 'BOOKMARK_IMAGE_MAX_UPLOAD_SIZE', 20 * 1024 * 1024)
+
+
+class MaxSizeUploadHandler(FileUploadHandler):
+    """
+    Passes chunks through to the next handler until a file grows past
+    ``max_size``; then sets ``exceeded`` and stops the upload. The rest of
+    the body is drained so the client still gets the error response.
+    """
+
+    def __init__(self, request=None, max_size=None):
+        super().__init__(request)
+        self.max_size = max_size if max_size is not None else max_upload_size()
+        self.exceeded = False
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > self.max_size:
+            self.exceeded = True
+            raise StopUpload(connection_reset=False)
+        return raw_data
+
+    def file_complete(self, file_size):
+        return None
+
+
+def install_size_limit(request, max_size=None):
+    """
+    Put a ``MaxSizeUploadHandler`` in front of ``request``'s upload handlers.
+    Must run before ``request.POST`` or ``request.FILES`` is touched.
+    """
+    handler = MaxSizeUploadHandler(request, max_size)
+    request.upload_handlers.insert(0, handler)
+    return handler
+
+
+def bookmark_image_name(bookmark_id, original_name=''):
+    """Unique storage name that keeps the uploaded file's image extension."""
+    extension = os.path.splitext(original_name or '')[1].lower()
+    if extension not in IMAGE_EXTENSIONS:
+        extension = '.jpg'
+    return f'bookmark_{bookmark_id}_{uuid.uuid4().hex}{extension}'
@@ -6,6 +6,7 @@ from django.conf import settings
 urlpatterns = [
     path('guest_book/<str:tour_id>/', views.guest_book, name='guest_book'),
     path('main-page/', views.main_page, name='main-page'),
+    path('api/trips/<str:bucket>/', views.trips_api, name='trips_api'),
     path('register/', views.register, name='register'),
     path('login/', views.login_view, name='login'),
     path('logout/', views.logout_view, name='logout'),
@@ -30,6 +31,7 @@ urlpatterns = [
     # Language settings endpoint
     path('set-language/<str:lang_code>/', views.set_language_view, name='set-language'),
     path('get-translations/<str:lang_code>/', views.get_translations_view, name='get-translations'),
+    path('translations/<str:lang_code>.<str:version>.json', views.translation_bundle, name='translation-bundle'),
     
     # Profile update endpoints
     path('profile/data/', views.get_profile_data, name='get_profile_data'),
@@ -40,6 +42,7 @@ urlpatterns = [
     
     # Map bookmark API endpoints
     path('api/bookmarks/', views.bookmark_list, name='bookmark_list'),
+    path('api/bookmarks/viewport/', views.bookmark_viewport, name='bookmark_viewport'),
     path('api/bookmarks/create/', views.bookmark_create, name='bookmark_create'),
     path('api/bookmarks/<int:bookmark_id>/update/', views.bookmark_update, name='bookmark_update'),
     path('api/bookmarks/<int:bookmark_id>/delete/', views.bookmark_delete, name='bookmark_delete'),
@@ -1,10 +1,15 @@
 import calendar  # For getting the number of days in a month
 from django.utils.translation import gettext as _
 from django.utils import translation
+import hashlib
 import json
 import os
-from django.db import models
-from .models import Guest, FriendGroup, CompanionRequest, Friendship
+from django.urls import reverse
+from django.db import models, transaction
+from django.db.models import Q
+from django.utils import timezone
+from tour_app.models import Tour_Schedule
+from .models import Guest, FriendGroup, CompanionRequest, Friendship, Pending, TourBooking
 
 # Dictionary to store all translations
 TRANSLATIONS = {
@@ -517,6 +522,9 @@ for key, translations in SYSTEM_TRANSLATIONS.items():
     for lang, text in translations.items():
         TRANSLATIONS[lang][key] = text
 
+# Precompiled JSON bundles per language, built once below
+TRANSLATION_BUNDLES = {}
+
 def translate(key, lang='en'):
     """
     Translate a key to the specified language
@@ -533,20 +541,68 @@ def translate(key, lang='en'):
     
     return TRANSLATIONS[lang].get(key, key)
 
-def get_translations_json(lang='en'):
+def compile_translation_bundles():
     """
-    Get all translations for a language as JSON for use in JavaScript
+    Serialize every language's translations once into a JSON bundle keyed
+    by a hash of its content. Pages reference the bundle by a URL that
+    contains the hash, so browsers can cache it for good.
+    
+    Returns:
+        dict: {lang: {'json': str, 'content': bytes, 'version': str}}
+    """
+    for lang, strings in TRANSLATIONS.items():
+        bundle_json = json.dumps(strings, sort_keys=True)
+        content = bundle_json.encode('utf-8')
+        TRANSLATION_BUNDLES[lang] = {
+            'json': bundle_json,
+            'content': content,
+            'version': hashlib.sha256(content).hexdigest()[:16],
+        }
+    return TRANSLATION_BUNDLES
+
+def get_translation_bundle(lang='en'):
+    """
+    Get the precompiled translation bundle for a language
     
     Args:
         lang (str): Language code
         
     Returns:
-        str: JSON string with all translations
+        dict: Bundle with 'json', 'content' and 'version' keys
     """
     if lang not in TRANSLATIONS:
         lang = 'en'
+    
+    return TRANSLATION_BUNDLES[lang]
+
+def get_translations_url(lang='en'):
+    """
+    Get the versioned URL of a language's translation bundle
+    
+    Args:
+        lang (str): Language code
         
-    return json.dumps(TRANSLATIONS[lang])
+    Returns:
+        str: URL whose path changes whenever the translations change
+    """
+    if lang not in TRANSLATIONS:
+        lang = 'en'
+    
+    return reverse('translation-bundle', args=[lang, get_translation_bundle(lang)['version']])
+
+def get_translations_json(lang='en'):
+    """
+    Get all translations for a language as JSON for use in JavaScript
+    
+    Args:
+        lang (str): Language code
+        
+    Returns:
+        str: JSON string with all translations
+    """
+    return get_translation_bundle(lang)['json']
+
+compile_translation_bundles()
 
 # Define our own language session key constant
 LANGUAGE_SESSION_KEY = 'django_language'
@@ -600,7 +656,9 @@ def get_current_language(request):
 # Function to translate a database object's fields
 def translate_object(obj, fields, lang='en'):
     """
-    Translate specified fields of a database object
+    Translate specified fields of a database object. For whole querysets
+    use ``.translated(lang)`` on the manager instead, which resolves every
+    row in the same query.
     
     Args:
         obj: Database object to translate
@@ -612,6 +670,11 @@ def translate_object(obj, fields, lang='en'):
     """
     result = {}
     for field in fields:
+        # Objects from a .translated(lang) queryset already carry the value
+        if hasattr(obj, f'translated_{field}'):
+            result[field] = getattr(obj, f'translated_{field}')
+            continue
+        
         # Get original value
         value = getattr(obj, field, '')
         
@@ -718,4 +781,43 @@ def populate_friendships():
         print(f"Error processing companion requests: {e}")
     
     print(f"Created {count} friendship relationships.")
-    return count
\ No newline at end of file
+    return count
+
+
+def sweep_booking_statuses(now=None):
+    """
+    Move schedules and bookings to their time-based status with one bulk
+    UPDATE per transition, for every guest at once.
+
+    Run periodically (``manage.py sweep_booking_statuses`` from cron) so the
+    pages only read the stored status. Cancelled rows are never touched, and
+    ``Pending`` rows only move while they are still waiting for a decision.
+
+    Returns a dict with the number of rows moved per transition.
+    """
+    now = now or timezone.now()
+    running = Q(start_time__lte=now, end_time__gte=now)
+    finished = Q(end_time__lt=now)
+
+    with transaction.atomic():
+        counts = {
+            'schedules_active': Tour_Schedule.objects.filter(running)
+                .exclude(status__in=['active', 'cancelled']).update(status='active'),
+            'schedules_completed': Tour_Schedule.objects.filter(finished)
+                .exclude(status__in=['completed', 'cancelled']).update(status='completed'),
+            'bookings_pending': TourBooking.objects.filter(schedule__start_time__gt=now)
+                .exclude(status__in=['pending', 'active', 'completed', 'cancelled']).update(status='pending'),
+            'bookings_active': TourBooking.objects
+                .filter(schedule__start_time__lte=now, schedule__end_time__gte=now)
+                .exclude(status__in=['active', 'completed', 'cancelled']).update(status='active'),
+            'bookings_completed': TourBooking.objects.filter(schedule__end_time__lt=now)
+                .exclude(status__in=['completed', 'cancelled']).update(status='completed'),
+            'pending_active': Pending.objects
+                .filter(status__iexact='pending', sched_id__start_time__lte=now, sched_id__end_time__gte=now)
+                .update(status='Active'),
+            'pending_completed': Pending.objects
+                .filter(status__iexact='pending', sched_id__end_time__lt=now)
+                .update(status='Completed'),
+        }
+
+    return counts
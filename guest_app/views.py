@@ -1,11 +1,13 @@
 from django.contrib.auth import logout, authenticate, login as auth_login
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
 from tour_app.models import Tour_Event
 from .forms import GuestRegistrationForm
 import calendar
+import math
 from datetime import datetime, timedelta
 from django.contrib import messages
 from tour_app.models import Tour_Schedule, Tour_Add, Tour_Admission, Admission_Rates, Tour_Event
+from tour_app.reservations import reserve_slots
 from django.http import JsonResponse
 from django.contrib.auth.decorators import login_required
 from .models import Pending, Guest, GuestCredential, DisabilityDocument, BookingCompanion  # Add BookingCompanion here
@@ -21,17 +23,16 @@ from django.views.decorators.csrf import csrf_exempt, ensure_csrf_cookie
 from django.utils.decorators import method_decorator
 import base64
 from django.core.files.base import ContentFile
-from django.core.mail import send_mail, EmailMultiAlternatives
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 from django.conf import settings
-from django.views.decorators.http import require_http_methods
+from django.views.decorators.http import etag, require_http_methods
 from .utils import translate, get_translations_json, set_language, get_current_language, LANGUAGE_SESSION_KEY
+from .utils import get_translation_bundle, get_translations_url
 from django.shortcuts import render, get_object_or_404, redirect
 from .models import TourBooking
 from .forms import ProfileUpdateForm
 from django.utils import timezone
-import requests  # Add this import
 from django.db import models
 from .models import FriendGroup, Friendship
 import pytz  # Add this import
@@ -42,205 +43,98 @@ from PIL import Image
 from admin_app.models import Accomodation, Room as AdminRoom
 from .models import AccommodationBooking
 from ai_chatbot.recommenders import recommend_accommodations, calculate_accommodation_billing
+from django.db.models import Count, Max, Min, Q
+from .bookmarks import absolute_sources, bookmark_payload, invalidate_bookmarks, viewport_payload
+from . import inventory, recaptcha, trips
+from .uploads import bookmark_image_name, install_size_limit
+from .outbox import queue_email
+from .derivatives import srcset as image_srcset
+
+def annotated_tour_listing(language):
+    """
+    Tours for the landing page, annotated in a single query with their
+    schedule count, price and duration ranges, schedule start/end span, and
+    the name/description in ``language`` (falling back to the base text when
+    no translation exists).
+    """
+    return (
+        Tour_Add.objects
+        .translated(language)
+        .annotate(
+            schedule_count=Count('schedules'),
+            min_price=Min('schedules__price'),
+            max_price=Max('schedules__price'),
+            min_duration=Min('schedules__duration_days', filter=Q(schedules__duration_days__gt=0)),
+            max_duration=Max('schedules__duration_days', filter=Q(schedules__duration_days__gt=0)),
+            first_start=Min('schedules__start_time'),
+            last_end=Max('schedules__end_time'),
+        )
+        .order_by('tour_id')
+    )
+
 
 @ensure_csrf_cookie
 def main_page(request):
     """Main page view with language support"""
-    # Helper function to ensure datetime objects are properly converted
-    def ensure_timezone_aware(dt):
-        if dt is None:
-            return None
-        if isinstance(dt, str):
-            try:
-                dt = datetime.fromisoformat(dt.replace('Z', '+00:00'))
-            except ValueError:
-                try:
-                    dt = datetime.strptime(dt, "%Y-%m-%d %H:%M:%S")
-                except ValueError:
-                    return None
-        if not timezone.is_aware(dt):
-            dt = timezone.make_aware(dt)
-        return dt
-    
     # Get the current language preference
     current_language = get_current_language(request)
     
-    # Get all tours
-    tours = Tour_Add.objects.all()
+    # Get all tours with their schedule aggregates and translated text in one query
+    tours = annotated_tour_listing(current_language)
     
-    # For each tour, translate translatable fields and calculate min/max duration
     translated_tours = []
     for tour in tours:
-        # Calculate min and max duration days for each tour's schedules
-        schedules = Tour_Schedule.objects.filter(tour_id=tour.tour_id)
-        min_duration = None
-        max_duration = None
-        
-        if schedules.exists():
-            durations = [s.duration_days for s in schedules if s.duration_days]
-            if durations:
-                min_duration = min(durations)
-                max_duration = max(durations)
-        
-        # Attach duration info to the tour object for easy access in template
-        tour.min_duration = min_duration
-        tour.max_duration = max_duration
-        tour.has_duration_range = schedules.count() > 1 and min_duration != max_duration
-        
-        # Append tour and its translatable fields as context 
-        # (assuming Tour_Add has translatable fields like name_tl, description_tl, etc.)
+        if not tour.min_duration and tour.schedule_count == 1:
+            # A lone schedule without duration_days: count the calendar days it spans
+            span = timezone.localtime(tour.last_end).date() - timezone.localtime(tour.first_start).date()
+            tour.min_duration = tour.max_duration = span.days + 1
+        tour.has_duration_range = tour.schedule_count > 1 and tour.min_duration != tour.max_duration
+        
         tour_data = {
             'tour': tour,
             'translatable': {
-                'tour_name': getattr(tour, f'tour_name_{current_language}', tour.tour_name),
-                'description': getattr(tour, f'description_{current_language}', tour.description),
-                # Add other translatable fields as needed
+                'tour_name': tour.translated_tour_name,
+                'description': tour.translated_description,
             }
         }
         translated_tours.append(tour_data)
     
-    # Get user bookings if authenticated
-    upcoming_tours = []
-    current_tours = []
-    past_tours = []
-    
-    if request.user.is_authenticated:
-        # Get current time for comparison - remove any time zone issues by using UTC
-        now = timezone.now()
-        print(f"Current server time (UTC): {now}")
-        
-        # Reset the lists to ensure they're empty
-        upcoming_tours = []
-        current_tours = []
-        past_tours = []
-        
-        # First, try to get TourBooking records
-        tour_bookings = TourBooking.objects.filter(
-            guest=request.user
-        ).select_related('tour', 'schedule').order_by('schedule__start_time')
-        
-        print(f"Found {len(tour_bookings)} TourBooking records")
-        
-        # Also check for Pending bookings
-        pending_bookings = Pending.objects.filter(
-            guest_id=request.user
-        ).select_related('tour_id', 'sched_id').order_by('sched_id__start_time')
-        
-        print(f"Found {len(pending_bookings)} Pending records")
-        
-        print(f"Total bookings to process: {len(tour_bookings) + len(pending_bookings)}")
-        
-        # Process all bookings and categorize them based ONLY on time, not status
-        
-        # Process TourBooking records first
-        for booking in tour_bookings:
-            try:
-                # Only skip if explicitly cancelled
-                if booking.status == 'cancelled':
-                    print(f"TourBooking {booking.booking_id} is cancelled, adding to past_tours")
-                    past_tours.append(booking)
-                    continue
-                
-                # Get schedule times directly
-                start_time = booking.schedule.start_time
-                end_time = booking.schedule.end_time
-                
-                # Ensure timezone awareness for proper comparison
-                if not timezone.is_aware(start_time):
-                    start_time = timezone.make_aware(start_time)
-                if not timezone.is_aware(end_time):
-                    end_time = timezone.make_aware(end_time)
-                
-                # Debug output
-                print(f"TourBooking {booking.booking_id}: {start_time} to {end_time}, now is {now}")
-                
-                # Simple date comparison
-                if start_time > now:
-                    print(f"TourBooking {booking.booking_id} is UPCOMING")
-                    # Update status to 'pending' if it's not already set
-                    if booking.status not in ['pending', 'cancelled', 'active', 'completed']:
-                        booking.status = 'pending'
-                        booking.save()
-                    upcoming_tours.append(booking)
-                elif start_time <= now and end_time >= now:
-                    print(f"TourBooking {booking.booking_id} is CURRENT")
-                    # Update status to 'active' if it's not already set
-                    if booking.status not in ['active', 'cancelled', 'completed']:
-                        booking.status = 'active'
-                        booking.save()
-                    current_tours.append(booking)
-                else:
-                    print(f"TourBooking {booking.booking_id} is PAST")
-                    # Update status to 'completed' if it's not already set
-                    if booking.status not in ['completed', 'cancelled']:
-                        booking.status = 'completed'
-                        booking.save()
-                    past_tours.append(booking)
-            except Exception as e:
-                print(f"Error categorizing TourBooking {booking.booking_id}: {str(e)}")
-                past_tours.append(booking)  # Default to past if error occurs
-        
-        # Now process Pending bookings
-        for booking in pending_bookings:
-            try:
-                # Only skip if explicitly cancelled
-                if booking.status.lower() == 'cancelled':
-                    print(f"Pending {booking.id} has status Cancelled, adding to past_tours")
-                    past_tours.append(booking)
-                    continue
-                
-                # Get schedule times directly
-                start_time = booking.sched_id.start_time
-                end_time = booking.sched_id.end_time
-                
-                # Ensure timezone awareness for proper comparison
-                if not timezone.is_aware(start_time):
-                    start_time = timezone.make_aware(start_time)
-                if not timezone.is_aware(end_time):
-                    end_time = timezone.make_aware(end_time)
-                
-                # Debug output
-                print(f"Pending {booking.id}: {start_time} to {end_time}, now is {now}")
-                
-                # Simple date comparison - ignore the 'Pending' status and use only timing
-                if start_time > now:
-                    print(f"Pending {booking.id} is UPCOMING")
-                    # Keep as Pending (no status change needed)
-                    upcoming_tours.append(booking)
-                elif start_time <= now and end_time >= now:
-                    print(f"Pending {booking.id} is CURRENT")
-                    # Update to Active if it's not already
-                    if booking.status.lower() == 'pending':
-                        booking.status = 'Active'
-                        booking.save()
-                    current_tours.append(booking)
-                else:
-                    print(f"Pending {booking.id} is PAST")
-                    # Update to Completed if not cancelled
-                    if booking.status.lower() == 'pending':
-                        booking.status = 'Completed'
-                        booking.save()
-                    past_tours.append(booking)
-            except Exception as e:
-                print(f"Error categorizing Pending {booking.id}: {str(e)}")
-                past_tours.append(booking)  # Default to past if error occurs
-        
-        print(f"Final categorization: {len(upcoming_tours)} upcoming, {len(current_tours)} current, {len(past_tours)} past")
-    
     context = {
         'tours': tours,  # Keep the original queryset for Django template usage
         'translated_tours': translated_tours,  # Add translated data
         'user': request.user,
-        'upcoming_tours': upcoming_tours,
-        'current_tours': current_tours,
-        'past_tours': past_tours,
         'current_language': current_language,
-        'translations_json': get_translations_json(current_language)  # Add translations for JavaScript
+        'translations_url': get_translations_url(current_language)  # Cached translation bundle for JavaScript
     }
     
     return render(request, 'mainpage.html', context)
 
 
+@require_http_methods(["GET"])
+def trips_api(request, bucket):
+    """
+    One keyset-paginated page of the user's upcoming, current or past trips.
+    Pass the returned ``next_cursor`` as ``?cursor=`` to get the next page.
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({'success': False, 'message': 'User not authenticated'}, status=401)
+    if bucket not in trips.BUCKETS:
+        return JsonResponse({'success': False, 'message': 'Unknown trip bucket'}, status=404)
+
+    try:
+        page_size = int(request.GET.get('page_size', trips.DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'page_size must be an integer'}, status=400)
+    page_size = max(1, min(page_size, trips.MAX_PAGE_SIZE))
+
+    try:
+        page = trips.trips_page(request.user, bucket, cursor=request.GET.get('cursor'), page_size=page_size)
+    except trips.InvalidCursor as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+
+    return JsonResponse({'success': True, 'bucket': bucket, **page})
+
+
 def user_is_allowed(user):
     # Implement your custom logic to check if the user is allowed
     # Example: Check if the user is authenticated or has specific permissions
@@ -388,6 +282,57 @@ def get_tour_schedules(request, tour_id):
 
 
 
+def _booking_request_email(guest, tour, schedule, total_guests, total_amount, companion_names):
+    """Subject and text of the acknowledgment sent when a guest requests a booking."""
+    subject = f"Booking Request Received for {tour.tour_name}"
+    
+    # Format schedule in user-friendly way
+    start_time = timezone.localtime(schedule.start_time)
+    end_time = timezone.localtime(schedule.end_time)
+    
+    # Format dates in a user-friendly way (e.g., "Monday 12 March 2024 at 8:00 AM")
+    start_formatted = start_time.strftime("%A %d %B %Y at %I:%M %p")
+    end_formatted = end_time.strftime("%A %d %B %Y at %I:%M %p")
+    
+    # Get current time in Philippine timezone (Asia/Manila)
+    # Without pytz, we'll use a simplified approach for Philippines time
+    # Note: this is an approximation, as Manila is UTC+8
+    current_ph_time = timezone.now() + timedelta(hours=8)  # Approximate Manila time
+    ph_time_formatted = current_ph_time.strftime("%A %d %B %Y at %I:%M %p")
+    
+    # For guest's country time, we'll include a note about timezone
+    guest_country_formatted = f"(Please check local time in {guest.country_of_origin})"
+    
+    # Create a formatted message with companion details
+    companions_list = "\n".join([f"- {name}" for name in companion_names])
+    if not companions_list:
+        companions_list = "None"
+        
+    message = f"""Dear {guest.first_name},
+
+Your booking request for {tour.tour_name} has been received and is pending approval.
+
+Booking Details:
+- Tour: {tour.tour_name}
+- Schedule: {start_formatted} to {end_formatted}
+- Total Guests: {total_guests}
+- Total Amount: ₱{total_amount:.2f}
+
+Companions included:
+{companions_list}
+
+Time Information:
+- Current Philippine Time: {ph_time_formatted}
+- Your Country ({guest.country_of_origin}): {guest_country_formatted}
+
+We will notify you once your booking is confirmed or if we need additional information.
+
+Thank you for choosing our tours!
+
+Best regards,
+The Tour Team"""
+    return subject, message
+
 
 def book_tour(request):
     if request.method == "POST":
@@ -397,16 +342,15 @@ def book_tour(request):
             if not recaptcha_response:
                 return JsonResponse({'error': 'Please complete the reCAPTCHA verification.'}, status=400)
                 
-            url = 'https://www.google.com/recaptcha/api/siteverify'
-            data = {
-                'secret': '6LeyhAYrAAAAAJdVcBnugINI6kChp_pbtBNIqkyk',
-                'response': recaptcha_response
-            }
-            recaptcha_result = requests.post(url, data=data).json()
+            recaptcha_result = recaptcha.verify(recaptcha_response, remote_ip=request.META.get('REMOTE_ADDR'))
             
             # If reCAPTCHA fails
             if not recaptcha_result.get('success', False):
                 error_message = recaptcha_result.get('error-codes', ['Unknown error'])[0]
+                if error_message == recaptcha.UNAVAILABLE:
+                    return JsonResponse({
+                        'error': 'reCAPTCHA verification is temporarily unavailable. Please try again.'
+                    }, status=503)
                 return JsonResponse({
                     'error': f'reCAPTCHA verification failed: {error_message}. Please try again.'
                 }, status=400)
@@ -425,112 +369,43 @@ def book_tour(request):
             guest = get_object_or_404(Guest, guest_id=guest_id)
             # Get the schedule object from Tour_Schedule
             schedule = get_object_or_404(Tour_Schedule, sched_id=sched_id)
-            # Get the tour from the schedule (assuming FK is set up correctly)
-            tour = schedule.tour_id
-
-            # Create the pending booking record
-            pending_booking = Pending.objects.create(
-                guest_id=guest,
-                sched_id=schedule,
-                tour_id=tour,
-                status="Pending",
-                total_guests=total_guests,
-                your_name=f"{guest.first_name} {guest.last_name}",
-                your_email=guest.email,
-                your_phone=guest.phone_number,
-                num_adults=total_guests,
-                num_children=0
-            )
-            
-            # Fetch companion details for email
-            companion_names = []
-            
-            # Save the selected companions for this booking
-            if selected_companions:
-                # Fetch companion objects
-                companions = Guest.objects.filter(guest_id__in=selected_companions)
-                
-                # Create BookingCompanion records
-                for companion in companions:
-                    BookingCompanion.objects.create(
-                        booking=pending_booking,
-                        companion=companion
-                    )
-                    companion_names.append(f"{companion.first_name} {companion.last_name}")
-
-            # Ensure that there are enough available slots
-            if schedule.slots_available < total_guests:
-                return JsonResponse({'error': 'Not enough available slots.'}, status=400)
-
-            schedule.slots_booked += total_guests
-            schedule.slots_available -= total_guests
-            schedule.save()
+            tour = schedule.tour
 
             # Calculate price information for the response
             total_amount = total_guests * price
 
-            # Send a more detailed booking acknowledgment email
-            try:
-                subject = f"Booking Request Received for {tour.tour_name}"
-                
-                # Format schedule in user-friendly way
-                start_time = timezone.localtime(schedule.start_time)
-                end_time = timezone.localtime(schedule.end_time)
-                
-                # Format dates in a user-friendly way (e.g., "Monday 12 March 2024 at 8:00 AM")
-                start_formatted = start_time.strftime("%A %d %B %Y at %I:%M %p")
-                end_formatted = end_time.strftime("%A %d %B %Y at %I:%M %p")
-                
-                # Get current time in Philippine timezone (Asia/Manila)
-                # Without pytz, we'll use a simplified approach for Philippines time
-                # Note: this is an approximation, as Manila is UTC+8
-                from datetime import timedelta
-                current_ph_time = timezone.now() + timedelta(hours=8)  # Approximate Manila time
-                ph_time_formatted = current_ph_time.strftime("%A %d %B %Y at %I:%M %p")
-                
-                # For guest's country time, we'll include a note about timezone
-                guest_country_formatted = f"(Please check local time in {guest.country_of_origin})"
-                
-                # Create a formatted message with companion details
-                companions_list = "\n".join([f"- {name}" for name in companion_names])
-                if not companions_list:
-                    companions_list = "None"
-                    
-                message = f"""Dear {guest.first_name},
-
-Your booking request for {tour.tour_name} has been received and is pending approval.
-
-Booking Details:
-- Tour: {tour.tour_name}
-- Schedule: {start_formatted} to {end_formatted}
-- Total Guests: {total_guests}
-- Total Amount: ₱{total_amount:.2f}
-
-Companions included:
-{companions_list}
-
-Time Information:
-- Current Philippine Time: {ph_time_formatted}
-- Your Country ({guest.country_of_origin}): {guest_country_formatted}
-
-We will notify you once your booking is confirmed or if we need additional information.
+            # Take the slots first; the booking rows are only written if that
+            # succeeded, and are rolled back together with it on any error
+            companions = list(Guest.objects.filter(guest_id__in=selected_companions)) if selected_companions else []
+            with transaction.atomic():
+                if not reserve_slots(schedule.sched_id, total_guests):
+                    return JsonResponse({'error': 'Not enough available slots.'}, status=400)
+
+                # Create the pending booking record
+                pending_booking = Pending.objects.create(
+                    guest_id=guest,
+                    sched_id=schedule,
+                    tour_id=tour,
+                    status="Pending",
+                    total_guests=total_guests,
+                    your_name=f"{guest.first_name} {guest.last_name}",
+                    your_email=guest.email,
+                    your_phone=guest.phone_number,
+                    num_adults=total_guests,
+                    num_children=0
+                )
 
-Thank you for choosing our tours!
+                # Save the selected companions for this booking
+                BookingCompanion.objects.bulk_create([
+                    BookingCompanion(booking=pending_booking, companion=companion) for companion in companions
+                ])
 
-Best regards,
-The Tour Team"""
-                
-                send_mail(
-                    subject=subject,
-                    message=message,
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    recipient_list=[guest.email],
-                    fail_silently=False,
+                # Acknowledgment email goes out through the outbox once this commits
+                subject, message = _booking_request_email(
+                    guest, tour, schedule, total_guests, total_amount,
+                    [f"{companion.first_name} {companion.last_name}" for companion in companions],
                 )
-                print(f"Booking acknowledgment email sent to {guest.email}")
-            except Exception as email_error:
-                print(f"Email sending failed: {str(email_error)}")
-                # Continue even if email fails
+                queue_email(subject, message, guest.email)
 
             return JsonResponse({
                 'success': 'Booking request submitted! You will receive a confirmation email when your booking is approved.',
@@ -567,30 +442,14 @@ def guest_book(request, tour_id):
         f'tour_{tour.tour_id}_description': tour_data['description'],
     }
     
-    # Get generic translations and add tour-specific ones
-    translations = json.loads(get_translations_json(current_language))
-    translations.update(tour_translations)
-    
-    # Add translations for booking-related terms
-    booking_translations = {
-        'schedule_id': translate('schedule_id', current_language),
-        'start_time': translate('start_time', current_language),
-        'end_time': translate('end_time', current_language),
-        'price': translate('price', current_language),
-        'available_slots': translate('available_slots', current_language),
-        'booked_slots': translate('booked_slots', current_language),
-        'book_this_schedule': translate('book_this_schedule', current_language),
-        'no_more_slots': translate('no_more_slots', current_language),
-        'no_schedules': translate('no_schedules', current_language),
-        'back_to_main': translate('back_to_main', current_language),
-    }
-    translations.update(booking_translations)
-    
+    # Generic and booking-related strings come from the cached language
+    # bundle; only the tour-specific ones are inlined in the page
     context = {
         'tour': tour,
         'schedules': schedules,
         'current_language': current_language,
-        'translations_json': json.dumps(translations),
+        'translations_url': get_translations_url(current_language),
+        'page_translations_json': json.dumps(tour_translations),
         'tour_data': tour_data,
     }
     
@@ -601,42 +460,13 @@ def map_view(request):
     # Get current language
     current_language = get_current_language(request)
     
-    # Get bookmarks for the current user
-    if request.user.is_authenticated:
-        bookmarks = MapBookmark.objects.filter(user=request.user)
-    else:
-        bookmarks = MapBookmark.objects.filter(user=None)
-    
-    # Translate bookmarks
-    translated_bookmarks = []
-    for bookmark in bookmarks:
-        bookmark_data = {
-            'id': bookmark.id,
-            'name': bookmark.get_name(current_language),
-            'category': bookmark.category,
-            'lat': bookmark.latitude,
-            'lng': bookmark.longitude,
-            'details': bookmark.get_details(current_language) or '',
-            'images': []
-        }
-        
-        # Get translated images
-        for image in bookmark.images.all():
-            image_data = {
-                'id': image.id,
-                'title': image.get_title(current_language),
-                'description': image.get_description(current_language),
-                'url': request.build_absolute_uri(image.image.url) if image.image else None,
-            }
-            bookmark_data['images'].append(image_data)
-        
-        translated_bookmarks.append(bookmark_data)
+    # Serialized (and cached) bookmarks for the current user
+    translated_bookmarks = bookmark_payload(request, current_language)
     
     return render(request, 'map.html', {
-        'bookmarks': bookmarks,  # Original queryset for Django templates
         'translated_bookmarks': translated_bookmarks,  # Translated data
         'current_language': current_language,
-        'translations_json': get_translations_json(current_language)
+        'translations_url': get_translations_url(current_language)
     })
 
 # API endpoints for map bookmarks
@@ -647,42 +477,33 @@ def bookmark_list(request):
     # Get current language
     current_language = get_current_language(request)
     
-    if request.user.is_authenticated:
-        bookmarks = MapBookmark.objects.filter(user=request.user)
-    else:
-        # For anonymous users, get bookmarks with no user
-        bookmarks = MapBookmark.objects.filter(user=None)
-    
-    data = []
-    for bookmark in bookmarks:
-        # Get translated name and details
-        name = bookmark.get_name(current_language)
-        details = bookmark.get_details(current_language)
-        
-        # Get images for this bookmark with translations
-        images = []
-        for image in bookmark.images.all():
-            image_data = {
-                'id': image.id,
-                'title': image.get_title(current_language),
-                'description': image.get_description(current_language),
-                'url': request.build_absolute_uri(image.image.url) if image.image else None,
-            }
-            images.append(image_data)
-        
-        # Add bookmark data with images
-        data.append({
-            'id': bookmark.id,
-            'name': name,
-            'category': bookmark.category,
-            'lat': bookmark.latitude,
-            'lng': bookmark.longitude,
-            'details': details or '',
-            'images': images
-        })
+    data = bookmark_payload(request, current_language)
     
     return JsonResponse({'bookmarks': data})
 
+@require_http_methods(["GET"])
+def bookmark_viewport(request):
+    """
+    API endpoint for the bookmarks inside a map bounding box
+    (?south=&west=&north=&east=&zoom=), clustered at low zoom levels
+    """
+    try:
+        south, west, north, east, zoom = (
+            float(request.GET[name]) for name in ('south', 'west', 'north', 'east', 'zoom')
+        )
+    except (KeyError, ValueError):
+        return JsonResponse({
+            'success': False,
+            'message': 'south, west, north, east and zoom are required numbers'
+        }, status=400)
+    if not all(math.isfinite(value) for value in (south, west, north, east, zoom)):
+        return JsonResponse({'success': False, 'message': 'Invalid bounding box'}, status=400)
+    if south > north or west > east:
+        return JsonResponse({'success': False, 'message': 'Invalid bounding box'}, status=400)
+    
+    payload = viewport_payload(request, get_current_language(request), south, west, north, east, zoom)
+    return JsonResponse({'success': True, **payload})
+
 @csrf_exempt
 def bookmark_create(request):
     """API endpoint to create a new bookmark"""
@@ -704,6 +525,7 @@ def bookmark_create(request):
                 bookmark.user = request.user
                 
             bookmark.save()
+            invalidate_bookmarks(bookmark.user_id)
             print("Bookmark created with ID:", bookmark.id)
             
             return JsonResponse({
@@ -748,6 +570,7 @@ def bookmark_update(request, bookmark_id):
                 bookmark.details = data['details']
             
             bookmark.save()
+            invalidate_bookmarks(bookmark.user_id)
             print("Bookmark updated successfully")
             
             return JsonResponse({
@@ -782,6 +605,7 @@ def bookmark_delete(request, bookmark_id):
                 bookmark = MapBookmark.objects.get(id=bookmark_id, user=None)
             
             bookmark.delete()
+            invalidate_bookmarks(bookmark.user_id)
             print("Bookmark deleted successfully")
             
             return JsonResponse({
@@ -836,7 +660,14 @@ def bookmark_debug(request):
 
 @csrf_exempt
 def bookmark_add_image(request, bookmark_id):
-    """API endpoint to add an image to a bookmark"""
+    """
+    API endpoint to add an image to a bookmark.
+
+    Takes a multipart form (``image`` file, optional ``title`` and
+    ``description``) streamed through Django's upload handlers and capped at
+    ``BOOKMARK_IMAGE_MAX_UPLOAD_SIZE``. A JSON body with a base64 ``image``
+    data URI is still accepted for older clients.
+    """
     if request.method == 'POST':
         try:
             # Get the bookmark
@@ -855,26 +686,33 @@ def bookmark_add_image(request, bookmark_id):
                     'message': 'You must be logged in to add images to this bookmark'
                 }, status=401)
             
-            # Process the image data
-            data = json.loads(request.body)
-            image_data = data.get('image')  # Base64 encoded image
-            title = data.get('title', '')
-            description = data.get('description', '')
-            
-            print(f"Received image upload request for bookmark {bookmark_id}")
-            print(f"Image data length: {len(image_data) if image_data else 'None'}")
-            
-            # Convert base64 to image file
-            if image_data:
-                try:
+            if request.content_type == 'multipart/form-data':
+                size_limit = install_size_limit(request)
+                image_file = request.FILES.get('image')
+                if size_limit.exceeded:
+                    return JsonResponse({
+                        'success': False,
+                        'message': f'Image is larger than {size_limit.max_size // (1024 * 1024)} MB'
+                    }, status=413)
+                title = request.POST.get('title', '')
+                description = request.POST.get('description', '')
+                file_name = bookmark_image_name(bookmark.id, image_file.name if image_file else '')
+            else:
+                # Legacy JSON body with a base64 data URI
+                data = json.loads(request.body)
+                image_data = data.get('image')
+                title = data.get('title', '')
+                description = data.get('description', '')
+                image_file = None
+                if image_data:
                     # Handle data URI format (data:image/jpeg;base64,...)
                     if ',' in image_data:
                         format_info, image_data = image_data.split(',', 1)
-                        print(f"Image format: {format_info}")
-                    
-                    # Decode the base64 data
-                    image_content = ContentFile(base64.b64decode(image_data))
-                    
+                    image_file = ContentFile(base64.b64decode(image_data))
+                file_name = bookmark_image_name(bookmark.id)
+            
+            if image_file:
+                try:
                     # Create the bookmark image
                     bookmark_image = BookmarkImage(
                         bookmark=bookmark,
@@ -882,10 +720,10 @@ def bookmark_add_image(request, bookmark_id):
                         description=description
                     )
                     
-                    # Save the image file with a unique name
-                    import uuid
-                    file_name = f"bookmark_{bookmark.id}_{uuid.uuid4().hex}.jpg"
-                    bookmark_image.image.save(file_name, image_content, save=True)
+                    # Save the image file with a unique name; large multipart
+                    # uploads are moved from their temporary file, not copied
+                    bookmark_image.image.save(file_name, image_file, save=True)
+                    invalidate_bookmarks(bookmark.user_id)
                     
                     # Make sure image URL is absolute
                     image_url = request.build_absolute_uri(bookmark_image.image.url)
@@ -944,6 +782,7 @@ def bookmark_delete_image(request, image_id):
             # Delete the image file and record
             image.image.delete()
             image.delete()
+            invalidate_bookmarks(bookmark.user_id)
             
             return JsonResponse({
                 'success': True,
@@ -967,6 +806,7 @@ def bookmark_get_images(request, bookmark_id):
             
             # Get all images for the bookmark
             images = bookmark.images.all()
+            host_url = request.build_absolute_uri('/').rstrip('/')
             
             # Prepare the response data
             data = [{
@@ -974,6 +814,7 @@ def bookmark_get_images(request, bookmark_id):
                 'title': image.title,
                 'description': image.description,
                 'url': request.build_absolute_uri(image.image.url),
+                'srcset': absolute_sources(image.image, host_url)['srcset'],
                 'upload_date': image.upload_date.isoformat()
             } for image in images]
             
@@ -1089,24 +930,47 @@ def set_language_view(request, lang_code):
     
     # Return JSON response for AJAX calls
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-        return JsonResponse({'success': True, 'language': lang_code})
+        return JsonResponse({
+            'success': True,
+            'language': lang_code,
+            'translations_url': get_translations_url(lang_code),
+        })
         
     # Otherwise redirect to referer or home
     referer = request.META.get('HTTP_REFERER', '/')
     return redirect(referer)
 
+def _translations_etag(request, lang_code, version=None):
+    return get_translation_bundle(lang_code)['version']
+
 @require_http_methods(["GET"])
+@etag(_translations_etag)
 def get_translations_view(request, lang_code):
     """API endpoint to get all translations for a language as JSON"""
     if lang_code not in ['en', 'tl', 'ceb', 'es']:
         lang_code = 'en'
     
-    # Return all translations as JSON
-    return JsonResponse({
-        'success': True,
-        'language': lang_code,
-        'translations': json.loads(get_translations_json(lang_code))
-    })
+    # Wrap the precompiled bundle instead of re-serializing the translations
+    content = '{"success": true, "language": %s, "translations": %s}' % (
+        json.dumps(lang_code), get_translations_json(lang_code)
+    )
+    return HttpResponse(content, content_type='application/json')
+
+@require_http_methods(["GET"])
+@etag(_translations_etag)
+def translation_bundle(request, lang_code, version):
+    """
+    Serve a precompiled translation bundle. The URL carries the bundle's
+    content hash, so it can be cached as immutable; a stale hash redirects
+    to the current bundle.
+    """
+    bundle = get_translation_bundle(lang_code)
+    if lang_code not in ['en', 'tl', 'ceb', 'es'] or version != bundle['version']:
+        return redirect(get_translations_url(lang_code))
+    
+    response = HttpResponse(bundle['content'], content_type='application/json')
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
 
 @login_required
 def cancel_booking(request):
@@ -2532,7 +2396,8 @@ def get_companions(request):
                         'age': friend.age,
                         'age_label': friend.age_label,
                         'group_name': group_name,
-                        'picture_url': friend.picture.url if friend.picture else None
+                        'picture_url': friend.picture.url if friend.picture else None,
+                        'picture_srcset': image_srcset(friend.picture)
                     })
                 
                 # Combine all groups into a single list
@@ -2583,7 +2448,8 @@ def get_companions_legacy(guest):
                 'age': companion.age,
                 'age_label': companion.age_label,
                 'group_name': 'Personal Companions',
-                'picture_url': companion.picture.url if companion.picture else None
+                'picture_url': companion.picture.url if companion.picture else None,
+                'picture_srcset': image_srcset(companion.picture)
             })
     except Exception as e:
         print(f"Error fetching direct companions: {e}")
@@ -2600,7 +2466,8 @@ def get_companions_legacy(guest):
                     'age': member.age,
                     'age_label': member.age_label,
                     'group_name': 'Family',
-                    'picture_url': member.picture.url if member.picture else None
+                    'picture_url': member.picture.url if member.picture else None,
+                    'picture_srcset': image_srcset(member.picture)
                 })
     except Exception as e:
         print(f"Error fetching family companions: {e}")
@@ -2618,7 +2485,8 @@ def get_companions_legacy(guest):
                     'age': member.age,
                     'age_label': member.age_label,
                     'group_name': group.name,
-                    'picture_url': member.picture.url if member.picture else None
+                    'picture_url': member.picture.url if member.picture else None,
+                    'picture_srcset': image_srcset(member.picture)
                 })
     except Exception as e:
         print(f"Error fetching friend group companions: {e}")
@@ -2770,11 +2638,8 @@ def send_companion_qr_code(request):
                 'error': f"Error generating QR code: {str(qe)}"
             }, status=500)
         
-        # Create and send email
+        # Queue the email; the outbox worker delivers it
         try:
-            from django.core.mail import EmailMessage
-            from django.template.loader import render_to_string
-            
             # Email subject and message
             subject = "Your Companion Management QR Code"
             html_message = render_to_string('email/qr_code_email.html', {
@@ -2783,19 +2648,11 @@ def send_companion_qr_code(request):
                 'date': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             })
             
-            # Create and send email
-            email = EmailMessage(
-                subject=subject,
-                body=html_message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                to=[user.email],
-            )
-            email.content_subtype = "html"  # Set the email to be HTML
-            
             # Attach the QR code as a file
-            email.attach('companion_qr_code.png', buffer.getvalue(), 'image/png')
-            
-            email.send()
+            queue_email(
+                subject, strip_tags(html_message), user.email, html_body=html_message,
+                attachments=[('companion_qr_code.png', buffer.getvalue(), 'image/png')],
+            )
         except Exception as ee:
             return JsonResponse({
                 'success': False,
@@ -2899,6 +2756,8 @@ def accommodation_recommend(request):
         "budget": payload.get("budget"),
         "location": payload.get("location"),
         "company_type": payload.get("company_type"),
+        "check_in": payload.get("check_in"),
+        "check_out": payload.get("check_out"),
     }
 
     results = recommend_accommodations(params, limit=5)
@@ -2978,16 +2837,26 @@ def accommodation_book(request):
 
     total = calculate_accommodation_billing(room, check_in_dt, check_out_dt)
 
-    booking = AccommodationBooking.objects.create(
-        guest=request.user,
-        accommodation=room.accommodation,
-        room=room,
-        check_in=check_in_dt,
-        check_out=check_out_dt,
-        num_guests=num_guests,
-        status="pending",
-        total_amount=total,
-    )
+    with transaction.atomic():
+        booking = AccommodationBooking.objects.create(
+            guest=request.user,
+            accommodation=room.accommodation,
+            room=room,
+            check_in=check_in_dt,
+            check_out=check_out_dt,
+            num_guests=num_guests,
+            status="pending",
+            total_amount=total,
+        )
+        # The pending request holds its nights until it is declined or cancelled
+        if not inventory.reserve_nights(booking):
+            transaction.set_rollback(True)
+            booking = None
+
+    if booking is None:
+        return JsonResponse(
+            {"success": False, "message": "This room is already booked for some of those nights."}, status=409
+        )
 
     return JsonResponse({
         "success": True,
@@ -0,0 +1,111 @@
+"""
+Claim, retry and worker-loop machinery shared by the database-backed queues
+(``jobs`` and ``outbox``).
+
+A queue is a model with ``status``, ``attempts``, ``locked_at`` and
+``last_error`` fields plus a "due at" timestamp. Due rows are claimed in
+batches (``SELECT ... FOR UPDATE SKIP LOCKED`` where the database supports
+it, so several workers can share the table), failures are retried with
+exponential backoff until ``<PREFIX>_MAX_ATTEMPTS``, and rows left claimed by
+a worker that died are handed back after ``<PREFIX>_LOCK_TIMEOUT`` seconds.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+
+class WorkQueue:
+    def __init__(self, model, due_field, claimed_status, done_status, setting_prefix, defaults,
+                 touch_fields=()):
+        self.model = model
+        self.due_field = due_field
+        self.claimed_status = claimed_status
+        self.done_status = done_status
+        self.setting_prefix = setting_prefix
+        # {'BATCH_SIZE': ..., 'POLL_SECONDS': ..., 'MAX_ATTEMPTS': ...,
+        #  'RETRY_BASE_SECONDS': ..., 'LOCK_TIMEOUT': ...}
+        self.defaults = defaults
+        # auto_now fields to include in every save
+        self.touch_fields = list(touch_fields)
+
+    def setting(self, name):
+        return getattr(settings, f'{self.setting_prefix}_{name}', self.defaults[name])
+
+    def max_attempts(self):
+        return self.setting('MAX_ATTEMPTS')
+
+    def retry_delay(self, attempts):
+        """Seconds to wait before retrying a row that has failed ``attempts`` times."""
+        return self.setting('RETRY_BASE_SECONDS') * 2 ** (attempts - 1)
+
+    def outcomes(self):
+        return {self.done_status: 0, 'retry': 0, 'failed': 0}
+
+    def claim(self, limit, now=None):
+        """Mark up to ``limit`` due rows as claimed and return them."""
+        now = now or timezone.now()
+        order = (self.due_field, 'id')
+        with transaction.atomic():
+            due = (
+                self.model.objects.select_for_update(skip_locked=True)
+                .filter(status='pending', **{f'{self.due_field}__lte': now})
+                .order_by(*order)
+            )
+            ids = list(due.values_list('id', flat=True)[:limit])
+            self.model.objects.filter(id__in=ids).update(
+                status=self.claimed_status, locked_at=now, attempts=F('attempts') + 1,
+            )
+        return list(self.model.objects.filter(id__in=ids).order_by(*order))
+
+    def requeue_stale(self, now=None):
+        """Return rows left claimed by a worker that died to the queue."""
+        now = now or timezone.now()
+        timeout = timedelta(seconds=self.setting('LOCK_TIMEOUT'))
+        return self.model.objects.filter(status=self.claimed_status, locked_at__lt=now - timeout).update(
+            status='pending', locked_at=None,
+        )
+
+    def record_failure(self, row, error):
+        """Schedule a retry of ``row`` (or give up on it); returns ``'retry'`` or ``'failed'``."""
+        row.last_error = error
+        row.locked_at = None
+        if row.attempts >= self.max_attempts():
+            row.status = 'failed'
+        else:
+            row.status = 'pending'
+            setattr(row, self.due_field, timezone.now() + timedelta(seconds=self.retry_delay(row.attempts)))
+        row.save(update_fields=['status', self.due_field, 'locked_at', 'last_error'] + self.touch_fields)
+        return 'failed' if row.status == 'failed' else 'retry'
+
+    def record_done(self, row, **fields):
+        row.status = self.done_status
+        row.locked_at = None
+        for name, value in fields.items():
+            setattr(row, name, value)
+        row.save(update_fields=['status', 'locked_at', *fields] + self.touch_fields)
+        return self.done_status
+
+    def work(self, process, sleep=None, once=False, stdout=None):
+        """
+        Worker loop: requeue stale rows and call ``process()`` (which handles
+        due rows and returns outcome counts) until it finds nothing to do,
+        then poll every ``<PREFIX>_POLL_SECONDS``. With ``once`` it returns
+        the totals at that point instead.
+        """
+        sleep = self.setting('POLL_SECONDS') if sleep is None else sleep
+        totals = self.outcomes()
+        while True:
+            self.requeue_stale()
+            counts = process()
+            for outcome, count in counts.items():
+                totals[outcome] += count
+            if stdout is not None and any(counts.values()):
+                stdout.write(', '.join(f'{outcome}: {count}' for outcome, count in counts.items()))
+            if not any(counts.values()):
+                if once:
+                    return totals
+                time.sleep(sleep)
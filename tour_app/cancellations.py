@@ -0,0 +1,78 @@
+"""
+Set-based cancellation of tour schedules.
+
+``cancel_schedules`` cancels any number of schedules with one UPDATE per
+table: the schedules themselves (releasing every booked slot), their
+``Pending`` requests and their ``TourBooking`` rows. Guest notifications are
+handed to the job queue, whose ``send_cancellation_notices`` job renders the
+emails and bulk-inserts them into the outbox, so the request does no
+per-guest work at all.
+"""
+from django.db import transaction
+from django.db.models import F
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.html import strip_tags
+
+from guest_app import jobs
+from guest_app.models import Pending, TourBooking
+from guest_app.outbox import queue_emails
+
+from .models import Tour_Schedule
+from .reservations import mark_schedules_changed
+
+SEND_CANCELLATION_NOTICES = 'tour_app.cancellations.send_cancellation_notices'
+
+# Pending requests in these states are left alone by a cancellation
+CLOSED_PENDING_STATUSES = ('Cancelled', 'Declined')
+
+
+def cancel_schedules(sched_ids, reason=None, now=None):
+    """
+    Cancel the given schedules (already cancelled ones are skipped) and
+    everything booked on them. Returns counts:
+    ``{'schedules': ..., 'pending': ..., 'bookings': ...}``.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        schedules = Tour_Schedule.objects.filter(pk__in=list(sched_ids)).exclude(status='cancelled')
+        ids = list(schedules.values_list('pk', flat=True))
+        if not ids:
+            return {'schedules': 0, 'pending': 0, 'bookings': 0}
+
+        open_pending = Pending.objects.filter(sched_id__in=ids).exclude(status__in=CLOSED_PENDING_STATUSES)
+        notify_ids = list(open_pending.values_list('pk', flat=True))
+        pending = open_pending.update(
+            status='Cancelled', cancellation_reason=reason, cancellation_date=now,
+        )
+        bookings = TourBooking.objects.filter(schedule_id__in=ids).exclude(status='cancelled').update(
+            status='cancelled', cancellation_reason=reason, cancellation_date=now, last_updated=now,
+        )
+        # Every booked slot goes back to the schedule
+        cancelled = Tour_Schedule.objects.filter(pk__in=ids).update(
+            status='cancelled', cancellation_reason=reason, cancellation_date=now,
+            slots_available=F('slots_available') + F('slots_booked'), slots_booked=0,
+        )
+        mark_schedules_changed(ids)
+
+        if notify_ids:
+            jobs.enqueue(SEND_CANCELLATION_NOTICES, pending_ids=notify_ids, reason=reason or '')
+    return {'schedules': cancelled, 'pending': pending, 'bookings': bookings}
+
+
+def send_cancellation_notices(pending_ids, reason=''):
+    """Job: queue one cancellation email per cancelled ``Pending`` request."""
+    emails = []
+    requests = Pending.objects.filter(pk__in=pending_ids).select_related('sched_id__tour')
+    for booking in requests:
+        schedule = booking.sched_id
+        tour_name = schedule.tour.tour_name
+        html_message = render_to_string('email/tour_cancellation.html', {
+            'name': booking.your_name,
+            'tour': tour_name,
+            'reason': reason,
+            'start_time': schedule.start_time.strftime("%B %d, %Y, %I:%M %p"),
+        })
+        subject = f"Important: Your Booking for {tour_name} has been Cancelled"
+        emails.append((subject, strip_tags(html_message), booking.your_email, html_message))
+    queue_emails(emails)
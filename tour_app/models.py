@@ -1,6 +1,23 @@
 from django.utils import timezone
 from django.db import models
 from django.db import transaction
+from django.db.models import F, FilteredRelation, Q
+from django.db.models.functions import Coalesce
+
+
+class TourAddQuerySet(models.QuerySet):
+    def translated(self, language):
+        """
+        Annotate ``translated_tour_name`` and ``translated_description`` from
+        the ``language`` TourAddTranslation row, joined in the same query;
+        tours without one keep their base text.
+        """
+        return self.annotate(
+            translation=FilteredRelation('translations', condition=Q(translations__language=language)),
+        ).annotate(
+            translated_tour_name=Coalesce(F('translation__tour_name'), F('tour_name')),
+            translated_description=Coalesce(F('translation__description'), F('description')),
+        )
 
 
 class Tour_Add(models.Model):
@@ -9,6 +26,8 @@ class Tour_Add(models.Model):
     description = models.TextField()
     image = models.ImageField(upload_to='tour_images/', null=True, blank=True)
 
+    objects = TourAddQuerySet.as_manager()
+
     def save(self, *args, **kwargs):
         if not self.tour_id:
             with transaction.atomic():
@@ -60,13 +79,8 @@ class Tour_Schedule(models.Model):
             delta = self.end_time - self.start_time
             self.duration_days = max(1, delta.days + (1 if delta.seconds > 0 else 0))
             
-        # Auto-update status based on time
-        now = timezone.now()
-        if self.status != 'cancelled':  # Don't auto-update if cancelled
-            if now > self.end_time:
-                self.status = 'completed'
-            elif now >= self.start_time and now <= self.end_time:
-                self.status = 'active'
+        # Time-based status changes (active/completed) are applied in bulk by
+        # the ``sweep_booking_statuses`` management command.
 
         print(f"Generating sched_id: {self.sched_id}")  # Debugging
         super().save(*args, **kwargs)
@@ -76,11 +90,14 @@ class Tour_Schedule(models.Model):
         return self.slots_available - self.slots_booked
 
     def cancel_tour(self, reason=None):
-        """Cancel this tour schedule"""
-        self.status = 'cancelled'
-        self.cancellation_reason = reason
-        self.cancellation_date = timezone.now()
-        self.save()
+        """Cancel this tour schedule and its bookings (see ``tour_app.cancellations``)"""
+        from .cancellations import cancel_schedules
+
+        counts = cancel_schedules([self.pk], reason=reason)
+        self.refresh_from_db(fields=[
+            'status', 'cancellation_reason', 'cancellation_date', 'slots_available', 'slots_booked',
+        ])
+        return counts
         
     def calculate_revenue(self):
         """Calculate revenue for this tour schedule based on bookings"""
@@ -0,0 +1,47 @@
+"""
+Race-free slot reservation for tour schedules.
+
+``slots_available`` is a schedule's remaining capacity and ``slots_booked``
+what has been taken. Both are changed by a single conditional UPDATE::
+
+    UPDATE tour_app_tour_schedule
+       SET slots_available = slots_available - n, slots_booked = slots_booked + n
+     WHERE sched_id = %s AND slots_available >= n
+
+The database evaluates the condition and the arithmetic on the current row,
+so concurrent bookings can neither lose updates nor oversell, and no row is
+read or locked beforehand. A caller that creates the booking rows inside the
+same ``transaction.atomic()`` block gets the reservation rolled back with
+them if anything fails.
+"""
+from django.db import transaction
+from django.db.models import F
+
+from .models import Tour_Schedule
+
+
+def mark_schedules_changed(sched_ids):
+    # QuerySet.update skips post_save, so tell the recommendation store now
+    # and again once the transaction commits (see ai_chatbot.signals).
+    from ai_chatbot.feature_store import store
+
+    sched_ids = list(sched_ids)
+    store.mark_schedules(sched_ids)
+    transaction.on_commit(lambda: store.mark_schedules(sched_ids))
+
+
+def reserve_slots(sched_id, count):
+    """
+    Take ``count`` slots on a schedule if that many are still available.
+    Returns ``True`` on success, ``False`` if the schedule is full (or gone).
+    """
+    if count < 1:
+        raise ValueError('At least one slot must be reserved.')
+    updated = Tour_Schedule.objects.filter(pk=sched_id, slots_available__gte=count).update(
+        slots_available=F('slots_available') - count,
+        slots_booked=F('slots_booked') + count,
+    )
+    if updated:
+        mark_schedules_changed([sched_id])
+    return bool(updated)
+
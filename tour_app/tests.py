@@ -1,3 +1,164 @@
-from django.test import TestCase
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.db import close_old_connections, connection
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+
+from django.utils import timezone
+
+from guest_app import jobs
+from guest_app.models import BackgroundJob, Guest, OutboxEmail, Pending, TourBooking
+
+from .cancellations import cancel_schedules
+from .models import Tour_Add, Tour_Schedule
+from .reservations import reserve_slots
+from .translation_models import TourAddTranslation
+from .views import get_translated_tour
+
+
+class TranslatedTourQuerySetTests(TestCase):
+    def setUp(self):
+        for number in range(1, 4):
+            Tour_Add.objects.create(tour_id=f"{number:05d}", tour_name=f"Tour {number}", description=f"About {number}")
+        TourAddTranslation.objects.create(
+            tour_id="00002", language="es", tour_name="Excursión 2", description="Acerca de 2"
+        )
+
+    def test_translations_resolve_in_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            translated = [get_translated_tour(tour, "es") for tour in Tour_Add.objects.translated("es").order_by("tour_id")]
+
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(
+            [tour["tour_name"] for tour in translated], ["Tour 1", "Excursión 2", "Tour 3"]
+        )
+        self.assertEqual(translated[1]["description"], "Acerca de 2")
+
+    def test_plain_tour_still_falls_back_to_lookup(self):
+        tour = Tour_Add.objects.get(tour_id="00002")
+        self.assertEqual(get_translated_tour(tour, "es")["tour_name"], "Excursión 2")
+        self.assertEqual(get_translated_tour(tour, "tl")["tour_name"], "Tour 2")
+
+
+def create_schedule(slots):
+    tour = Tour_Add.objects.create(tour_id="00001", tour_name="River Cruise", description="Boat ride")
+    start = timezone.now() + timedelta(days=3)
+    return Tour_Schedule.objects.create(
+        tour=tour, start_time=start, end_time=start + timedelta(hours=4),
+        price=Decimal("500.00"), slots_available=slots, slots_booked=0,
+    )
+
+
+class ReserveSlotsTests(TestCase):
+    def setUp(self):
+        self.schedule = create_schedule(slots=5)
+
+    def test_reserves_when_enough_slots_remain(self):
+        self.assertTrue(reserve_slots(self.schedule.sched_id, 3))
+        self.assertFalse(reserve_slots(self.schedule.sched_id, 3))
+        self.assertTrue(reserve_slots(self.schedule.sched_id, 2))
+
+        self.schedule.refresh_from_db()
+        self.assertEqual((self.schedule.slots_available, self.schedule.slots_booked), (0, 5))
+
+    def test_reservation_is_one_conditional_update(self):
+        with CaptureQueriesContext(connection) as queries:
+            reserve_slots(self.schedule.sched_id, 1)
+
+        self.assertEqual(len(queries), 1)
+        self.assertTrue(queries[0]["sql"].startswith("UPDATE"))
+
+    def test_rejects_non_positive_counts_and_unknown_schedules(self):
+        with self.assertRaises(ValueError):
+            reserve_slots(self.schedule.sched_id, 0)
+        self.assertFalse(reserve_slots("Sched99999", 1))
+
+
+class CancelSchedulesTests(TestCase):
+    GUESTS = 200
+
+    def setUp(self):
+        self.schedule = create_schedule(slots=self.GUESTS)
+        self.guest = Guest.objects.create(
+            username="canceller", email="canceller@example.com", first_name="Cai", last_name="Ncel",
+            country_of_origin="PH", phone_number="09170000004", sex="F",
+        )
+        reserve_slots(self.schedule.sched_id, self.GUESTS)
+        Pending.objects.bulk_create(
+            Pending(
+                guest_id=self.guest, sched_id=self.schedule, tour_id=self.schedule.tour,
+                your_name=f"Guest {number}", your_email=f"guest{number}@example.com",
+            )
+            for number in range(self.GUESTS)
+        )
+        TourBooking.objects.bulk_create(
+            TourBooking(guest=self.guest, tour=self.schedule.tour, schedule=self.schedule)
+            for _ in range(self.GUESTS)
+        )
+
+    def test_cancels_every_booking_with_a_fixed_number_of_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            counts = cancel_schedules([self.schedule.sched_id], reason="Typhoon")
+
+        self.assertEqual(counts, {"schedules": 1, "pending": self.GUESTS, "bookings": self.GUESTS})
+        self.assertLessEqual(len(queries), 10)
+        self.assertFalse(Pending.objects.exclude(status="Cancelled").exists())
+        self.assertFalse(TourBooking.objects.exclude(status="cancelled").exists())
+        self.assertEqual(Pending.objects.filter(cancellation_reason="Typhoon").count(), self.GUESTS)
+
+        self.schedule.refresh_from_db()
+        self.assertEqual(self.schedule.status, "cancelled")
+        self.assertEqual((self.schedule.slots_available, self.schedule.slots_booked), (self.GUESTS, 0))
+
+    def test_notifications_are_sent_by_the_job_queue(self):
+        cancel_schedules([self.schedule.sched_id], reason="Typhoon")
+        self.assertEqual(OutboxEmail.objects.count(), 0)
+        self.assertEqual(BackgroundJob.objects.count(), 1)
+
+        jobs.work(once=True)
+
+        emails = OutboxEmail.objects.order_by("id")
+        self.assertEqual(emails.count(), self.GUESTS)
+        self.assertIn("River Cruise", emails[0].subject)
+        self.assertIn("Typhoon", emails[0].body)
+
+    def test_cancelled_schedules_and_closed_requests_are_skipped(self):
+        Pending.objects.filter(your_name="Guest 0").update(status="Declined")
+        self.assertEqual(self.schedule.cancel_tour("Typhoon")["pending"], self.GUESTS - 1)
+        self.assertEqual(self.schedule.status, "cancelled")
+        self.assertEqual(self.schedule.slots_booked, 0)
+        self.assertEqual(Pending.objects.get(your_name="Guest 0").status, "Declined")
+
+        self.assertEqual(cancel_schedules([self.schedule.sched_id]), {"schedules": 0, "pending": 0, "bookings": 0})
+        self.assertEqual(BackgroundJob.objects.count(), 1)
+
+
+@skipUnlessDBFeature("test_db_allows_multiple_connections")
+class ConcurrentReservationTests(TransactionTestCase):
+    SLOTS = 50
+    ATTEMPTS = 320
+
+    def test_parallel_bookings_never_oversell(self):
+        schedule = create_schedule(slots=self.SLOTS)
+        start = threading.Barrier(16)
+
+        def book(_):
+            try:
+                try:
+                    start.wait(timeout=5)
+                except threading.BrokenBarrierError:
+                    pass
+                return reserve_slots(schedule.sched_id, 1)
+            finally:
+                close_old_connections()
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            results = list(pool.map(book, range(self.ATTEMPTS)))
+
+        schedule.refresh_from_db()
+        self.assertEqual(results.count(True), self.SLOTS)
+        self.assertEqual((schedule.slots_available, schedule.slots_booked), (0, self.SLOTS))
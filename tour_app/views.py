@@ -2,6 +2,8 @@ from .forms import TourAddForm
 from django.forms import formset_factory
 from .forms import TourScheduleForm, TourAdmissionForm
 from .models import Tour_Add, Tour_Event, Tour_Schedule, Tour_Admission, Admission_Rates
+from .cancellations import cancel_schedules
+from .reservations import reserve_slots
 from django.shortcuts import get_object_or_404, redirect, render
 from django.contrib import messages
 from django.views.generic.edit import UpdateView
@@ -19,13 +21,15 @@ from django.http import HttpResponseForbidden
 from django.core.exceptions import ObjectDoesNotExist
 from functools import wraps
 from django.utils.dateparse import parse_datetime
+from django.db import transaction
 from django.utils import timezone
-from django.core.mail import send_mail
 from django.conf import settings
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 from decimal import Decimal
 from .translation_models import TourAddTranslation
+from guest_app.derivatives import srcset as image_srcset
+from guest_app.outbox import queue_email
 from guest_app.utils import get_current_language, translate, get_translations_json, LANGUAGE_SESSION_KEY
 
 
@@ -282,29 +286,26 @@ def pending_view(request):
 
             print(f"👤 Guest: {guest}, 📅 Schedule: {schedule}, 🎟️ Tour: {tour}, 👥 Total Guests: {total_guests}")
 
-            # Ensure that there are enough available slots
-            if schedule.slots_available < total_guests:
-                messages.error(request, "Not enough available slots.")
-                return redirect('pending_view')
-
-            # Create a new Pending booking entry
-            pending = Pending.objects.create(
-                guest_id=guest,
-                sched_id=schedule,
-                tour_id=tour,
-                status="Pending",
-                total_guests=total_guests,
-                your_name=f"{guest.first_name} {guest.last_name}",
-                your_email=guest.email,
-                your_phone=guest.phone_number,
-                num_adults=num_adults,
-                num_children=num_children
-            )
-
-            # Update slots availability in the schedule
-            schedule.slots_booked += total_guests
-            schedule.slots_available -= total_guests
-            schedule.save()
+            with transaction.atomic():
+                # Take the slots in one conditional UPDATE; the booking is only
+                # created if that succeeded
+                if not reserve_slots(schedule.sched_id, total_guests):
+                    messages.error(request, "Not enough available slots.")
+                    return redirect('pending_view')
+
+                # Create a new Pending booking entry
+                pending = Pending.objects.create(
+                    guest_id=guest,
+                    sched_id=schedule,
+                    tour_id=tour,
+                    status="Pending",
+                    total_guests=total_guests,
+                    your_name=f"{guest.first_name} {guest.last_name}",
+                    your_email=guest.email,
+                    your_phone=guest.phone_number,
+                    num_adults=num_adults,
+                    num_children=num_children
+                )
 
             print("✅ Booking saved successfully:", pending)
             messages.success(request, "Booking added successfully!")
@@ -345,7 +346,9 @@ class StatusUpdateView(UpdateView):
     def dispatch(self, *args, **kwargs):
         return super().dispatch(*args, **kwargs)
 
+    @transaction.atomic
     def form_valid(self, form):
+        # The status change and its notification email commit together
         instance = form.save(commit=False)
         
         # Get email from hidden form field
@@ -380,18 +383,8 @@ class StatusUpdateView(UpdateView):
             })
             plain_message = strip_tags(html_message)
             
-            try:
-                send_mail(
-                    subject,
-                    plain_message,
-                    settings.DEFAULT_FROM_EMAIL,
-                    [guest_email],
-                    html_message=html_message,
-                    fail_silently=False,
-                )
-                messages.success(self.request, f"Confirmation email sent to {guest_email}")
-            except Exception as e:
-                messages.error(self.request, f"Failed to send email: {e}")
+            queue_email(subject, plain_message, guest_email, html_body=html_message)
+            messages.success(self.request, f"Confirmation email queued for {guest_email}")
                 
         elif instance.status == "Declined":
             # Send declined notification
@@ -408,18 +401,8 @@ class StatusUpdateView(UpdateView):
             })
             plain_message = strip_tags(html_message)
             
-            try:
-                send_mail(
-                    subject,
-                    plain_message,
-                    settings.DEFAULT_FROM_EMAIL,
-                    [guest_email],
-                    html_message=html_message,
-                    fail_silently=False,
-                )
-                messages.success(self.request, f"Notification email sent to {guest_email}")
-            except Exception as e:
-                messages.error(self.request, f"Failed to send email: {e}")
+            queue_email(subject, plain_message, guest_email, html_body=html_message)
+            messages.success(self.request, f"Notification email queued for {guest_email}")
         
         instance.save()
         return redirect(self.success_url)
@@ -485,70 +468,36 @@ def add_admission_rate(request):
 
 @admin_employee_required
 def cancel_tour_view(request):
-    """View for cancelling tour schedules"""
+    """View for cancelling one or more tour schedules"""
     if request.method == 'POST':
-        sched_id = request.POST.get('sched_id')
+        sched_ids = request.POST.getlist('sched_id')
         cancellation_reason = request.POST.get('cancellation_reason', '')
         
-        if not sched_id:
+        if not sched_ids:
             messages.error(request, "No schedule ID provided")
             return redirect('tour_app:cancel_tour')
             
         try:
-            tour_schedule = Tour_Schedule.objects.get(sched_id=sched_id)
-            
-            # Cancel the tour and store the reason
-            tour_schedule.cancel_tour(reason=cancellation_reason)
-            
-            # Get all pending bookings for this schedule
-            pending_bookings = Pending.objects.filter(sched_id=tour_schedule)
-            
-            # Update all pending bookings to "Cancelled"
-            for booking in pending_bookings:
-                booking.status = "Cancelled"
-                booking.save()
-                
-            messages.success(request, f"Tour {tour_schedule.tour_id.tour_name} ({tour_schedule.sched_id}) has been cancelled successfully.")
-            
-            # Send cancellation emails
-            for booking in pending_bookings:
-                guest_email = booking.your_email
-                guest_name = booking.your_name
-                
-                # Once you create the tour_cancellation.html template:
-                html_message = render_to_string('email/tour_cancellation.html', {
-                    'name': guest_name,
-                    'tour': tour_schedule.tour_id.tour_name,
-                    'reason': cancellation_reason,
-                    'start_time': tour_schedule.start_time.strftime("%B %d, %Y, %I:%M %p"),
-                })
-                plain_message = strip_tags(html_message)
-                
-                subject = f"Important: Your Booking for {tour_schedule.tour_id.tour_name} has been Cancelled"
-                
-                try:
-                    send_mail(
-                        subject,
-                        plain_message,
-                        settings.DEFAULT_FROM_EMAIL,
-                        [guest_email],
-                        html_message=html_message,
-                        fail_silently=False,
-                    )
-                except Exception as e:
-                    print(f"Failed to send cancellation email to {guest_email}: {e}")
-            
-        except Tour_Schedule.DoesNotExist:
-            messages.error(request, "Tour schedule not found")
+            # Bookings are cancelled and slots released in bulk; guests are
+            # notified by the background workers
+            counts = cancel_schedules(sched_ids, reason=cancellation_reason)
+            if counts['schedules']:
+                messages.success(
+                    request,
+                    f"Cancelled {counts['schedules']} schedule(s) ({', '.join(sched_ids)}) and "
+                    f"{counts['pending']} booking request(s). Guests will be notified by email."
+                )
+            else:
+                messages.error(request, "Tour schedule not found or already cancelled")
         except Exception as e:
             messages.error(request, f"Error cancelling tour: {str(e)}")
             
         return redirect('tour_app:cancel_tour')
     
     # For GET requests, show active and completed tours that can be cancelled
-    active_tours = Tour_Schedule.objects.filter(status='active').select_related('tour_id')
-    completed_tours = Tour_Schedule.objects.filter(status='completed').select_related('tour_id')
-    cancelled_tours = Tour_Schedule.objects.filter(status='cancelled').select_related('tour_id')
+    active_tours = Tour_Schedule.objects.filter(status='active').select_related('tour')
+    completed_tours = Tour_Schedule.objects.filter(status='completed').select_related('tour')
+    cancelled_tours = Tour_Schedule.objects.filter(status='cancelled').select_related('tour')
     
     context = {
         'active_tours': active_tours,
@@ -913,6 +862,7 @@ def get_schedule_events(request, schedule_id):
         }
         if event.image:
             event_data['image_url'] = event.image.url
+            event_data['image_srcset'] = image_srcset(event.image)
         events_data.append(event_data)
     
     return JsonResponse(events_data, safe=False)
@@ -933,6 +883,7 @@ def get_event_details(request, event_id):
     
     if event.image:
         event_data['image_url'] = event.image.url
+        event_data['image_srcset'] = image_srcset(event.image)
     
     return JsonResponse(event_data)
 
@@ -1034,7 +985,8 @@ def get_tour_details(request, tour_id):
             'tour_id': tour.tour_id,
             'tour_name': tour.tour_name,
             'description': tour.description,
-            'image_url': tour.image.url if tour.image else None
+            'image_url': tour.image.url if tour.image else None,
+            'image_srcset': image_srcset(tour.image)
         }
         return JsonResponse(data)
     except Exception as e:
@@ -1103,6 +1055,15 @@ def update_tour(request, tour_id):
 # Add language utility functions to fetch translated tour content
 def get_translated_tour(tour, language):
     """Get translated tour data based on language preference"""
+    # Tours from Tour_Add.objects.translated() already carry the translation
+    if hasattr(tour, 'translated_tour_name'):
+        return {
+            'tour_id': tour.tour_id,
+            'tour_name': tour.translated_tour_name,
+            'description': tour.translated_description,
+            'image': tour.image,
+        }
+    
     # Try to get specific translation
     try:
         translation = TourAddTranslation.objects.get(tour=tour, language=language)
@@ -1127,8 +1088,8 @@ def tour_list(request):
     # Get the current language
     current_language = get_current_language(request)
     
-    # Get all tours
-    tours = Tour_Add.objects.all()
+    # Get all tours with their translation joined in the same query
+    tours = Tour_Add.objects.translated(current_language)
     
     # Get translated tour data
     translated_tours = []
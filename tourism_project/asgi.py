@@ -3,6 +3,10 @@ ASGI config for tourism_project project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve it with an ASGI server (e.g. ``uvicorn tourism_project.asgi:application
+--workers 4``) to get the async chatbot endpoint at ``/api/chat/async/``, where
+each worker keeps many LLM calls in flight on one pooled OpenAI client.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
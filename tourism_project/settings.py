@@ -113,6 +113,132 @@ DATABASES = {
 }
 
 
+# Caches
+# The "chatbot" alias holds memoized LLM intent extractions. LocMemCache evicts
+# least-recently-used entries once MAX_ENTRIES is reached. "chatbot_state"
+# holds the generation counters that tell workers to reload the recommendation
+# feature store and keyword index; its entries never expire and must not be
+# evicted. Both are per process by default, so any deployment running more
+# than one worker must set CHATBOT_REDIS_URL (with a volatile-lru maxmemory
+# policy: intent entries have a TTL and are evictable, counters have none and
+# are kept); `manage.py check --deploy` warns otherwise.
+
+CHATBOT_INTENT_CACHE_TTL = int(os.environ.get('CHATBOT_INTENT_CACHE_TTL', 60 * 60))
+CHATBOT_INTENT_CACHE_MAX_ENTRIES = int(os.environ.get('CHATBOT_INTENT_CACHE_MAX_ENTRIES', 5000))
+
+# Seconds after which the chatbot feature store and keyword index reload from
+# the database even if no change was announced (0 disables). A safety net for
+# changes made outside signals or missed by a per-process state cache.
+CHATBOT_STORE_MAX_AGE = int(os.environ.get('CHATBOT_STORE_MAX_AGE', 5 * 60))
+
+# Messages the local intent classifier scores at or above this confidence are
+# answered without calling the LLM (see ai_chatbot/intent_classifier.py).
+CHATBOT_LOCAL_INTENT_THRESHOLD = float(os.environ.get('CHATBOT_LOCAL_INTENT_THRESHOLD', 0.8))
+
+# OpenAI calls made by the chatbot: per-call timeout in seconds (also the hard
+# limit for the async endpoint, queueing included), SDK retries, and the number
+# of concurrent LLM calls each ASGI worker allows.
+CHATBOT_LLM_TIMEOUT = float(os.environ.get('CHATBOT_LLM_TIMEOUT', 15))
+CHATBOT_LLM_MAX_RETRIES = int(os.environ.get('CHATBOT_LLM_MAX_RETRIES', 1))
+CHATBOT_LLM_MAX_CONCURRENCY = int(os.environ.get('CHATBOT_LLM_MAX_CONCURRENCY', 200))
+
+# Serialized map bookmark payloads are cached per (owner, language) in the
+# default cache; the bookmark and bookmark-image endpoints invalidate them, the
+# TTL only bounds staleness from edits made elsewhere (e.g. the admin).
+BOOKMARK_CACHE_TTL = int(os.environ.get('BOOKMARK_CACHE_TTL', 10 * 60))
+
+# Largest bookmark image accepted by the multipart upload endpoint, in bytes.
+# Files over FILE_UPLOAD_MAX_MEMORY_SIZE are streamed to a temporary file
+# rather than held in memory (guest_app/uploads.py).
+BOOKMARK_IMAGE_MAX_UPLOAD_SIZE = int(os.environ.get('BOOKMARK_IMAGE_MAX_UPLOAD_SIZE', 20 * 1024 * 1024))
+
+# Widths (px) of the resized WebP/JPEG variants made for uploaded images and
+# offered in srcset attributes (guest_app/derivatives.py), and their quality.
+IMAGE_DERIVATIVE_WIDTHS = tuple(
+    int(width) for width in os.environ.get('IMAGE_DERIVATIVE_WIDTHS', '320,640,1280').split(',')
+)
+IMAGE_DERIVATIVE_QUALITY = int(os.environ.get('IMAGE_DERIVATIVE_QUALITY', 80))
+# JPEG/WebP quality used when the worker recompresses an uploaded original.
+IMAGE_NORMALIZE_QUALITY = int(os.environ.get('IMAGE_NORMALIZE_QUALITY', 85))
+# Seconds the variant lookup for an image still waiting on the worker is
+# cached before storage is checked again.
+IMAGE_PENDING_MANIFEST_SECONDS = int(os.environ.get('IMAGE_PENDING_MANIFEST_SECONDS', 60))
+
+# Background job queue (guest_app/jobs.py, run by `manage.py run_jobs`):
+# jobs claimed per batch, idle poll interval, attempts before a job is marked
+# failed, base of the exponential retry delay, and how long a running job may
+# stay locked before it is handed to another worker.
+JOB_BATCH_SIZE = int(os.environ.get('JOB_BATCH_SIZE', 20))
+JOB_POLL_SECONDS = float(os.environ.get('JOB_POLL_SECONDS', 2))
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 5))
+JOB_RETRY_BASE_SECONDS = int(os.environ.get('JOB_RETRY_BASE_SECONDS', 30))
+JOB_LOCK_TIMEOUT = int(os.environ.get('JOB_LOCK_TIMEOUT', 15 * 60))
+
+# reCAPTCHA checks on booking (guest_app/recaptcha.py): verifier class
+# (guest_app.recaptcha.FakeVerifier answers locally), secret, siteverify
+# connect/read timeouts in seconds, keep-alive pool size, and how long a
+# verified token is accepted again when the client retries a submission.
+RECAPTCHA_VERIFIER = os.environ.get('RECAPTCHA_VERIFIER', 'guest_app.recaptcha.GoogleVerifier')
+RECAPTCHA_SECRET_KEY = os.environ.get('RECAPTCHA_SECRET_KEY', '6LeyhAYrAAAAAJdVcBnugINI6kChp_pbtBNIqkyk')
+RECAPTCHA_CONNECT_TIMEOUT = float(os.environ.get('RECAPTCHA_CONNECT_TIMEOUT', 2))
+RECAPTCHA_READ_TIMEOUT = float(os.environ.get('RECAPTCHA_READ_TIMEOUT', 4))
+RECAPTCHA_POOL_SIZE = int(os.environ.get('RECAPTCHA_POOL_SIZE', 10))
+RECAPTCHA_TOKEN_CACHE_SECONDS = int(os.environ.get('RECAPTCHA_TOKEN_CACHE_SECONDS', 60))
+# Each worker logs its verification counts and latency this often (0 disables).
+RECAPTCHA_STATS_LOG_SECONDS = int(os.environ.get('RECAPTCHA_STATS_LOG_SECONDS', 5 * 60))
+
+# Send guest_app log records (e.g. the reCAPTCHA stats above) to the console.
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'guest_app': {'handlers': ['console'], 'level': os.environ.get('GUEST_APP_LOG_LEVEL', 'INFO')},
+    },
+}
+
+# Map bookmark grid index (guest_app/map_grid.py): smallest cell size in map
+# units and quadtree depth. The viewport endpoint clusters bookmarks at zoom
+# levels up to MAP_BOOKMARK_CLUSTER_MAX_ZOOM into cells about
+# MAP_BOOKMARK_CLUSTER_PX screen pixels wide.
+MAP_GRID_CELL_SIZE = float(os.environ.get('MAP_GRID_CELL_SIZE', 1.0))
+MAP_GRID_LEVELS = int(os.environ.get('MAP_GRID_LEVELS', 16))
+MAP_BOOKMARK_CLUSTER_MAX_ZOOM = int(os.environ.get('MAP_BOOKMARK_CLUSTER_MAX_ZOOM', 0))
+MAP_BOOKMARK_CLUSTER_PX = int(os.environ.get('MAP_BOOKMARK_CLUSTER_PX', 64))
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'chatbot': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'ai-chatbot',
+        'TIMEOUT': CHATBOT_INTENT_CACHE_TTL,
+        'OPTIONS': {'MAX_ENTRIES': CHATBOT_INTENT_CACHE_MAX_ENTRIES},
+    },
+    'chatbot_state': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'ai-chatbot-state',
+        'TIMEOUT': None,
+    },
+}
+
+if os.environ.get('CHATBOT_REDIS_URL'):
+    CACHES['chatbot'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['CHATBOT_REDIS_URL'],
+        'TIMEOUT': CHATBOT_INTENT_CACHE_TTL,
+    }
+    CACHES['chatbot_state'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['CHATBOT_REDIS_URL'],
+        'TIMEOUT': None,
+        'KEY_PREFIX': 'chatbot_state',
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -190,6 +316,17 @@ EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = f'IBAYAW Tours <{os.environ.get("EMAIL_HOST_USER")}>'
 
+# Outgoing mail is queued in the outbox table and delivered by
+# `manage.py send_outbox` (guest_app/outbox.py): messages per batch, poll
+# interval, attempts before a message is marked failed, base of the
+# exponential retry delay, and how long a claimed message may stay unsent
+# before another worker takes it over.
+EMAIL_OUTBOX_BATCH_SIZE = int(os.environ.get('EMAIL_OUTBOX_BATCH_SIZE', 50))
+EMAIL_OUTBOX_POLL_SECONDS = float(os.environ.get('EMAIL_OUTBOX_POLL_SECONDS', 5))
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.environ.get('EMAIL_OUTBOX_MAX_ATTEMPTS', 6))
+EMAIL_OUTBOX_RETRY_BASE_SECONDS = int(os.environ.get('EMAIL_OUTBOX_RETRY_BASE_SECONDS', 60))
+EMAIL_OUTBOX_LOCK_TIMEOUT = int(os.environ.get('EMAIL_OUTBOX_LOCK_TIMEOUT', 10 * 60))
+
 # CSRF settings to fix form submission issues
 CSRF_TRUSTED_ORIGINS = ['http://localhost:8000', 'http://127.0.0.1:8000']
 CSRF_COOKIE_SECURE = False  # Set to True in production with HTTPS